@@ -2,11 +2,43 @@
 apply_scenario_hazira.py
 Apply each scenario’s multipliers to S1–S11 outputs; 
 output adjusted CSVs per scenario.
+
+The gate is not scaled but re-simulated under each scenario's
+gate_speed (and gate_lanes, if given) on the baseline's trucks,
+see simulate_gate_hazira.py.
+
+Re-simulation mode:
+    python apply_scenario_hazira.py --resimulate
+re-runs the vessel, crane and gate simulations under each scenario's
+multipliers instead of scaling the baseline outputs, so a faster
+service also shortens the waits of the vessels behind it. The runs of
+all scenarios go in parallel, each in its own folder under RUNS_DIR.
+They draw from the same random streams as the baseline (same
+HAZIRA_SEED and HAZIRA_REPLICATION, see scenario_params_hazira.py),
+so the scenario minus baseline differences are not swamped by
+sampling noise and need far fewer replications.
 '''
 
+import os
+import sys
 import json
+import subprocess
 import pandas as pd
 import math
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "simulation_tasks"))
+from simulate_energy_hazira import hourly_energy, read_yard_moves
+from simulate_gate_hazira import TICKS, TICK, HOUR_TIMESTEP, draw_trucks, simulate_gate
+from random_streams_hazira import stream
+
+GATE_LANES = 1 # Lanes of a scenario that does not give gate_lanes
+
+RESIMULATE = '--resimulate' in sys.argv
+SIMULATION_DIR = Path(__file__).resolve().parent.parent / "simulation_tasks"
+RUNS_DIR = Path("scenario_runs") # One folder of simulation outputs per scenario
+RESIMULATED = ["simulate_vessels_hazira.py", "simulate_cranes_hazira.py", "simulate_gate_hazira.py"]
 
 def scale_timedelta(x, multiplier):
     '''
@@ -20,63 +52,87 @@ def scale_timedelta(x, multiplier):
     #print(pd.to_timedelta(pd.to_timedelta(x).total_seconds() * multiplier, unit='s').round('s'))
     return str(pd.to_timedelta(pd.to_timedelta(x).total_seconds() * multiplier, unit='s').round('s'))
 
-def improve_gate(num_processed, queue_length, multiplier):
+def run_simulation(scenario, script):
     '''
-    Applies the improvement multiplier on the number of trucks processed.
-    Parameters
-    num_processed: int (original number of trucks processed within the frame)
-    queue_length: int (number of trucks waiting)
-    multiplier: speedup in processing
-    Returns
-    [new_num_processed, new_queue_length]
+    Runs one simulation under a scenario's multipliers, in the scenario's
+    folder of RUNS_DIR. HAZIRA_SEED and HAZIRA_REPLICATION are passed on
+    unchanged, so the run uses the baseline's random streams.
     '''
+    run_dir = RUNS_DIR / scenario['name']
+    run_dir.mkdir(parents=True, exist_ok=True)
+    params = dict(scenario['multipliers'])
+    if 'gate_lanes' in scenario:
+        params['gate_lanes'] = scenario['gate_lanes']
+    env = dict(os.environ, HAZIRA_SCENARIO=json.dumps(params))
+    subprocess.run([sys.executable, str(SIMULATION_DIR / script)], cwd=run_dir, env=env, check=True)
 
-    # Note that we will allow for fractional amounts of processing
-    new_num_processed = num_processed * multiplier
-
-    # If the speedup would process more trucks than are currently in the queue
-    if new_num_processed - num_processed > queue_length:
-        return [queue_length + num_processed, 0]
-    else:
-        return [new_num_processed, queue_length - (new_num_processed - num_processed)]
+def resimulate(scenarios):
+    '''
+    Runs every resimulated simulation of every scenario, in parallel.
+    Each run is its own process, so the threads only wait on them.
+    '''
+    jobs = [(scenario, script) for scenario in scenarios for script in RESIMULATED]
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        # list() re-raises the error of any run that failed
+        list(pool.map(lambda job : run_simulation(*job), jobs))
 
 # Read the .json file that defines the improvement metrics
 scenarios = []
 with open('Scenario_Parameters_Hazira.json', 'r') as file:
     scenarios = json.load(file)
 
-for scenario in scenarios['scenarios']:
-
-    # Read in the appropriate dataframes which we will apply improvements to
-    # Note that we need to reload these values at the start of each simulation
-    vessel_turnaround = pd.read_csv('../simulation_tasks/vessel_turnaround_hazira.csv')
-    crane = pd.read_csv('../simulation_tasks/crane_uptime_hazira.csv')
-    gate = pd.read_csv('../simulation_tasks/gate_entries_hazira.csv')
-
-    # Scales the service time of each vessel by the appropriate multiplier
-    # Note that an x% improvement is scaling the service time by (1-x/100),
-    # so the parameters in .json file are given in such format
-    vessel_turnaround['service_time'] = vessel_turnaround['service_time'].apply(
-        lambda x : scale_timedelta(x, scenario['multipliers']['vessel_service_time'])) # Berth turnover
-    
-    # The simulation tracks only the time that the cranes are down, so we would like
-    # to reduce each downtime, by scaling it down
-    crane['duration'] = crane['duration'].apply(
-        lambda x : scale_timedelta(x, scenario['multipliers']['crane_downtime']) # Crane productivity
-    )
-
-    # For this metric, we need to update both the number of trucks processed at 
-    # each step and the queue length
-    # Both of these values are returned by improve_gate in a list
-    gate['num_processed'] = gate.apply(lambda x : 
-        improve_gate(x.num_processed, 
-                     x.queue_length, 
-                     scenario['multipliers']['gate_speed'])[0], axis=1)
-    gate['queue_length'] = gate.apply(lambda x : 
-        improve_gate(x.num_processed, 
-                     x.queue_length, 
-                     scenario['multipliers']['gate_speed'])[1], axis=1)
-    
+# The energy draw is recomputed from the activity of each scenario (see simulate_energy_hazira.py),
+# the crane moves themselves are the same in every scenario
+moves = pd.read_csv('../simulation_tasks/container_moves_hazira.csv', usecols=['resource_assigned', 'move_start', 'move_end'])
+yard_moves = read_yard_moves('../simulation_tasks/yard_moves_hazira.csv')
+
+if RESIMULATE:
+    resimulate(scenarios['scenarios'])
+else:
+    # The gate is re-simulated for every scenario at once, on the same trucks as the baseline
+    # (the gate stream), so queues carry over from hour to hour at each scenario's speed and lanes
+    counts, service_mins = draw_trucks(stream('gate'))
+    gates = simulate_gate(counts, service_mins,
+                          speed=[scenario['multipliers']['gate_speed'] for scenario in scenarios['scenarios']],
+                          lanes=[scenario.get('gate_lanes', GATE_LANES) for scenario in scenarios['scenarios']])
+    gate_times = TICKS[HOUR_TIMESTEP - 1::HOUR_TIMESTEP] + TICK
+
+for i, scenario in enumerate(scenarios['scenarios']):
+
+    if RESIMULATE:
+        # The outputs of the scenario's own runs, nothing left to scale
+        run_dir = RUNS_DIR / scenario['name']
+        vessel_turnaround = pd.read_csv(run_dir / 'vessel_turnaround_hazira.csv')
+        crane = pd.read_csv(run_dir / 'crane_uptime_hazira.csv')
+        gate = pd.read_csv(run_dir / 'gate_entries_hazira.csv')
+    else:
+        # Read in the appropriate dataframes which we will apply improvements to
+        # Note that we need to reload these values at the start of each simulation
+        vessel_turnaround = pd.read_csv('../simulation_tasks/vessel_turnaround_hazira.csv')
+        crane = pd.read_csv('../simulation_tasks/crane_uptime_hazira.csv')
+        gate = pd.DataFrame({'time' : gate_times,
+                             'arrivals' : gates['arrivals'],
+                             'num_processed' : gates['num_processed'][i],
+                             'queue_length' : gates['queue_length'][i]})
+
+        # Scales the service time of each vessel by the appropriate multiplier
+        # Note that an x% improvement is scaling the service time by (1-x/100),
+        # so the parameters in .json file are given in such format
+        vessel_turnaround['service_time'] = vessel_turnaround['service_time'].apply(
+            lambda x : scale_timedelta(x, scenario['multipliers']['vessel_service_time'])) # Berth turnover
+
+        # The simulation tracks only the time that the cranes are down, so we would like
+        # to reduce each downtime, by scaling it down
+        crane['duration'] = crane['duration'].apply(
+            lambda x : scale_timedelta(x, scenario['multipliers']['crane_downtime']) # Crane productivity
+        )
+
+    # Vessels leave the berth once their (shorter) service is done, and more trucks pass the gate
+    berthed = pd.DataFrame({'start_time' : pd.to_datetime(vessel_turnaround['start_time'])})
+    berthed['end_time'] = berthed['start_time'] + pd.to_timedelta(vessel_turnaround['service_time'])
+    energy = hourly_energy(berthed, moves, gate, yard_moves)[['energy_kWh']].round(2)
+    energy.index.name = 'time'
+
     sim_name = scenario['name'] # moderate, conservative, etc.
 
     # Note that we need to use "with" otherwise the sheet will not be closed properly
@@ -85,6 +141,7 @@ for scenario in scenarios['scenarios']:
         vessel_turnaround.to_excel(excel_writer, sheet_name='vessel_turnaround_haizra')
         crane.to_excel(excel_writer, sheet_name='crane_uptime_hazira')
         gate.to_excel(excel_writer, sheet_name='gate_entries_hazira')
+        energy.to_excel(excel_writer, sheet_name='energy_consumption_hazira')
 
 '''
 An area for expansion would be to add improvement metrics in the other categories
@@ -0,0 +1,237 @@
+'''
+fleet_sizing_hazira.py
+Search for the cheapest fleet (container berths, quay cranes, RTGs and
+gate lanes) that handles a target throughput, e.g. how many RTGs do we
+need for 2M TEU?
+
+Only the container berths (CT) are searched over: the target throughput
+is container calls, which may only dock at the CT berths (see
+simulate_vessels_hazira.py). The bulk carriers and tankers use the
+multipurpose berths, which do not change with the container throughput,
+so they are left out of the search and of its cost. The gate's trucks
+grow with the target throughput, from the baseline's TRUCKS_PER_DAY at
+the baseline's container TEU.
+
+Every fleet in SEARCH_SPACE is simulated with the batched models of
+batch_models_hazira.py and scored by its annual cost plus a penalty for
+each KPI that misses its target in TARGETS. The annual cost is
+- hours of crane use and truck entries at the unit_costs_hazira.xlsx rates,
+  as in compute_savings_hazira.py
+- the crane capex of CapEx_OpEx_Assumptions_Hazira.xlsx spread over the
+  crane depreciation life
+- a yearly cost per berth and gate lane from CONFIG, as the workbooks
+  have no cost for them
+
+Fleets are compared with successive halving: every fleet is simulated
+with a few replications, the best 1/eta of them are kept and simulated
+with eta times as many, and so on. Most of the simulation effort goes to
+the fleets that are close to the best one, so a search space of
+thousands of fleets takes minutes. The simulations of each round run in
+parallel worker processes.
+'''
+
+import os
+import sys
+import itertools
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "simulation_tasks"))
+import batch_models_hazira as models
+from port_params_hazira import VESSEL_TYPES, TRUCKS_PER_DAY
+from compute_savings_hazira import CONFIG as SAVINGS_CONFIG, load_unit_rates, unit_cost
+
+CONFIG = {
+    "unit_rates" : SAVINGS_CONFIG["unit_rates"],
+    "capex_xlsx" : Path("../financial_projection_and_sensitivity/CapEx_OpEx_Assumptions_Hazira.xlsx"),
+    "output_xlsx" : Path("Fleet_Sizing_Hazira.xlsx"),
+    "teu_per_year" : 2_000_000,
+    "baseline_teu_per_year" : VESSEL_TYPES["container"]["arrivals_per_year"] * models.TEU_PER_CALL,
+    "baseline_trucks_per_day" : TRUCKS_PER_DAY,  # At the baseline TEU
+    "container_service_mu" : VESSEL_TYPES["container"]["service_mu"],  # Hours at a CT berth
+    "container_service_sigma" : VESSEL_TYPES["container"]["service_sigma"],
+    "berth_cost_per_year" : 1500,  # in lakh, assumed
+    "lane_cost_per_year" : 40,     # in lakh, assumed
+    "violation_cost" : 1e6,        # in lakh per 100% over a KPI target
+    "eta" : 3,                     # Keep 1/eta of the fleets each round, with eta times the replications
+    "min_replications" : 1,
+    "max_replications" : 27,
+    "chunk_size" : 256,            # Simulations per task sent to a worker
+    "workers" : os.cpu_count(),
+    "seed" : 2025
+}
+
+# Trucks through the gate at the target throughput
+CONFIG["trucks_per_day"] = CONFIG["baseline_trucks_per_day"] * CONFIG["teu_per_year"] / CONFIG["baseline_teu_per_year"]
+
+# Fleet sizes to search over
+SEARCH_SPACE = {
+    "ct_berths" : range(2, 9),
+    "num_quay" : range(4, 13),
+    "num_yard" : range(10, 61, 2),
+    "lanes" : range(1, 9)
+}
+
+# The highest acceptable mean value of each KPI
+TARGETS = {
+    "mean_wait_hrs" : 4,    # Container ship wait for a CT berth
+    "quay_delay_hrs" : 8,   # Hours for the quay cranes to clear their backlog (one shift)
+    "yard_delay_hrs" : 8,   # Hours for the RTGs to clear their backlog
+    "gate_mean_queue" : 5   # Trucks
+}
+
+KPIS = list(TARGETS) + ["quay_utilization", "yard_utilization", "annual_cost"]
+
+def load_crane_capex(path: Path) -> pd.Series:
+    '''
+    Yearly capital cost of one crane of each kind:
+    unit cost spread straight line over the crane depreciation life.
+    Parameters
+    path (Path): path to CapEx_OpEx_Assumptions_Hazira.xlsx
+    Returns
+    pd.Series indexed by quay_crane and yard_crane
+    '''
+    sheets = pd.read_excel(path, sheet_name=["Capex", "Assumptions"])
+    unit_costs = sheets["Capex"].set_index("asset")["unit_cost"]
+    life = sheets["Assumptions"].set_index("parameter")["value"]["crane_depreciation"]
+    return unit_costs[["quay_crane", "yard_crane"]].astype(float) / float(life)
+
+def simulate_fleets(fleets, seed, unit_rates, crane_capex):
+    '''
+    Simulates one year for each row of fleets.
+    Parameters
+    fleets: integer array of shape (B, 4) in the order of SEARCH_SPACE
+    seed: numpy.random.SeedSequence of this chunk
+    unit_rates: from load_unit_rates
+    crane_capex: from load_crane_capex
+    Returns
+    array of shape (B, len(KPIS))
+    '''
+    rng = np.random.default_rng(seed)
+    f = dict(zip(SEARCH_SPACE, fleets.T))
+    teu = CONFIG["teu_per_year"]
+
+    vessels = models.simulate_vessels(rng, teu / models.TEU_PER_CALL, CONFIG["container_service_mu"],
+                                      CONFIG["container_service_sigma"], num_berths=f["ct_berths"])
+    cranes = models.simulate_cranes(rng, num_quay=f["num_quay"], num_yard=f["num_yard"])
+    moves = models.simulate_moves(rng, teu, num_quay=f["num_quay"], num_yard=f["num_yard"],
+                                  quay_availability=cranes["quay_hours"] / (f["num_quay"] * models.HOURS),
+                                  yard_availability=cranes["yard_hours"] / (f["num_yard"] * models.HOURS))
+    gate = models.simulate_gate(rng, CONFIG["trucks_per_day"], lanes=f["lanes"])
+
+    # Costed the same way as compute_savings_hazira.py, one column per fleet
+    metrics = pd.DataFrame([
+        cranes["quay_hours"],
+        cranes["yard_hours"],
+        gate["trucks_processed"]
+    ], index=["quay_crane", "yard_crane", "truck_entry"])
+    annual_cost = (unit_cost(metrics, unit_rates).sum().to_numpy(dtype=float)
+                   + f["num_quay"] * crane_capex["quay_crane"]
+                   + f["num_yard"] * crane_capex["yard_crane"]
+                   + f["ct_berths"] * CONFIG["berth_cost_per_year"]
+                   + f["lanes"] * CONFIG["lane_cost_per_year"])
+
+    return np.column_stack([
+        vessels["mean_wait_hrs"],
+        moves["quay_delay_hrs"],
+        moves["yard_delay_hrs"],
+        gate["mean_queue"],
+        moves["quay_utilization"],
+        moves["yard_utilization"],
+        annual_cost
+    ])
+
+def run_replications(pool, fleets, replications, seed, unit_rates, crane_capex):
+    '''
+    Simulates every fleet the given number of times, in parallel chunks.
+    Returns
+    array of shape (len(fleets), replications, len(KPIS))
+    '''
+    rows = np.repeat(fleets, replications, axis=0)
+    chunks = np.array_split(rows, max(1, -(-len(rows) // CONFIG["chunk_size"])))
+    seeds = seed.spawn(len(chunks))
+    args = (chunks, seeds, [unit_rates] * len(chunks), [crane_capex] * len(chunks))
+
+    run = map if pool is None else pool.map
+    results = np.concatenate(list(run(simulate_fleets, *args)))
+    return results.reshape(len(fleets), replications, len(KPIS))
+
+def score(kpis):
+    '''
+    Annual cost plus the penalty for missing the KPI targets.
+    Parameters
+    kpis: array of mean KPIs, shape (..., len(KPIS))
+    '''
+    targets = np.array(list(TARGETS.values()), dtype=float)
+    over = np.maximum(0, kpis[..., :len(TARGETS)] / targets - 1)
+    # A fleet that cannot keep up has an infinite wait (nan when nothing arrived)
+    over = np.nan_to_num(over, nan=np.inf)
+    return kpis[..., KPIS.index("annual_cost")] + CONFIG["violation_cost"] * over.sum(axis=-1)
+
+def successive_halving(fleets, unit_rates, crane_capex, seed):
+    '''
+    Simulates every fleet with min_replications, then repeatedly keeps the
+    best 1/eta of them and tops up their replications to eta times as many,
+    until max_replications is reached or one fleet is left.
+    Replications are kept from round to round, so a surviving fleet's
+    score is the mean over all of its simulations.
+    Returns
+    pd.DataFrame of the fleets of every round with their mean KPIs, score and round
+    '''
+    eta = CONFIG["eta"]
+    sums = np.zeros((len(fleets), len(KPIS)))
+    counts = np.zeros(len(fleets), dtype=int)
+    alive = np.arange(len(fleets))
+    replications = CONFIG["min_replications"]
+    rounds = []
+
+    pool = None if CONFIG["workers"] == 1 else ProcessPoolExecutor(max_workers=CONFIG["workers"])
+    try:
+        for round_number in itertools.count():
+            new = replications - counts[alive[0]]
+            results = run_replications(pool, fleets[alive], new, seed.spawn(1)[0], unit_rates, crane_capex)
+            sums[alive] += results.sum(axis=1)
+            counts[alive] += new
+
+            means = sums[alive] / counts[alive, None]
+            scores = score(means)
+            df = pd.DataFrame(fleets[alive], columns=list(SEARCH_SPACE))
+            df[KPIS] = means
+            df["score"] = scores
+            df["replications"] = replications
+            df["round"] = round_number
+            rounds.append(df)
+            print(f"round {round_number}: {len(alive)} fleets x {replications} replications")
+
+            if replications >= CONFIG["max_replications"] or len(alive) == 1:
+                break
+            keep = max(1, len(alive) // eta)
+            alive = alive[np.argsort(scores, kind="stable")[:keep]]
+            replications = min(replications * eta, CONFIG["max_replications"])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return pd.concat(rounds, ignore_index=True)
+
+if __name__ == "__main__":
+    UNIT_RATES = load_unit_rates(CONFIG["unit_rates"])
+    CRANE_CAPEX = load_crane_capex(CONFIG["capex_xlsx"])
+
+    # Every combination of the fleet sizes, one row per fleet
+    FLEETS = np.array(list(itertools.product(*SEARCH_SPACE.values())))
+
+    rounds = successive_halving(FLEETS, UNIT_RATES, CRANE_CAPEX, np.random.SeedSequence(CONFIG["seed"]))
+
+    # The fleets of the last round, best first
+    final = rounds[rounds["round"] == rounds["round"].max()].sort_values("score")
+    final["meets_targets"] = (final[list(TARGETS)] <= pd.Series(TARGETS)).all(axis=1)
+
+    with pd.ExcelWriter(CONFIG["output_xlsx"], engine="xlsxwriter") as xlw:
+        final.to_excel(xlw, sheet_name="Best_fleets", index=False)
+        rounds.to_excel(xlw, sheet_name="All_rounds", index=False)
+
+    print(f"best fleet for {CONFIG['teu_per_year']:,} TEU/yr:")
+    print(final.head(1).T.to_string(header=False))
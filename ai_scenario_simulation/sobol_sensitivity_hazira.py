@@ -0,0 +1,309 @@
+'''
+sobol_sensitivity_hazira.py
+Global (Sobol) sensitivity analysis of the annual KPIs and Opex
+to the simulation parameters and the AI scenario multipliers.
+
+All parameters are varied at once over the ranges in PARAMETERS,
+using Saltelli's design: two independent sample matrices A and B,
+and for every parameter i a matrix AB_i equal to A with column i
+taken from B. That is N * (d + 2) model evaluations for N samples
+and d parameters. The vessel, crane and gate models are the batched
+ones of batch_models_hazira.py, and the chunks of the design are
+run in parallel worker processes.
+
+The evaluations of base row j (A_j, B_j and every AB_i,j) use common
+random numbers: their random streams are all seeded from the key j,
+whichever chunk they run in. The differences between them are then due
+to the parameters alone rather than to simulation noise, which would
+otherwise inflate the total-order indices of every parameter.
+
+For every output the script reports the first-order index S1
+(share of the output variance explained by the parameter alone) and
+the total-order index ST (share including all its interactions),
+each with a bootstrap confidence interval.
+'''
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "simulation_tasks"))
+import batch_models_hazira as models
+from compute_savings_hazira import CONFIG as SAVINGS_CONFIG, load_unit_rates, unit_cost
+
+CONFIG = {
+    "unit_rates" : SAVINGS_CONFIG["unit_rates"],
+    "output_xlsx" : Path("Sobol_Indices_Hazira.xlsx"),
+    "samples" : 1024,       # N, a power of two suits the Sobol sequence
+    "chunk_size" : 256,     # Model evaluations per task sent to a worker
+    "workers" : os.cpu_count(),
+    "bootstrap" : 1000,     # Resamples for the confidence intervals
+    "confidence" : 0.95,
+    "seed" : 2025
+}
+
+# (low, high) range of each parameter. The simulation parameters are centred
+# on the values in simulate_*_hazira.py and the multipliers span the
+# scenarios in Scenario_Parameters_Hazira.json.
+PARAMETERS = {
+    "arrivals_per_year" : (1000, 1400),
+    "vessel_service_mu" : (20, 26),
+    "vessel_service_sigma" : (3, 6),
+    "vessel_delay_prob" : (.05, .2),
+    "crane_weibull_k" : (1.2, 2.5),
+    "crane_mean_interarrival" : (9, 15),
+    "gate_trucks_per_day" : (120, 200),
+    "gate_service_mu" : (9, 13),
+    "gate_peak_surge" : (.1, .4),
+    "vessel_service_time" : (.8, 1.0),
+    "crane_downtime" : (.85, 1.0),
+    "gate_speed" : (1.0, 1.1)
+}
+
+OUTPUTS = ["mean_wait_hrs", "crane_downtime_hrs", "gate_mean_queue", "annual_cost"]
+
+# The models and the distributions they draw from; each pair has its own stream per base row
+MODELS = ["vessels", "cranes", "gate"]
+DRAWS = ["exponential", "normal", "random", "uniform", "weibull", "poisson"]
+
+class CommonRandomNumbers:
+    '''
+    Stands in for the numpy.random.Generator of one batched model so that
+    the rows of a batch that belong to the same base row get the same
+    random numbers.
+    Every distribution has its own stream per base row, seeded by
+    SeedSequence(entropy, spawn_key=spawn_key + (j, model, distribution)),
+    from which standard variates are drawn and then scaled by the
+    parameters of each row. The variates are drawn with the last axis
+    (the number of calls, or of failures, which depends on the batch)
+    first, so a row gets the same variates in a batch of any size.
+    '''
+
+    def __init__(self, seed, rows, model):
+        '''
+        Parameters
+        seed: numpy.random.SeedSequence of the model evaluations
+        rows: base row of every row of the batch
+        model: name of the model, one of MODELS
+        '''
+        self.seed = seed
+        self.groups, self.index = np.unique(rows, return_inverse=True)
+        self.model = MODELS.index(model)
+        self.streams = {}
+
+    def standard(self, draw, variate, shape):
+        '''
+        Standard variates (a Generator method) for one distribution, shape
+        (batch,) + shape[1:], the same for the rows of the same base row.
+        '''
+        values = []
+        for j in self.groups:
+            key = (int(j), self.model, DRAWS.index(draw))
+            if key not in self.streams:
+                self.streams[key] = np.random.default_rng(
+                    np.random.SeedSequence(self.seed.entropy, spawn_key=self.seed.spawn_key + key))
+            values.append(getattr(self.streams[key], variate)(shape[:0:-1]).T)
+        return np.stack(values)[self.index]
+
+    def exponential(self, scale=1.0, size=None):
+        shape = np.broadcast_shapes(size or (), np.shape(scale))
+        return scale * self.standard("exponential", "standard_exponential", shape)
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        shape = np.broadcast_shapes(size or (), np.shape(loc), np.shape(scale))
+        return loc + scale * self.standard("normal", "standard_normal", shape)
+
+    def random(self, size=None):
+        return self.standard("random", "random", np.broadcast_shapes(size or ()))
+
+    def uniform(self, low=0.0, high=1.0, size=None):
+        shape = np.broadcast_shapes(size or (), np.shape(low), np.shape(high))
+        return low + (high - low) * self.standard("uniform", "random", shape)
+
+    def weibull(self, a, size=None):
+        # As Generator.weibull, a standard exponential to the power 1/a
+        shape = np.broadcast_shapes(size or (), np.shape(a))
+        return self.standard("weibull", "standard_exponential", shape) ** (1 / np.asarray(a))
+
+    def poisson(self, lam=1.0, size=None):
+        # Inverse transform of a uniform, so rows with the same mean get the same count.
+        # The means of a batch take few distinct values (one or two per row), so the cdf
+        # is tabulated for each of them and every count found by one searchsorted.
+        shape = np.broadcast_shapes(size or (), np.shape(lam))
+        u = self.standard("poisson", "random", shape)
+        means, which = np.unique(np.broadcast_to(lam, shape), return_inverse=True)
+        k = np.arange(int(means.max() + 10 * np.sqrt(means.max()) + 10))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_pmf = np.where(k > 0, k * np.log(means)[:, None], 0) - means[:, None] - np.cumsum(np.log(np.maximum(k, 1)))
+        cdf = np.cumsum(np.exp(log_pmf), axis=1)
+        # Table i is shifted by i so the tables are one sorted array
+        shift = np.arange(len(means))
+        position = np.searchsorted((cdf + shift[:, None]).ravel(), u + which.reshape(shape), side="left")
+        return np.minimum(position - which.reshape(shape) * len(k), len(k) - 1)
+
+def saltelli_design(n, rng):
+    '''
+    Unit hypercube samples for Saltelli's design.
+    A scrambled Sobol sequence is used when scipy is installed,
+    plain uniform random numbers otherwise.
+    Parameters
+    n: number of base samples N
+    rng: numpy.random.Generator
+    Returns
+    A, B: arrays of shape (N, d)
+    AB: array of shape (d, N, d), AB[i] is A with column i from B
+    '''
+    d = len(PARAMETERS)
+    try:
+        from scipy.stats import qmc
+        base = qmc.Sobol(2 * d, scramble=True, seed=rng).random(n)
+    except ImportError:
+        base = rng.random((n, 2 * d))
+    A, B = base[:, :d], base[:, d:]
+
+    AB = np.repeat(A[None, :, :], d, axis=0)
+    AB[np.arange(d), :, np.arange(d)] = B.T
+    return A, B, AB
+
+def scale_to_ranges(unit):
+    '''
+    Maps unit hypercube samples (..., d) to the parameter ranges.
+    '''
+    low, high = np.array(list(PARAMETERS.values()), dtype=float).T
+    return low + unit * (high - low)
+
+def evaluate(X, rows, seed, unit_rates):
+    '''
+    Runs the batched models and the cost model for one chunk of the design.
+    Parameters
+    X: parameter values, shape (B, d) in the order of PARAMETERS
+    rows: base row of every row of X, the key of its random numbers
+    seed: numpy.random.SeedSequence of the model evaluations
+    unit_rates: from load_unit_rates
+    Returns
+    array of shape (B, len(OUTPUTS))
+    '''
+    p = dict(zip(PARAMETERS, X.T))
+
+    vessels = models.simulate_vessels(CommonRandomNumbers(seed, rows, "vessels"), p["arrivals_per_year"], p["vessel_service_mu"],
+                                      p["vessel_service_sigma"], p["vessel_delay_prob"],
+                                      service_multiplier=p["vessel_service_time"])
+    cranes = models.simulate_cranes(CommonRandomNumbers(seed, rows, "cranes"), p["crane_weibull_k"], p["crane_mean_interarrival"],
+                                    downtime_multiplier=p["crane_downtime"])
+    gate = models.simulate_gate(CommonRandomNumbers(seed, rows, "gate"), p["gate_trucks_per_day"], p["gate_service_mu"],
+                                peak_surge=p["gate_peak_surge"], speed_multiplier=p["gate_speed"])
+
+    # Same metrics as load_metrics_xlsx in compute_savings_hazira.py, one column per evaluation
+    metrics = pd.DataFrame([
+        vessels["service_hrs"],
+        cranes["quay_hours"],
+        cranes["yard_hours"],
+        gate["trucks_processed"]
+    ], index=["vessel_service_hr", "quay_crane", "yard_crane", "truck_entry"])
+    annual_cost = unit_cost(metrics, unit_rates).sum().to_numpy(dtype=float)
+
+    return np.column_stack([
+        vessels["mean_wait_hrs"],
+        cranes["quay_downtime_hrs"] + cranes["yard_downtime_hrs"],
+        gate["mean_queue"],
+        annual_cost
+    ])
+
+def evaluate_design(X, rows, unit_rates, seed):
+    '''
+    Evaluates every row of X, split into chunks that run in parallel.
+    The random numbers of a row depend only on seed (a SeedSequence) and
+    its base row in rows, not on the chunk it is evaluated in.
+    '''
+    splits = max(1, -(-len(X) // CONFIG["chunk_size"]))
+    chunks = np.array_split(X, splits)
+    args = (chunks, np.array_split(rows, splits), [seed] * splits, [unit_rates] * splits)
+
+    if CONFIG["workers"] == 1:
+        return np.concatenate(list(map(evaluate, *args)))
+    with ProcessPoolExecutor(max_workers=CONFIG["workers"]) as pool:
+        return np.concatenate(list(pool.map(evaluate, *args)))
+
+def sobol_indices(fA, fB, fAB):
+    '''
+    First-order (Saltelli et al. 2010) and total-order (Jansen 1999)
+    estimators. Leading dimensions are carried through, so a batch of
+    bootstrap resamples is estimated at once.
+    Parameters
+    fA, fB: model outputs for A and B, shape (..., N)
+    fAB: model outputs for every AB_i, shape (d, ..., N)
+    Returns
+    S1, ST: arrays of shape (d, ...)
+    '''
+    # Centring the outputs keeps the first-order estimator stable for outputs
+    # with a large mean and a small variance, like the annual cost
+    both = np.concatenate([fA, fB], axis=-1)
+    mean = both.mean(axis=-1, keepdims=True)
+    fA, fB, fAB = fA - mean, fB - mean, fAB - mean
+    variance = both.var(axis=-1)
+    S1 = (fB * (fAB - fA)).mean(axis=-1) / variance
+    ST = 0.5 * ((fA - fAB) ** 2).mean(axis=-1) / variance
+    return S1, ST
+
+def bootstrap_indices(fA, fB, fAB, rng):
+    '''
+    Sobol indices of one output with bootstrap confidence intervals.
+    Returns
+    pd.DataFrame indexed by parameter
+    '''
+    S1, ST = sobol_indices(fA, fB, fAB)
+
+    # Every resample draws N rows with replacement, the same rows for A, B and AB_i
+    rows = rng.integers(len(fA), size=(CONFIG["bootstrap"], len(fA)))
+    S1_boot, ST_boot = sobol_indices(fA[rows], fB[rows], fAB[:, rows])
+
+    tail = (1 - CONFIG["confidence"]) / 2 * 100
+    S1_low, S1_high = np.percentile(S1_boot, [tail, 100 - tail], axis=1)
+    ST_low, ST_high = np.percentile(ST_boot, [tail, 100 - tail], axis=1)
+
+    return pd.DataFrame({
+        "S1" : S1,
+        "S1_low" : S1_low,
+        "S1_high" : S1_high,
+        "ST" : ST,
+        "ST_low" : ST_low,
+        "ST_high" : ST_high
+    }, index=pd.Index(list(PARAMETERS), name="parameter"))
+
+if __name__ == "__main__":
+    UNIT_RATES = load_unit_rates(CONFIG["unit_rates"])
+
+    seed = np.random.SeedSequence(CONFIG["seed"])
+    design_seed, model_seed, bootstrap_seed = seed.spawn(3)
+
+    n, d = CONFIG["samples"], len(PARAMETERS)
+    A, B, AB = saltelli_design(n, np.random.default_rng(design_seed))
+
+    # A, B and every AB_i are evaluated as one design of N * (d + 2) rows; row r is base row r % N
+    X = scale_to_ranges(np.concatenate([A, B, AB.reshape(d * n, d)]))
+    Y = evaluate_design(X, np.arange(len(X)) % n, UNIT_RATES, model_seed)
+    print(f"{len(X)} model evaluations")
+
+    rng = np.random.default_rng(bootstrap_seed)
+    frames = []
+    for j, output in enumerate(OUTPUTS):
+        fA, fB, fAB = Y[:n, j], Y[n:2 * n, j], Y[2 * n:, j].reshape(d, n)
+        df = bootstrap_indices(fA, fB, fAB, rng).reset_index()
+        df.insert(0, "output", output)
+        frames.append(df)
+    indices = pd.concat(frames, ignore_index=True)
+
+    samples = pd.DataFrame(X[:2 * n], columns=list(PARAMETERS))
+    samples[OUTPUTS] = Y[:2 * n]
+
+    with pd.ExcelWriter(CONFIG["output_xlsx"], engine="xlsxwriter") as xlw:
+        indices.to_excel(xlw, sheet_name="Sobol_indices", index=False)
+        # S1 and ST side by side, one row per parameter
+        indices.pivot(index="parameter", columns="output", values="S1").to_excel(xlw, sheet_name="First_order")
+        indices.pivot(index="parameter", columns="output", values="ST").to_excel(xlw, sheet_name="Total_order")
+        samples.to_excel(xlw, sheet_name="Samples_A_B", index=False)
+
+    print(indices.to_string(index=False))
@@ -0,0 +1,203 @@
+'''
+cross_dataset_checks.py
+Checks that the ingested datasets agree with each other, where
+run_qc.py only looks at each dataset on its own:
+- every container move starts after its vessel has left the berth
+- a crane is not broken down while it is in maintenance
+- the resources named in one dataset exist in the others
+- vessels at one berth, or downtimes of one crane, do not overlap
+
+Every rule is vectorized: it returns the rows it checked and a boolean
+mask of the ones that break it. Rows of two datasets are matched by
+sorted joins (pd.merge_asof, or positions of a key) rather than by
+comparing every pair in Python loops, so millions of rows are checked
+in seconds.
+
+Output Cross_Dataset_Checks_Hazira.csv has one row per rule with the
+number of rows checked and broken and a few examples of broken rows.
+Run after the ingest scripts (see dataset_store.py).
+'''
+
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from dataset_store import read_dataset
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "simulation_tasks"))
+from resources_hazira import QUAY, YARD, BERTH, ids, class_codes, class_names
+
+CONFIG = {
+    "report" : "Cross_Dataset_Checks_Hazira.csv",
+    "examples" : 3 # Broken rows shown per rule
+}
+
+BERTH_NAMES = class_names(BERTH)
+
+# Columns read from each dataset by the rules
+COLUMNS = {
+    'vessel_turnaround_hazira' : ['arrival_time', 'berth', 'start_time', 'end_time', 'vessel_type'],
+    'container_moves_hazira' : ['call_id', 'resource_assigned', 'move_start', 'move_end'],
+    'crane_uptime_hazira' : ['resource_name', 'downtime_start', 'downtime_end'],
+    'maintenance_events_hazira' : ['time', 'resource', 'maintenance_duration']
+}
+
+# Vectorized building blocks of the rules, each returns a boolean mask (True = broken)
+
+def ends_before_start(start, end):
+    return (end < start).to_numpy()
+
+def overlaps_within(df, key, start, end):
+    '''
+    Rows whose interval [start, end) overlaps an earlier interval with the same key.
+    Parameters
+    df: dataframe sorted by key and start
+    '''
+    # Latest end of the earlier intervals of the same key
+    latest_end = df.groupby(key, sort=False)[end].cummax().groupby(df[key], sort=False).shift()
+    return (df[start] < latest_end).to_numpy()
+
+def overlaps_between(left, right, key, start, end):
+    '''
+    Rows of left whose interval [start, end) overlaps any interval of right with the same key.
+    Both dataframes have the columns key, start and end.
+    Two sorted joins find the intervals of right that could overlap:
+    - the ones that started before each left interval: overlap if the
+      latest of their ends is after the left start (backward merge_asof
+      on the running max of their ends)
+    - the first one that starts during the left interval (forward merge_asof)
+    Returns
+    mask aligned with the rows of left
+    '''
+    right = right.sort_values(start, kind='stable')
+    right = right.assign(latest_end=right.groupby(key)[end].cummax())
+    probe = left[[key, start, end]].reset_index(drop=True)
+    probe['row'] = np.arange(len(probe))
+    probe = probe.sort_values(start, kind='stable')
+
+    earlier = pd.merge_asof(probe, right[[key, start, 'latest_end']].rename(columns={start : 'right_start'}),
+                            left_on=start, right_on='right_start', by=key, direction='backward')
+    later = pd.merge_asof(probe, right[[key, start]].rename(columns={start : 'right_start'}),
+                          left_on=start, right_on='right_start', by=key,
+                          direction='forward', allow_exact_matches=False)
+
+    broken = np.zeros(len(probe), dtype=bool)
+    broken[earlier['row'].to_numpy()] = (earlier['latest_end'] > earlier[start]).to_numpy()
+    broken[later['row'].to_numpy()] |= (later['right_start'] < later[end]).to_numpy()
+    return broken
+
+def unknown_ids(values, known):
+    return (~values.isin(known)).to_numpy()
+
+class Rule:
+    '''
+    A check across datasets.
+    '''
+    def __init__(self, name, dataset, check):
+        self.name = name
+
+        # The dataset whose rows are checked (and counted in the report)
+        self.dataset = dataset
+
+        # Function of the loaded datasets that returns (rows checked, mask of broken rows)
+        self.check = check
+
+# The rules, each a function of the dict of loaded datasets
+
+def container_calls(data):
+    '''
+    The container calls in the order they are numbered by call_id (from 1).
+    '''
+    vessels = data['vessel_turnaround_hazira'].sort_values('arrival_time', kind='stable')
+    return vessels[vessels['vessel_type'] == 'container'].reset_index(drop=True)
+
+def moves_after_vessel(data):
+    moves = data['container_moves_hazira']
+    calls = container_calls(data)
+    # call_id is a position in the container calls, so the join is an index lookup
+    position = moves['call_id'].to_numpy() - 1
+    known = (position >= 0) & (position < len(calls))
+    vessel_end = calls['end_time'].to_numpy()[np.where(known, position, 0)]
+    return moves, ~known | (moves['move_start'].to_numpy() < vessel_end)
+
+def moves_end_after_start(data):
+    moves = data['container_moves_hazira']
+    return moves, ends_before_start(moves['move_start'], moves['move_end'])
+
+def move_resources_known(data):
+    moves = data['container_moves_hazira']
+    return moves, unknown_ids(moves['resource_assigned'], data['crane_uptime_hazira']['resource_name'].unique())
+
+def vessel_times_ordered(data):
+    vessels = data['vessel_turnaround_hazira']
+    return vessels, (vessels['start_time'] < vessels['arrival_time']).to_numpy() \
+        | ends_before_start(vessels['start_time'], vessels['end_time'])
+
+def berth_not_double_booked(data):
+    vessels = data['vessel_turnaround_hazira'].sort_values(['berth', 'start_time'], kind='stable')
+    return vessels, overlaps_within(vessels, 'berth', 'start_time', 'end_time')
+
+def vessel_berths_known(data):
+    vessels = data['vessel_turnaround_hazira']
+    return vessels, unknown_ids(vessels['berth'], BERTH_NAMES)
+
+def downtimes_not_overlapping(data):
+    cranes = data['crane_uptime_hazira'].sort_values(['resource_name', 'downtime_start'], kind='stable')
+    return cranes, overlaps_within(cranes, 'resource_name', 'downtime_start', 'downtime_end')
+
+def maintenance_windows(data):
+    maintenance = data['maintenance_events_hazira']
+    return pd.DataFrame({'resource_name' : maintenance['resource'],
+                         'downtime_start' : maintenance['time'],
+                         'downtime_end' : maintenance['time'] + maintenance['maintenance_duration']})
+
+def downtime_outside_maintenance(data):
+    cranes = data['crane_uptime_hazira']
+    return cranes, overlaps_between(cranes, maintenance_windows(data), 'resource_name', 'downtime_start', 'downtime_end')
+
+def maintenance_resources_known(data):
+    '''
+    Every resource in maintenance is in the resource registry
+    (see resources_hazira.py), and every crane a crane of the crane dataset.
+    '''
+    maintenance = data['maintenance_events_hazira']
+    resource = ids(maintenance['resource'])
+    cranes = np.unique(ids(data['crane_uptime_hazira']['resource_name']))
+    is_crane = np.isin(class_codes(resource), [QUAY, YARD])
+    return maintenance, (resource < 0) | (is_crane & ~np.isin(resource, cranes))
+
+RULES = [Rule('container moves start after their vessel leaves the berth', 'container_moves_hazira', moves_after_vessel),
+         Rule('container moves end after they start', 'container_moves_hazira', moves_end_after_start),
+         Rule('container moves use a known crane', 'container_moves_hazira', move_resources_known),
+         Rule('vessels berth after arriving and leave after berthing', 'vessel_turnaround_hazira', vessel_times_ordered),
+         Rule('one vessel at a time at each berth', 'vessel_turnaround_hazira', berth_not_double_booked),
+         Rule('vessels use a known berth', 'vessel_turnaround_hazira', vessel_berths_known),
+         Rule('downtimes of a crane do not overlap', 'crane_uptime_hazira', downtimes_not_overlapping),
+         Rule('cranes do not break down during maintenance', 'crane_uptime_hazira', downtime_outside_maintenance),
+         Rule('maintenance is of known cranes and berths', 'maintenance_events_hazira', maintenance_resources_known)]
+
+def run_rules(data, rules=RULES, examples=CONFIG["examples"]):
+    '''
+    Runs every rule on the loaded datasets.
+    Parameters
+    data: dict of dataset name -> dataframe
+    Returns
+    dataframe with one row per rule
+    '''
+    report = []
+    for rule in rules:
+        rows, broken = rule.check(data)
+        broken_rows = rows[broken]
+        report.append({'rule' : rule.name,
+                       'dataset' : rule.dataset,
+                       'rows_checked' : len(rows),
+                       'rows_broken' : int(broken.sum()),
+                       'percent_broken' : round(100 * broken.mean(), 3) if len(rows) else 0,
+                       'examples' : broken_rows.head(examples).to_dict('records')})
+    return pd.DataFrame(report)
+
+if __name__ == "__main__":
+    data = {name : read_dataset(name, columns=columns) for name, columns in COLUMNS.items()}
+    report = run_rules(data)
+    report.to_csv(CONFIG["report"], index=False)
+    print(report[['rule', 'rows_checked', 'rows_broken', 'percent_broken']].to_string(index=False))
@@ -0,0 +1,167 @@
+'''
+dataset_store.py
+A store for the ingested datasets, partitioned by dataset
+and by month of each dataset's time column.
+
+store/
+    crane_uptime_hazira/
+        _index.pkl          schema and min/max statistics of every partition
+        2025-01/
+            resource_name.pkl
+            downtime_start.pkl
+            ...
+        2025-02/
+        ...
+
+Each column of a partition is pickled on its own, so a reader that
+asks for a time range and a few columns only opens the partitions
+whose statistics overlap the range, and only the requested columns
+of those partitions. For example, the crane downtime for March is
+read_dataset('crane_uptime_hazira', '2025-03-01', '2025-04-01',
+             columns=['resource_name', 'duration'])
+'''
+
+import os
+import pickle
+import shutil
+import pandas as pd
+
+STORE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'store')
+INDEX_FILE = '_index.pkl'
+
+# Partition for rows whose time is missing
+NO_TIME_PARTITION = 'no-time'
+
+def dataset_dir(name, root=STORE_ROOT):
+    return os.path.join(root, name)
+
+def partition_stats(df):
+    '''
+    Computes the number of rows and the min/max of every
+    column that can be ordered (numbers, dates and durations).
+    Parameters
+    df: the rows of one partition
+    Returns
+    dictionary of statistic -> value
+    '''
+    stats = {'rows' : len(df)}
+    for col in df.columns:
+        kind = df[col].dtype.kind
+        if kind in 'iufmM': # integer, unsigned, float, timedelta, datetime
+            stats[f'{col}_min'] = df[col].min()
+            stats[f'{col}_max'] = df[col].max()
+    return stats
+
+def write_dataset(df, name, time_col, root=STORE_ROOT):
+    '''
+    Writes a dataframe to the store, replacing any earlier version
+    of the dataset, with one partition per month of time_col.
+    Parameters
+    df: dataframe with its schema already enforced
+    name: name of the dataset e.g. 'gate_entries_hazira'
+    time_col: datetime column to partition on
+    root: directory of the store
+    '''
+    path = dataset_dir(name, root)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+
+    # Month of each row, e.g. '2025-03'
+    months = df[time_col].dt.strftime('%Y-%m').fillna(NO_TIME_PARTITION)
+
+    partitions = {}
+    for month, part in df.groupby(months, sort=True):
+        part = part.reset_index(drop=True)
+        os.makedirs(os.path.join(path, month))
+        for col in part.columns:
+            part[col].to_pickle(os.path.join(path, month, f'{col}.pkl'))
+        partitions[month] = partition_stats(part)
+
+    index = {
+        'time_col' : time_col,
+        'columns' : list(df.columns),
+        'dtypes' : {col : str(dtype) for col, dtype in df.dtypes.items()},
+        'partitions' : pd.DataFrame.from_dict(partitions, orient='index')
+    }
+    with open(os.path.join(path, INDEX_FILE), 'wb') as file:
+        pickle.dump(index, file)
+
+def read_index(name, root=STORE_ROOT):
+    '''
+    Returns the schema and partition statistics of a dataset.
+    '''
+    path = os.path.join(dataset_dir(name, root), INDEX_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'{name} is not in the store {root}, run its ingest script first')
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+def partitions_for(index, start=None, end=None):
+    '''
+    Names of the partitions whose time column may hold
+    values in [start, end), judged by their min/max statistics.
+    '''
+    stats = index['partitions']
+    time_col = index['time_col']
+    keep = pd.Series(True, index=stats.index)
+
+    # Rows without a time can never match a time range
+    if start is not None or end is not None:
+        keep &= stats.index != NO_TIME_PARTITION
+    if start is not None:
+        keep &= stats[f'{time_col}_max'] >= pd.Timestamp(start)
+    if end is not None:
+        keep &= stats[f'{time_col}_min'] < pd.Timestamp(end)
+    return list(stats.index[keep.to_numpy()])
+
+def read_dataset(name, start=None, end=None, columns=None, root=STORE_ROOT):
+    '''
+    Reads the rows of a dataset whose time column lies in [start, end),
+    opening only the partitions and columns that are needed.
+    Parameters
+    name: name of the dataset e.g. 'crane_uptime_hazira'
+    start, end: time range (anything accepted by pd.Timestamp), or None for no bound
+    columns: list of columns to read, or None for all of them
+    root: directory of the store
+    Returns
+    pd.DataFrame
+    '''
+    index = read_index(name, root)
+    time_col = index['time_col']
+    columns = list(index['columns']) if columns is None else list(columns)
+
+    missing = set(columns) - set(index['columns'])
+    if missing:
+        raise KeyError(f'{name} has no columns {missing}')
+
+    # The time column is needed to trim the rows of partitions that straddle start or end
+    trim = (start is not None or end is not None)
+    to_read = columns + [time_col] if trim and time_col not in columns else columns
+
+    frames = []
+    for partition in partitions_for(index, start, end):
+        part_dir = os.path.join(dataset_dir(name, root), partition)
+        frames.append(pd.DataFrame({col : pd.read_pickle(os.path.join(part_dir, f'{col}.pkl')) for col in to_read}))
+
+    if not frames:
+        empty = pd.DataFrame({col : pd.Series(dtype=index['dtypes'][col]) for col in to_read})
+        return empty[columns]
+
+    df = pd.concat(frames, ignore_index=True)
+    if trim:
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= df[time_col] >= pd.Timestamp(start)
+        if end is not None:
+            mask &= df[time_col] < pd.Timestamp(end)
+        df = df[mask].reset_index(drop=True)
+    return df[columns]
+
+def list_datasets(root=STORE_ROOT):
+    '''
+    Names of all datasets in the store.
+    '''
+    if not os.path.exists(root):
+        return []
+    return sorted(d for d in os.listdir(root) if os.path.exists(os.path.join(root, d, INDEX_FILE)))
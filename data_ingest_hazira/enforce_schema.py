@@ -4,15 +4,16 @@ Function to run check on all a csv file to ensure
 that necessary columns are present.
 '''
 import pandas as pd
+from dataset_store import write_dataset
 
 def enforce_schema(file, name, SCHEMA):
     '''
     Parameters
     file: name of .csv file
-    name: desired output pickle name
-    SCHEMA: dictionary with columns and dtypes
+    name: desired dataset name in the store
+    SCHEMA: dictionary with columns, dtypes and the datetime column to partition on
     Returns
-    dataframe and exports it to .pkl
+    dataframe and exports it to the month-partitioned store (see dataset_store.py)
     '''
     df = pd.read_csv(file)
 
@@ -24,6 +25,6 @@ def enforce_schema(file, name, SCHEMA):
     # Set the columns to be their given types
     df = df[SCHEMA['columns']].astype(SCHEMA['dtypes'])
 
-    df.to_pickle(f'{name}.pkl')
+    write_dataset(df, name, SCHEMA['partition_on'])
 
     return df
\ No newline at end of file
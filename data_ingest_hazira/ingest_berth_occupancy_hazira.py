@@ -14,7 +14,8 @@ SCHEMA = {
                 'MP3' : 'float64',
                 'MP4' : 'float64',
                 'CT1' : 'float64',
-                'CT2' : 'float64'}
+                'CT2' : 'float64'},
+    'partition_on' : 'time'
 }
 
 file = '../simulation_tasks/berth_occupancy_hazira.csv'
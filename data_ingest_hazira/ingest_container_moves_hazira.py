@@ -14,7 +14,8 @@ SCHEMA = {
                 'resource_assigned' : 'string',
                 'move_start' : 'datetime64[ns]',
                 'move_end' : 'datetime64[ns]',
-                'move_duration' : 'timedelta64[ns]'}
+                'move_duration' : 'timedelta64[ns]'},
+    'partition_on' : 'move_start'
 }
 
 file = '../simulation_tasks/container_moves_hazira.csv'
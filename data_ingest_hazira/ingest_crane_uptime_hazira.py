@@ -11,7 +11,8 @@ SCHEMA = {
     'dtypes' : {'resource_name' : 'string',
                 'downtime_start' : 'datetime64[ns]',
                 'downtime_end' : 'datetime64[ns]',
-                'duration' : 'timedelta64[ns]'}
+                'duration' : 'timedelta64[ns]'},
+    'partition_on' : 'downtime_start'
 }
 
 file = '../simulation_tasks/crane_uptime_hazira.csv'
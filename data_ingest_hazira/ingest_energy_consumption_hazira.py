@@ -9,7 +9,8 @@ import pandas as pd
 SCHEMA = {
     'columns' : ['time', 'energy_kWh'],
     'dtypes' : {'time' : 'datetime64[ns]',
-                'energy_kWh' : 'float64'}
+                'energy_kWh' : 'float64'},
+    'partition_on' : 'time'
 }
 
 file = '../simulation_tasks/energy_consumption_hazira.csv'
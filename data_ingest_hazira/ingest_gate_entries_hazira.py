@@ -11,7 +11,8 @@ SCHEMA = {
     'dtypes' : {'time' : 'datetime64[ns]',
                 'arrivals' : 'int64',
                 'num_processed' : 'int64',
-                'queue_length' : 'int64'}
+                'queue_length' : 'int64'},
+    'partition_on' : 'time'
 }
 
 file = '../simulation_tasks/gate_entries_hazira.csv'
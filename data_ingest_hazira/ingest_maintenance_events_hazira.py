@@ -10,7 +10,8 @@ SCHEMA = {
     'columns' : ['time', 'resource', 'maintenance_duration'],
     'dtypes' : {'time' : 'datetime64[ns]',
                 'resource' : 'string',
-                'maintenance_duration' : 'timedelta64[ns]'}
+                'maintenance_duration' : 'timedelta64[ns]'},
+    'partition_on' : 'time'
 }
 
 file = '../simulation_tasks/maintenance_events_hazira.csv'
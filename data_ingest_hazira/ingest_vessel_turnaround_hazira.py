@@ -7,13 +7,15 @@ from enforce_schema import enforce_schema
 import pandas as pd
 
 SCHEMA = {
-    'columns' : ['arrival_time', 'berth', 'service_time', 'delay_flag', 'start_time', 'end_time', 'turnaround'],
+    'columns' : ['arrival_time', 'berth', 'service_time', 'delay_flag', 'start_time', 'end_time', 'vessel_type'],
     'dtypes' : {'arrival_time' : 'datetime64[ns]',
                 'berth' : 'string',
                 'service_time' : 'timedelta64[ns]',
                 'delay_flag' : 'int64',
                 'start_time' : 'datetime64[ns]',
-                'end_time' : 'datetime64[ns]'}
+                'end_time' : 'datetime64[ns]',
+                'vessel_type' : 'string'},
+    'partition_on' : 'arrival_time'
 }
 
 file = '../simulation_tasks/vessel_turnaround_hazira.csv'
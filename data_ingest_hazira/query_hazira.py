@@ -0,0 +1,261 @@
+'''
+query_hazira.py
+Ad-hoc SQL over the simulation, ingest and scenario outputs,
+in this process and without a database server:
+
+    python query_hazira.py "SELECT berth, count(*) FROM vessel_turnaround_hazira GROUP BY berth"
+    python query_hazira.py --start 2025-07-01 --end 2025-10-01 "SELECT ..."
+    python query_hazira.py            (interactive: one query per line, empty line to quit)
+
+Tables:
+- every dataset of the store (see dataset_store.py), e.g. crane_uptime_hazira
+- yard_moves_hazira, the RTG moves of simulate_yard_hazira.py
+- scenario_vessel_turnaround, scenario_crane_uptime, scenario_gate_entries:
+  the re-simulated scenarios (apply_scenario_hazira.py --resimulate),
+  with a scenario column
+- savings_by_subprocess, kpi_changes, totals from Cost_Savings_Summary.xlsx
+Columns keep their types: times are timestamps and durations
+(service_time, duration, ...) are hours, so they can be summed and compared.
+
+A table is only loaded when a query names it, with only the columns the
+query mentions and, for store datasets, only the monthly partitions
+that overlap --start/--end (the time range and the projection are pushed
+down to read_dataset). Loaded tables are kept for the next queries of the
+session, so asking a second question costs no more parsing.
+
+DuckDB is used when it is installed, otherwise the standard library's
+sqlite3. The functions year(), month(), day() and hour() of timestamps
+work on both, e.g. the vessels delayed in the monsoon with the longest
+turnaround:
+    SELECT arrival_time, berth, service_time FROM vessel_turnaround_hazira
+    WHERE delay_flag = 1 AND month(arrival_time) IN (7, 8, 9)
+    ORDER BY service_time DESC LIMIT 10
+and RTG downtime during the peak gate hours:
+    SELECT c.resource_name, count(*) AS peak_hours FROM crane_uptime_hazira c
+    JOIN gate_entries_hazira g ON g.time > c.downtime_start AND g.time <= c.downtime_end
+    WHERE c.resource_name LIKE 'Yard%' AND hour(g.time) IN (8, 9, 10, 17, 18, 19)
+    GROUP BY c.resource_name
+'''
+
+import re
+import sys
+import sqlite3
+import pandas as pd
+from pathlib import Path
+from dataset_store import STORE_ROOT, list_datasets, read_index, read_dataset
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Outputs that are not in the store: csv files (with the time column to filter on) and workbooks
+CSV_TABLES = {
+    'yard_moves_hazira' : (ROOT / 'simulation_tasks' / 'yard_moves_hazira.csv', 'move_start')
+}
+SCENARIO_RUNS = ROOT / 'ai_scenario_simulation' / 'scenario_runs'
+SCENARIO_TABLES = {
+    'scenario_vessel_turnaround' : ('vessel_turnaround_hazira.csv', 'arrival_time'),
+    'scenario_crane_uptime' : ('crane_uptime_hazira.csv', 'downtime_start'),
+    'scenario_gate_entries' : ('gate_entries_hazira.csv', 'time')
+}
+WORKBOOK_TABLES = {
+    'savings_by_subprocess' : (ROOT / 'ai_scenario_simulation' / 'Cost_Savings_Summary.xlsx', 'Savings_by_subprocess'),
+    'kpi_changes' : (ROOT / 'ai_scenario_simulation' / 'Cost_Savings_Summary.xlsx', 'KPI_changes'),
+    'totals' : (ROOT / 'ai_scenario_simulation' / 'Cost_Savings_Summary.xlsx', 'Totals')
+}
+
+# Columns of the csv outputs that hold times and durations
+TIME_COLUMNS = {'time', 'arrival_time', 'start_time', 'end_time', 'downtime_start', 'downtime_end',
+                'move_start', 'move_end', 'container_arrival'}
+DURATION_COLUMNS = {'service_time', 'duration', 'move_duration', 'maintenance_duration'}
+
+IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+def typed(df):
+    '''
+    Parses the times of a csv output and turns every duration into hours.
+    '''
+    for col in df.columns:
+        if col in TIME_COLUMNS and pd.api.types.is_string_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col])
+        if col in DURATION_COLUMNS and pd.api.types.is_string_dtype(df[col]):
+            df[col] = pd.to_timedelta(df[col])
+        if df[col].dtype.kind == 'm':
+            df[col] = df[col].dt.total_seconds() / 3600
+    return df
+
+def in_range(df, time_col, start, end):
+    if start is not None:
+        df = df[df[time_col] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df[time_col] < pd.Timestamp(end)]
+    return df
+
+def csv_header(path):
+    with open(path) as file:
+        return file.readline().strip().split(',')
+
+class Table:
+    '''
+    A table that can be queried: its columns and how to load some of them.
+    '''
+    def __init__(self, name, columns, load):
+        self.name = name
+        self.columns = columns
+
+        # Function of (columns, start, end) that returns the typed dataframe
+        self.load = load
+
+def store_table(name, root):
+    index = read_index(name, root)
+    def load(columns, start, end):
+        return typed(read_dataset(name, start, end, columns=columns, root=root))
+    return Table(name, list(index['columns']), load)
+
+def csv_table(name, path, time_col):
+    def load(columns, start, end):
+        # The time column is read as well when it is needed to filter the rows
+        usecols = columns + [time_col] if (start or end) and time_col not in columns else columns
+        df = typed(pd.read_csv(path, usecols=usecols))
+        return in_range(df, time_col, start, end)[columns]
+    return Table(name, csv_header(path), load)
+
+def scenario_table(name, file, time_col):
+    runs = sorted(path for path in SCENARIO_RUNS.glob(f'*/{file}'))
+    def load(columns, start, end):
+        frames = []
+        for path in runs:
+            read = [col for col in columns if col != 'scenario']
+            if (start or end) and time_col not in read:
+                read.append(time_col)
+            df = in_range(typed(pd.read_csv(path, usecols=read)), time_col, start, end)
+            frames.append(df.assign(scenario=path.parent.name))
+        return pd.concat(frames, ignore_index=True)[columns]
+    return Table(name, csv_header(runs[0]) + ['scenario'], load)
+
+def workbook_table(name, path, sheet):
+    def load(columns, start, end):
+        return pd.read_excel(path, sheet_name=sheet, usecols=columns)
+    return Table(name, list(pd.read_excel(path, sheet_name=sheet, nrows=0).columns), load)
+
+def find_tables(root=STORE_ROOT):
+    '''
+    Every output that exists, as a dict of table name -> Table.
+    '''
+    tables = {name : store_table(name, root) for name in list_datasets(root)}
+    for name, (path, time_col) in CSV_TABLES.items():
+        if path.exists():
+            tables[name] = csv_table(name, path, time_col)
+    for name, (file, time_col) in SCENARIO_TABLES.items():
+        if any(SCENARIO_RUNS.glob(f'*/{file}')):
+            tables[name] = scenario_table(name, file, time_col)
+    for name, (path, sheet) in WORKBOOK_TABLES.items():
+        if path.exists():
+            tables[name] = workbook_table(name, path, sheet)
+    return tables
+
+def connect():
+    '''
+    An in-memory database, DuckDB if it is installed, otherwise sqlite3
+    with the date part functions that DuckDB has built in.
+    '''
+    try:
+        import duckdb
+        return duckdb.connect()
+    except ImportError:
+        con = sqlite3.connect(':memory:')
+        # Timestamps are stored as 'YYYY-MM-DD HH:MM:SS' text
+        for function, part in [('year', slice(0, 4)), ('month', slice(5, 7)),
+                               ('day', slice(8, 10)), ('hour', slice(11, 13))]:
+            con.create_function(function, 1, lambda t, part=part : int(t[part]) if t else None, deterministic=True)
+        return con
+
+class QueryLayer:
+    '''
+    A session of queries over the outputs, loading tables as they are needed.
+    '''
+    def __init__(self, start=None, end=None, root=STORE_ROOT):
+        '''
+        Parameters
+        start, end: time range of the rows to load (anything accepted by pd.Timestamp), or None
+        root: directory of the dataset store
+        '''
+        self.start, self.end = start, end
+        self.tables = find_tables(root)
+        self.con = connect()
+        self.duckdb = not isinstance(self.con, sqlite3.Connection)
+        self.loaded = {} # Table name -> columns loaded so far
+
+    def needed(self, sql):
+        '''
+        The tables named in a query and the columns of each that it mentions.
+        '''
+        words = set(IDENTIFIER.findall(sql))
+        # Any * other than count(*) selects every column
+        star = '*' in re.sub(r'count\s*\(\s*\*\s*\)', '', sql, flags=re.IGNORECASE)
+        needed = {}
+        for name in words & set(self.tables):
+            columns = self.tables[name].columns
+            needed[name] = columns if star else [col for col in columns if col in words] or columns[:1]
+        return needed
+
+    def register(self, name, columns):
+        df = self.tables[name].load(columns, self.start, self.end)
+        if self.duckdb:
+            self.con.register(name, df)
+        else:
+            times = [col for col in df.columns if df[col].dtype.kind == 'M']
+            for col in times:
+                df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+            df.to_sql(name, self.con, index=False, if_exists='replace')
+            # sqlite has no zone maps, so time filters and range joins need an index
+            for col in times:
+                self.con.execute(f'CREATE INDEX "{name}_{col}" ON "{name}" ("{col}")')
+        self.loaded[name] = columns
+
+    def query(self, sql):
+        '''
+        Runs a query, loading any table (or column) it needs that is not loaded yet.
+        Returns
+        pd.DataFrame
+        '''
+        for name, columns in self.needed(sql).items():
+            loaded = self.loaded.get(name, [])
+            if not set(columns) <= set(loaded):
+                self.register(name, loaded + [col for col in columns if col not in loaded])
+        if self.duckdb:
+            return self.con.execute(sql).df()
+        return pd.read_sql_query(sql, self.con)
+
+def parse_args(argv):
+    '''
+    (start, end, sql) from the command line.
+    '''
+    start = end = None
+    rest = []
+    args = iter(argv)
+    for arg in args:
+        if arg == '--start':
+            start = next(args)
+        elif arg == '--end':
+            end = next(args)
+        else:
+            rest.append(arg)
+    return start, end, ' '.join(rest)
+
+if __name__ == "__main__":
+    start, end, sql = parse_args(sys.argv[1:])
+    session = QueryLayer(start, end)
+    if sql:
+        print(session.query(sql).to_string(index=False))
+    else:
+        print(f"tables: {', '.join(sorted(session.tables))}")
+        while True:
+            try:
+                sql = input('hazira> ').strip()
+            except EOFError:
+                break
+            if not sql:
+                break
+            try:
+                print(session.query(sql).to_string(index=False))
+            except Exception as error: # Keep the session (and its loaded tables) after a bad query
+                print(f'error: {error}')
@@ -4,14 +4,37 @@ Run quality checks: missingness ¡ 1 %,
 no invalid zeros, flag outliers (¿3σ), 
 and produce a PDF report summarizing 
 anomalies with charts.
+
+The pages of each dataset (a section of the report) are cached in
+CACHE_DIR with the QC results of the section, under the content hash
+of the dataset in the store and of this script. A run only re-computes and re-renders the sections
+whose dataset (or checks) changed, e.g. only S6 after re-ingesting
+gate_entries_hazira, and assembles the report from the cached sections.
+The section PDFs are joined with pypdf, a dependency of the project
+(pyproject.toml). If it is missing the run warns and falls back to
+keeping the figures of the sections, which are drawn into the report
+again: the data is still not read and the checks not re-run, but every
+page is rendered.
 '''
 
+import os
+import pickle
+import hashlib
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
+from dataset_store import read_dataset, dataset_dir
+
+try:
+    from pypdf import PdfWriter
+except ImportError:
+    PdfWriter = None
 
 TRUNCATE_ROWS = 4 # The maximum number of rows to display in any table
 
+REPORT = 'Data_Quality_Hazira_Report.pdf'
+CACHE_DIR = 'qc_cache' # One PDF and one results file per section
+
 def percent_missing(sim, fig):
     '''
     Creates a bargraph representing the percent of invalid zeros
@@ -27,12 +50,16 @@ def percent_missing(sim, fig):
     ax = fig.add_subplot()
     ax.bar(sim.df.columns, percent_missing)
     ax.set_title('Percent Missing Zeros in Each Column')
+    return dict(zip(sim.df.columns, percent_missing))
 
 def invalid_col(sim, fig):
     '''
     For each column to be checked, count the number of elements
     in violation and display some representative values.
+    Returns
+    dictionary of column -> number of invalid entries
     '''
+    invalid_counts = {}
     num_detections = len(sim.invalid_cols.keys()) # The number of checks that will be performed
     count = 1 # Tracks the current row that we will write into
     for col in sim.invalid_cols:
@@ -46,6 +73,7 @@ def invalid_col(sim, fig):
         # sim.invalid_cols is a dictionary that associates column titles with functions
         # that return true if an entry in that column is invalid
         invalid_rows = sim.df[sim.invalid_cols[col](sim.df[col])]
+        invalid_counts[col] = len(invalid_rows)
 
         if invalid_rows.empty:
             ax.text(.5, .5, f'No invalid entries in {col}', ha='center', va='center', fontsize=12)
@@ -62,6 +90,7 @@ def invalid_col(sim, fig):
             ax.table(cellText=cell_text, colLabels=col_labels, loc='center')
 
         count += 1
+    return invalid_counts
 
 def outlier_detection(sim, fig, col):
     '''
@@ -71,6 +100,8 @@ def outlier_detection(sim, fig, col):
     sim: a Simulation object
     fig: the figure to draw graph and table on
     col: column of sim.df to detect outliers in
+    Returns
+    the number of outliers
     '''
     
     # Calculate the mean and standard deviation of observed values
@@ -107,16 +138,8 @@ def outlier_detection(sim, fig, col):
 
         # Display a table
         ax2.table(cellText=cell_text, colLabels=col_labels, loc='center')
-    
+    return num_outliers
 
-# Read in dataframes from all simulations
-berth = pd.read_pickle('berth_occupancy_hazira.pkl')            # berth_occupancy_hazira.py
-container = pd.read_pickle('container_moves_hazira.pkl')        # container_moves_hazira.py
-crane = pd.read_pickle('crane_uptime_hazira.pkl')               # crane_uptime_hazira.py
-energy = pd.read_pickle('energy_consumption_hazira.pkl')        # energy_consumption_hazira.py
-gate = pd.read_pickle('gate_entries_hazira.pkl')                # gate_entries_hazira.py
-maintenance = pd.read_pickle('maintenance_events_hazira.pkl')   # maintenance_events_hazira.py
-turnaround = pd.read_pickle('vessel_turnaround_hazira.pkl')     # vessel_turnaround_hazira.py
 
 class Simulation:
     '''
@@ -124,11 +147,14 @@ class Simulation:
     and the potential valid datapoints for various components
     of the result
     '''
-    def __init__(self, name, df=None, invalid_cols={}, continuous_cols=[]):
+    def __init__(self, name, dataset, invalid_cols={}, continuous_cols=[]):
         self.name = name
 
-        # The dataframe associated with this simulation
-        self.df = df
+        # The name of the dataset in the store (see dataset_store.py)
+        self.dataset = dataset
+
+        # The dataframe is only read from the store when it is first used
+        self.data = None
 
         # The columns where zero entries are not permissible
         self.invalid_cols = invalid_cols
@@ -137,6 +163,21 @@ class Simulation:
         # exceeding three standard deviations
         self.continuous_cols = continuous_cols
 
+    @property
+    def df(self):
+        '''
+        The dataframe associated with this simulation
+        '''
+        if self.data is None:
+            self.data = read_dataset(self.dataset)
+        return self.data
+
+    def release(self):
+        '''
+        Drops the dataframe once this simulation's pages have been written.
+        '''
+        self.data = None
+
 # Different functions we will need to determine if a particular value is invalid
 def equal_zero(x):
     # Or less than zero would be invalid
@@ -144,10 +185,11 @@ def equal_zero(x):
 def neg(x):
     return x < 0
 def binary(x):
-    return x != 0 or x != 1
+    # Elementwise: anything other than 0 or 1 is invalid
+    return (x != 0) & (x != 1)
 
 SIMULATIONS = [Simulation(name='S2: Berth Occupancy Simulation',
-                          df=berth,
+                          dataset='berth_occupancy_hazira',
                           invalid_cols={'MP1' : equal_zero, 
                                         'MP2' : equal_zero,
                                         'MP3' : equal_zero,
@@ -156,30 +198,31 @@ SIMULATIONS = [Simulation(name='S2: Berth Occupancy Simulation',
                                         'CT2' : equal_zero},
                           continuous_cols=['MP1', 'MP2','MP3','MP4','CT1','CT2']),
                 Simulation(name='S3: Vessel Arrival & Turnaround',
-                           df=turnaround,
-                           invalid_cols={'service_time' : equal_zero},
+                           dataset='vessel_turnaround_hazira',
+                           invalid_cols={'service_time' : equal_zero,
+                                         'delay_flag' : binary},
                            continuous_cols=['service_time']),
                 Simulation(name='S4: Container Move Simulation',
-                           df=container,
+                           dataset='container_moves_hazira',
                            invalid_cols={'teu_handled' : equal_zero,
                                         'move_duration' : equal_zero},
                            continuous_cols=['teu_handled', 'move_duration']),
                 Simulation(name='S5: Crane & RTG Uptime & Downtime',
-                           df=crane,
+                           dataset='crane_uptime_hazira',
                            invalid_cols={'duration' : equal_zero},
                            continuous_cols=['duration']),
                 Simulation(name='S6: Gate-Entry Traffic',
-                           df=gate,
+                           dataset='gate_entries_hazira',
                            invalid_cols = {'arrivals' : neg,
                                           'num_processed' : neg,
                                           'queue_length' : neg},
                             continuous_cols = ['arrivals', 'num_processed', 'queue_length']),
                 Simulation(name='S7: Energy Consumption Profile',
-                           df=energy,
+                           dataset='energy_consumption_hazira',
                            invalid_cols = {'energy_kWh' : equal_zero},
                            continuous_cols = ['energy_kWh']),
                 Simulation(name='S8: Maintenance Event Simulation',
-                           df=maintenance,
+                           dataset='maintenance_events_hazira',
                            invalid_cols={'maintenance_duration' : equal_zero},
                            continuous_cols = ['maintenance_duration'])]
 
@@ -199,27 +242,122 @@ def new_page(title):
 
     return fig
 
-with PdfPages('Data_Quality_Hazira_Report.pdf') as pdf:
-    for sim in SIMULATIONS:
+def content_hash(sim):
+    '''
+    Hash of everything a section depends on: the files of its dataset
+    in the store and this script (the checks and how they are drawn).
+    '''
+    digest = hashlib.sha256()
+    with open(__file__, 'rb') as file:
+        digest.update(file.read())
+    path = dataset_dir(sim.dataset)
+    for folder, subfolders, files in sorted(os.walk(path)):
+        subfolders.sort()
+        for name in sorted(files):
+            digest.update(os.path.relpath(os.path.join(folder, name), path).encode())
+            with open(os.path.join(folder, name), 'rb') as file:
+                digest.update(file.read())
+    return digest.hexdigest()
+
+def section_paths(sim):
+    '''
+    The cached pages (PDF) and results (pickle) of a section.
+    '''
+    return os.path.join(CACHE_DIR, f'{sim.dataset}.pdf'), os.path.join(CACHE_DIR, f'{sim.dataset}.pkl')
+
+def cached_section(sim, key):
+    '''
+    The cached section if it is for this content hash, else None.
+    '''
+    pages, results = section_paths(sim)
+    if not os.path.exists(results):
+        return None
+    with open(results, 'rb') as file:
+        section = pickle.load(file)
+    # The report is joined from the section PDFs with pypdf, and drawn from the figures without it
+    usable = os.path.exists(pages) if PdfWriter is not None else len(section['figures']) > 0
+    return section if section['key'] == key and usable else None
+
+def render_section(sim, key):
+    '''
+    Runs the checks of a section and caches its results and pages.
+    Returns
+    dictionary of key, results (of every check) and figures (pickled, in page
+    order, only kept when the report is drawn from them)
+    '''
+    section = {'key' : key, 'results' : {}, 'figures' : []}
+    figures = []
+
+    fig = new_page(sim.name)
+    # Count the percent of zero values (when zeros are invalid) for each of such columns
+    section['results']['percent_missing'] = percent_missing(sim, fig)
+    figures.append(fig)
+
+    fig = new_page(sim.name)
+    section['results']['invalid'] = invalid_col(sim, fig)
+    figures.append(fig)
+
+    # Check for outliers in each column that we expect outliers
+    section['results']['outliers'] = {}
+    for col in sim.continuous_cols:
         fig = new_page(sim.name)
+        section['results']['outliers'][col] = outlier_detection(sim, fig, col)
+        figures.append(fig)
+    sim.release()
 
-        # Count the percent of zero values (when zeros are invalid) for each of such columns
-        percent_missing(sim, fig)
-        pdf.savefig(fig)
+    # Written under temporary names and renamed, so an interrupted run never leaves half a section
+    pages, results = section_paths(sim)
+    if PdfWriter is not None:
+        with PdfPages(f'{pages}.tmp') as pdf:
+            for fig in figures:
+                pdf.savefig(fig)
+        os.replace(f'{pages}.tmp', pages)
+    else:
+        section['figures'] = [pickle.dumps(fig) for fig in figures]
+    for fig in figures:
         plt.close(fig) # Clears the plot of this figure
 
-        fig = new_page(sim.name)
-        invalid_col(sim, fig)
-        pdf.savefig(fig)
-        plt.close(fig)
+    with open(f'{results}.tmp', 'wb') as file:
+        pickle.dump(section, file)
+    os.replace(f'{results}.tmp', results)
+    return section
+
+def assemble(sections, path=REPORT):
+    '''
+    Joins the pages of the sections into the report.
+    Parameters
+    sections: list of (sim, section) in report order
+    '''
+    if PdfWriter is None:
+        # Without pypdf the figures are drawn into the report, which still skips reading the data and the checks
+        with PdfPages(path) as pdf:
+            for _, section in sections:
+                for figure in section['figures']:
+                    fig = pickle.loads(figure)
+                    pdf.savefig(fig)
+                    plt.close(fig)
+        return
+    writer = PdfWriter()
+    for sim, _ in sections:
+        writer.append(section_paths(sim)[0])
+    with open(path, 'wb') as file:
+        writer.write(file)
 
-        # Check for outliers in each column that we expect outliers
-        for col in sim.continuous_cols:
-            fig = new_page(sim.name)
-            outlier_detection(sim, fig, col)
-            pdf.savefig(fig)
-            plt.close(fig)
+if __name__ == '__main__':
+    if PdfWriter is None:
+        print('Warning: pypdf is not installed (pip install pypdf), every page of the report is rendered again')
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    sections = []
+    for sim in SIMULATIONS:
+        key = content_hash(sim)
+        section = cached_section(sim, key)
+        print(f"{sim.dataset}: {'unchanged' if section is not None else 'checking'}")
+        if section is None:
+            section = render_section(sim, key)
+        sections.append((sim, section))
+    assemble(sections)
 
 '''
 Additional sanity checks that could be added:
+(checks across datasets are in cross_dataset_checks.py)
 '''
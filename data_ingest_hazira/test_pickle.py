@@ -1,28 +1,24 @@
 '''
 test_pickle.py
-Reads the pickled dataframes to ensure
-that they were recorded properly
+Reads the ingested dataframes back from the store
+to ensure that they were recorded properly
 '''
 
-import pandas as pd
+from dataset_store import read_dataset, read_index
 
-# ingest_berth_occupancy_hazira.py
-berth = pd.read_pickle('berth_occupancy_hazira.pkl')
+DATASETS = ['berth_occupancy_hazira',       # ingest_berth_occupancy_hazira.py
+            'container_moves_hazira',       # ingest_container_moves_hazira.py
+            'crane_uptime_hazira',          # ingest_crane_uptime_hazira.py
+            'energy_consumption_hazira',    # ingest_energy_consumption_hazira.py
+            'gate_entries_hazira',          # ingest_gate_entries_hazira.py
+            'maintenance_events_hazira',    # ingest_maintenance_events_hazira.py
+            'vessel_turnaround_hazira']     # ingest_vessel_turnaround_hazira.py
 
-# ingest_container_moves_hazira.py
-container = pd.read_pickle('container_moves_hazira.pkl')
+for name in DATASETS:
+    index = read_index(name)
+    df = read_dataset(name)
 
-# ingest_crane_uptime_hazira.py
-crane = pd.read_pickle('crane_uptime_hazira.pkl')
-
-# ingest_energy_consumption_hazira.py
-energy = pd.read_pickle('energy_consumption_hazira.pkl')
-
-# ingest_gate_entries_hazira.py
-gate = pd.read_pickle('gate_entries_hazira.pkl')
-
-# ingest_maintenance_events_hazira.py
-maintenance = pd.read_pickle('maintenance_events_hazira.pkl')
-
-# ingest_vessel_turnaround_hazira.py
-turnaround = pd.read_pickle('vessel_turnaround_hazira.pkl')
\ No newline at end of file
+    # Every row written to the partitions should be read back, with the schema it was written with
+    assert len(df) == index['partitions']['rows'].sum(), f'{name} lost rows'
+    assert {col : str(dtype) for col, dtype in df.dtypes.items()} == index['dtypes'], f'{name} changed dtypes'
+    print(f'{name}: {len(df)} rows in {len(index["partitions"])} partitions')
@@ -0,0 +1,368 @@
+'''
+financial_engine_hazira.py
+5 year cash flow, ROI/NPV/IRR/payback and sensitivity analysis
+for each AI scenario, computed in Python rather than by Excel.
+
+The model follows ROI_NPV_Payback_Hazira.xlsx and 5yr_CashFlow_Hazira.xlsx:
+- variable cost savings are read from compute_savings_hazira.py's Totals
+  sheet, scaled by the unit rate scalar and the improvement adjustment
+- fixed opex grows with inflation
+- capex is depreciated straight line to its salvage value
+- debt (a fixed share of capex) is repaid as an annuity
+- tax is charged on positive earnings before tax
+- free cash flow = net income + depreciation - principal repaid
+
+Every input that is varied in a sensitivity analysis may be given as an
+array, one entry per case, so thousands of cases (discount rate, capex
+overrun, savings realization, ...) are evaluated at once with NumPy
+instead of one Excel recalculation each.
+
+By default the savings are the scenario's savings_delta (baseline cost
+minus scenario cost) and the NPV includes the year 0 capex, so NPV > 0
+exactly when IRR > discount rate. With --workbook the engine reproduces
+the workbooks instead: the savings are the Totals column they look up
+(scenario_total_cost) and, as Excel's NPV(), only years 1..N are
+discounted.
+'''
+
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+YEARS = 5 # Length of the projection
+
+CONFIG = {
+    "assumptions_xlsx" : Path("CapEx_OpEx_Assumptions_Hazira.xlsx"),
+    "savings_xlsx" : Path("../ai_scenario_simulation/Cost_Savings_Summary.xlsx"),
+    "output_xlsx" : Path("Financial_Projection_Hazira.xlsx"),
+    # The Totals column used as the annual variable cost savings
+    "savings_column" : "savings_delta",
+    # The column that the ROI workbook looks up instead (Totals!B), used with --workbook
+    "workbook_savings_column" : "scenario_total_cost"
+}
+
+WORKBOOK = "--workbook" in sys.argv # Reproduce the workbooks' figures rather than the corrected ones
+
+# Which useful life in the Assumptions sheet applies to each capex asset
+ASSET_LIFE = {
+    "quay_crane" : "crane_depreciation",
+    "yard_crane" : "crane_depreciation",
+    "yard_pavement_upgrade" : "yard_depreciation"
+}
+
+# Base value and (low, high) range of each sensitivity driver.
+# unit_rate_scalar and improvement_adj_pp are the two drivers of the workbook's data tables.
+DRIVERS = {
+    "discount_rate" : (None, (0.08, 0.12)), # None: base value comes from the Assumptions sheet
+    "capex_overrun" : (0.0, (0.0, 0.30)),
+    "savings_realization" : (1.0, (0.8, 1.0)),
+    "unit_rate_scalar" : (1.0, (0.8, 1.2)),
+    "improvement_adj_pp" : (0.0, (-0.05, 0.05))
+}
+
+# Number of values of each driver in the full sensitivity grid
+GRID_POINTS = 21
+
+def load_assumptions(path: Path) -> dict:
+    '''
+    Reads the capex, fixed opex and financing assumptions in one pass.
+    Parameters
+    path (Path): path to CapEx_OpEx_Assumptions_Hazira.xlsx
+    Returns
+    dict with 'capex' (pd.Series of total cost per asset),
+    'fixed_opex' (float) and every parameter of the Assumptions sheet
+    '''
+    sheets = pd.read_excel(path, sheet_name=["Capex", "Assumptions"])
+
+    capex = sheets["Capex"]
+    assets = capex[capex["asset"].isin(ASSET_LIFE.keys())]
+
+    fixed = capex.dropna(subset=["fixed_opex"]).set_index("fixed_opex")["rate"]
+
+    params = sheets["Assumptions"].dropna(subset=["parameter"]).set_index("parameter")["value"]
+
+    assumptions = {
+        "capex" : assets.set_index("asset")["total_cost"].astype(float),
+        "fixed_opex" : float(fixed["subtotal_fixed"])
+    }
+    for name, value in params.items():
+        # Numbers are stored as numbers, depreciation_method is text
+        try:
+            assumptions[name] = float(value)
+        except ValueError:
+            assumptions[name] = value
+    return assumptions
+
+def load_savings(path: Path, column: str) -> pd.Series:
+    '''
+    Returns the annual variable cost savings of each scenario
+    from the Totals sheet of compute_savings_hazira.py.
+    '''
+    totals = pd.read_excel(path, sheet_name="Totals")
+    return totals.set_index("scenario")[column].astype(float)
+
+def annuity_schedule(principal, rate, tenor, years=YEARS):
+    '''
+    Interest and principal repaid in each year of an annuity loan.
+    Parameters
+    principal: array of loan amounts, one per case
+    rate: interest rate
+    tenor: number of years
+    years: number of years to return
+    Returns
+    (interest, repaid): arrays of shape (cases, years)
+    '''
+    principal = np.asarray(principal, dtype=float)[:, None]
+    t = np.arange(1, years + 1)[None, :]
+
+    # Same as Excel PMT(rate, tenor, -principal)
+    payment = principal * rate / (1 - (1 + rate) ** -tenor)
+
+    # Balance at the start of year t after t-1 payments
+    growth = (1 + rate) ** (t - 1)
+    opening = principal * growth - payment * (growth - 1) / rate
+
+    interest = opening * rate
+    repaid = np.where(t <= tenor, payment - interest, 0)
+    interest = np.where(t <= tenor, interest, 0)
+    return interest, repaid
+
+def project(assumptions, savings, discount_rate=None, capex_overrun=0.0,
+            savings_realization=1.0, unit_rate_scalar=1.0, improvement_adj_pp=0.0,
+            years=YEARS, include_outlay=True):
+    '''
+    Projects the cash flows of every case and evaluates them.
+    Every argument after assumptions may be a scalar or an array
+    with one entry per case; they are broadcast together.
+    Parameters
+    assumptions: dict from load_assumptions
+    savings: annual variable cost savings before adjustment
+    discount_rate: rate for NPV (default: the Assumptions sheet)
+    capex_overrun: fraction by which capex exceeds the plan (0.1 = 10 % over)
+    savings_realization: fraction of the savings that is actually realized
+    unit_rate_scalar, improvement_adj_pp: the two drivers of the workbook's data tables
+    years: length of the projection
+    include_outlay: whether the NPV includes the year 0 capex (False: as Excel's NPV() in the workbook)
+    Returns
+    dict of arrays: 'free_cash_flow' and 'cumulative_fcf' with shape (cases, years + 1),
+    the yearly lines of the cash flow statement with shape (cases, years),
+    and 'npv', 'irr', 'roi', 'payback' with shape (cases,)
+    '''
+    if discount_rate is None:
+        discount_rate = assumptions["discount_rate"]
+
+    savings, discount_rate, capex_overrun, savings_realization, unit_rate_scalar, improvement_adj_pp = (
+        np.broadcast_arrays(*[np.atleast_1d(np.asarray(x, dtype=float)) for x in
+                              (savings, discount_rate, capex_overrun, savings_realization,
+                               unit_rate_scalar, improvement_adj_pp)]))
+    t = np.arange(1, years + 1)[None, :]
+
+    # Capex, scaled by any overrun
+    capex = assumptions["capex"]
+    total_capex = capex.sum() * (1 + capex_overrun)
+
+    # Straight line depreciation of each asset down to its salvage value
+    depreciation = np.zeros((len(savings), years))
+    for asset, cost in capex.items():
+        life = assumptions[ASSET_LIFE[asset]]
+        yearly = cost * (1 + capex_overrun) * (1 - assumptions["salvage_value"]) / life
+        depreciation += np.where(t <= life, yearly[:, None], 0)
+
+    interest, repaid = annuity_schedule(total_capex * assumptions["debt"],
+                                        assumptions["cost_of_debt"],
+                                        assumptions["loan_tenor"], years)
+
+    variable_savings = (savings * savings_realization * unit_rate_scalar * (1 + improvement_adj_pp))[:, None]
+    fixed_opex = assumptions["fixed_opex"] * (1 + assumptions["inflation"]) ** (t - 1)
+
+    ebitda = variable_savings - fixed_opex
+    ebit = ebitda - depreciation
+    ebt = ebit - interest
+    tax = np.maximum(0, ebt * assumptions["corporate_tax"])
+    net_income = ebt - tax
+    fcf = np.hstack([-total_capex[:, None], net_income + depreciation - repaid])
+    cumulative = np.cumsum(fcf, axis=1)
+
+    # The year 0 outlay is undiscounted; the workbook's NPV() leaves it out
+    discount = (1 + discount_rate[:, None]) ** -np.arange(years + 1)[None, :]
+    npv = (fcf * discount).sum(axis=1) if include_outlay else (fcf[:, 1:] * discount[:, 1:]).sum(axis=1)
+
+    # Payback is the first year with a positive cumulative cash flow (NaN if never)
+    positive = cumulative[:, 1:] > 0
+    payback = np.where(positive.any(axis=1), positive.argmax(axis=1) + 1, np.nan)
+
+    return {
+        "variable_cost_savings" : np.broadcast_to(variable_savings, ebitda.shape),
+        "fixed_opex" : np.broadcast_to(fixed_opex, ebitda.shape),
+        "ebitda" : ebitda,
+        "depreciation" : depreciation,
+        "ebit" : ebit,
+        "interest_expense" : interest,
+        "ebt" : ebt,
+        "corp_tax" : tax,
+        "net_income" : net_income,
+        "principal_repayment" : repaid,
+        "free_cash_flow" : fcf,
+        "cumulative_fcf" : cumulative,
+        "npv" : npv,
+        "irr" : irr(fcf),
+        "roi" : net_income.sum(axis=1) / total_capex,
+        "payback" : payback
+    }
+
+def irr(cash_flows, low=-0.9999, high=10.0, iterations=100):
+    '''
+    Internal rate of return of every row of cash flows, found by
+    bisection on all rows at once.
+    Parameters
+    cash_flows: array of shape (cases, periods), period 0 first
+    low, high: range of rates searched
+    Returns
+    array of rates, NaN where the NPV does not change sign in the range
+    (Excel's #NUM!)
+    '''
+    cash_flows = np.asarray(cash_flows, dtype=float)
+    t = np.arange(cash_flows.shape[1])
+
+    def npv_at(rate):
+        return (cash_flows / (1 + rate[:, None]) ** t).sum(axis=1)
+
+    lo = np.full(len(cash_flows), low)
+    hi = np.full(len(cash_flows), high)
+    f_lo = npv_at(lo)
+    valid = np.sign(f_lo) != np.sign(npv_at(hi))
+
+    for _ in range(iterations):
+        mid = (lo + hi) / 2
+        f_mid = npv_at(mid)
+        # Keep the half of the interval where the sign changes
+        same = np.sign(f_mid) == np.sign(f_lo)
+        lo = np.where(same, mid, lo)
+        f_lo = np.where(same, f_mid, f_lo)
+        hi = np.where(same, hi, mid)
+
+    return np.where(valid, (lo + hi) / 2, np.nan)
+
+def base_case(assumptions):
+    '''
+    The base value of every driver.
+    '''
+    base = {}
+    for name, (value, _) in DRIVERS.items():
+        base[name] = assumptions[name] if value is None else value
+    return base
+
+def tornado(assumptions, savings, include_outlay=True):
+    '''
+    One-at-a-time sensitivity: each driver at its low and high value
+    while the others stay at their base values.
+    Returns
+    pd.DataFrame with one row per driver, sorted by the swing in NPV
+    '''
+    base = base_case(assumptions)
+    names = list(DRIVERS)
+
+    # Rows 0..n-1 set each driver low, rows n..2n-1 set each driver high
+    cases = {name : np.full(2 * len(names), base[name], dtype=float) for name in names}
+    for i, name in enumerate(names):
+        low, high = DRIVERS[name][1]
+        cases[name][i] = low
+        cases[name][len(names) + i] = high
+
+    result = project(assumptions, savings, **cases, include_outlay=include_outlay)
+    base_npv = project(assumptions, savings, **base, include_outlay=include_outlay)["npv"][0]
+
+    df = pd.DataFrame({
+        "driver" : names,
+        "low_input" : [DRIVERS[name][1][0] for name in names],
+        "high_input" : [DRIVERS[name][1][1] for name in names],
+        "npv_low" : result["npv"][:len(names)],
+        "npv_high" : result["npv"][len(names):],
+        "irr_low" : result["irr"][:len(names)],
+        "irr_high" : result["irr"][len(names):]
+    })
+    df["change_npv_low"] = df["npv_low"] - base_npv
+    df["change_npv_high"] = df["npv_high"] - base_npv
+    df["swing"] = (df["npv_high"] - df["npv_low"]).abs()
+    return df.sort_values("swing", ascending=False, ignore_index=True)
+
+def sensitivity_grid(assumptions, savings, drivers=("discount_rate", "capex_overrun", "savings_realization"),
+                     points=GRID_POINTS, include_outlay=True):
+    '''
+    Full factorial grid over the given drivers (points ** len(drivers) cases),
+    evaluated in one call to project.
+    Returns
+    pd.DataFrame with one row per case: driver values, npv, irr, roi and payback
+    '''
+    base = base_case(assumptions)
+    axes = [np.linspace(*DRIVERS[name][1], points) for name in drivers]
+    mesh = np.meshgrid(*axes, indexing="ij")
+
+    cases = dict(base)
+    for name, values in zip(drivers, mesh):
+        cases[name] = values.ravel()
+
+    result = project(assumptions, savings, **cases, include_outlay=include_outlay)
+    df = pd.DataFrame({name : values.ravel() for name, values in zip(drivers, mesh)})
+    for metric in ["npv", "irr", "roi", "payback"]:
+        df[metric] = result[metric]
+    return df
+
+def cash_flow_table(result, case=0):
+    '''
+    The cash flow statement of one case laid out like the CF_ sheets,
+    one row per line and one column per year.
+    '''
+    years = result["free_cash_flow"].shape[1]
+    rows = {}
+    for line in ["variable_cost_savings", "fixed_opex", "ebitda", "depreciation", "ebit",
+                 "interest_expense", "ebt", "corp_tax", "net_income", "principal_repayment"]:
+        rows[line] = np.r_[np.nan, result[line][case]]
+    rows["free_cash_flow"] = result["free_cash_flow"][case]
+    rows["cumulative_fcf"] = result["cumulative_fcf"][case]
+    return pd.DataFrame(rows, index=pd.Index(range(years), name="year")).T
+
+if __name__ == "__main__":
+    ASSUMPTIONS = load_assumptions(CONFIG["assumptions_xlsx"])
+    SAVINGS = load_savings(CONFIG["savings_xlsx"], CONFIG["workbook_savings_column" if WORKBOOK else "savings_column"])
+    base = base_case(ASSUMPTIONS)
+
+    # All scenarios' base cases in one call
+    results = project(ASSUMPTIONS, SAVINGS.values, **base, include_outlay=not WORKBOOK)
+
+    summary = pd.DataFrame({
+        "scenario" : SAVINGS.index,
+        "npv" : results["npv"],
+        "irr" : results["irr"],
+        "roi" : results["roi"],
+        "payback" : results["payback"]
+    })
+
+    tornado_frames = []
+    grid_frames = []
+    for scenario, savings in SAVINGS.items():
+        df = tornado(ASSUMPTIONS, savings, include_outlay=not WORKBOOK)
+        df["scenario"] = scenario
+        tornado_frames.append(df)
+
+        df = sensitivity_grid(ASSUMPTIONS, savings, include_outlay=not WORKBOOK)
+        df["scenario"] = scenario
+        grid_frames.append(df)
+
+    grid = pd.concat(grid_frames, ignore_index=True)
+
+    # Distribution of each metric over the grid, per scenario
+    grid_summary = grid.groupby("scenario")[["npv", "irr", "roi"]].describe(percentiles=[.05, .5, .95])
+
+    # NPV by discount rate and capex overrun with the savings fully realized
+    realized = grid[np.isclose(grid["savings_realization"], base["savings_realization"])]
+    npv_table = realized.pivot_table(index=["scenario", "discount_rate"], columns="capex_overrun", values="npv")
+
+    with pd.ExcelWriter(CONFIG["output_xlsx"]) as xlw:
+        summary.to_excel(xlw, sheet_name="Summary", index=False)
+        for i, scenario in enumerate(SAVINGS.index):
+            cash_flow_table(results, i).to_excel(xlw, sheet_name=f"CF_{scenario.capitalize()}")
+        pd.concat(tornado_frames, ignore_index=True).to_excel(xlw, sheet_name="Tornado", index=False)
+        grid_summary.to_excel(xlw, sheet_name="Sensitivity_Summary")
+        npv_table.to_excel(xlw, sheet_name="NPV_Table")
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+'''
+hazira.py
+A single command line for the whole pipeline:
+
+    ./hazira.py simulate                 all simulations, in pipeline order
+    ./hazira.py simulate vessels gate    only some of them
+    ./hazira.py ingest                   csv outputs -> dataset store
+    ./hazira.py qc                       data quality report
+    ./hazira.py checks                   consistency checks across datasets
+    ./hazira.py query ["SELECT ..."]     SQL over the outputs (interactive without a query)
+    ./hazira.py metrics [--incremental]  monthly metrics
+    ./hazira.py scenarios [--resimulate] AI scenarios and their cost savings
+    ./hazira.py finance                  cash flow, NPV/IRR and sensitivity
+    ./hazira.py sobol                    global sensitivity analysis
+    ./hazira.py fleet                    fleet sizing
+    ./hazira.py nowcast [--snapshot-at T] percentile bands of the next 72 h from a port snapshot
+    ./hazira.py analysis                 warm-up and steady-state confidence intervals of a long run
+    ./hazira.py figures [name ...]       report figures (Figures_Hazira/*.png)
+    ./hazira.py all                      everything run_all.py runs
+
+To make executable on Mac/Linux (or symlink it as 'hazira' on the PATH):
+chmod +x hazira.py
+or install the 'hazira' command with the dependencies (pyproject.toml):
+pip install -e .
+
+Each stage is one of the existing scripts, run in this process with its
+own folder as the working directory (as run_all.py does), so the scripts
+keep working on their own too. Nothing heavy (pandas, NumPy, matplotlib)
+is imported here: 'hazira.py --help' only loads argparse, and each
+stage imports what it needs when it runs.
+'''
+
+import os
+import sys
+import argparse
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Simulations in pipeline order (containers and yard read the vessel output)
+SIMULATIONS = {
+    "berth" : "simulation_tasks/simulate_berth_hazira.py",
+    "vessels" : "simulation_tasks/simulate_vessels_hazira.py",
+    "containers" : "simulation_tasks/simulate_containers_hazira.py",
+    "teu" : "simulation_tasks/simulate_teu_moves_hazira.py",
+    "yard" : "simulation_tasks/simulate_yard_hazira.py",
+    "cranes" : "simulation_tasks/simulate_cranes_hazira.py",
+    "gate" : "simulation_tasks/simulate_gate_hazira.py",
+    "energy" : "simulation_tasks/simulate_energy_hazira.py",
+    "maintenance" : "simulation_tasks/simulate_maintenance_hazira.py"
+}
+
+INGESTS = {
+    "berth" : "data_ingest_hazira/ingest_berth_occupancy_hazira.py",
+    "vessels" : "data_ingest_hazira/ingest_vessel_turnaround_hazira.py",
+    "containers" : "data_ingest_hazira/ingest_container_moves_hazira.py",
+    "cranes" : "data_ingest_hazira/ingest_crane_uptime_hazira.py",
+    "gate" : "data_ingest_hazira/ingest_gate_entries_hazira.py",
+    "energy" : "data_ingest_hazira/ingest_energy_consumption_hazira.py",
+    "maintenance" : "data_ingest_hazira/ingest_maintenance_events_hazira.py"
+}
+
+# Commands that run a fixed list of scripts
+STAGES = {
+    "qc" : ["data_ingest_hazira/run_qc.py"],
+    "checks" : ["data_ingest_hazira/cross_dataset_checks.py"],
+    "query" : ["data_ingest_hazira/query_hazira.py"],
+    "metrics" : ["simulation_tasks/process_metrics_hazira.py"],
+    "scenarios" : ["ai_scenario_simulation/apply_scenario_hazira.py",
+                   "ai_scenario_simulation/compute_savings_hazira.py"],
+    "finance" : ["financial_projection_and_sensitivity/financial_engine_hazira.py"],
+    "sobol" : ["ai_scenario_simulation/sobol_sensitivity_hazira.py"],
+    "fleet" : ["ai_scenario_simulation/fleet_sizing_hazira.py"],
+    "nowcast" : ["simulation_tasks/nowcast_hazira.py"],
+    "analysis" : ["simulation_tasks/output_analysis_hazira.py"],
+    "figures" : ["simulation_tasks/figures_hazira.py"]
+}
+
+def run_script(script, args=()):
+    '''
+    Runs a script as __main__ in this process, with its folder as the
+    working directory and first on sys.path, as if it was run on its own.
+    Parameters
+    script: path of the script relative to the repository
+    args: command line arguments given to the script
+    '''
+    import runpy
+
+    path = os.path.join(ROOT, script)
+    folder = os.path.dirname(path)
+    print(f"→ Running {script}")
+
+    cwd, argv, sys_path = os.getcwd(), sys.argv, list(sys.path)
+    os.chdir(folder)
+    sys.argv = [path] + list(args)
+    sys.path.insert(0, folder)
+    try:
+        runpy.run_path(path, run_name="__main__")
+    finally:
+        os.chdir(cwd)
+        sys.argv = argv
+        sys.path[:] = sys_path
+
+def choose(names, available, kind):
+    '''
+    The scripts for the chosen names (all of them if none were chosen),
+    in the order of available.
+    '''
+    unknown = set(names) - set(available)
+    if unknown:
+        sys.exit(f"unknown {kind}: {', '.join(sorted(unknown))} (choose from {', '.join(available)})")
+    return [script for name, script in available.items() if not names or name in names]
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="hazira", description="Hazira port simulation and cost model pipeline.")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    simulate = commands.add_parser("simulate", help="run the simulations")
+    simulate.add_argument("stages", nargs="*", metavar="stage", help=f"any of {', '.join(SIMULATIONS)} (default: all)")
+    simulate.add_argument("--seed", type=int, help="root seed of the random streams (HAZIRA_SEED)")
+    simulate.add_argument("--replication", type=int, help="replication number (HAZIRA_REPLICATION)")
+
+    ingest = commands.add_parser("ingest", help="load the simulation outputs into the dataset store")
+    ingest.add_argument("datasets", nargs="*", metavar="dataset", help=f"any of {', '.join(INGESTS)} (default: all)")
+
+    metrics = commands.add_parser("metrics", help="compute the monthly metrics")
+    metrics.add_argument("--incremental", action="store_true", help="only read rows appended since the last run")
+
+    commands.add_parser("qc", help="write the data quality report")
+    commands.add_parser("checks", help="check that the datasets agree with each other")
+
+    query = commands.add_parser("query", help="SQL over the simulation, ingest and scenario outputs")
+    query.add_argument("sql", nargs="?", help="the query (default: an interactive session)")
+    query.add_argument("--start", help="only load rows from this time on")
+    query.add_argument("--end", help="only load rows before this time")
+    scenarios = commands.add_parser("scenarios", help="apply the AI scenarios and compute their savings")
+    scenarios.add_argument("--resimulate", action="store_true", help="re-run the simulations under each scenario")
+    commands.add_parser("finance", help="cash flow, NPV/IRR/payback and sensitivity")
+    commands.add_parser("sobol", help="Sobol global sensitivity analysis")
+    commands.add_parser("fleet", help="fleet sizing optimizer")
+    nowcast = commands.add_parser("nowcast", help="short forward simulations from the current state of the port")
+    nowcast.add_argument("--snapshot-at", help="first write the snapshot from the simulation outputs at this time")
+    commands.add_parser("analysis", help="warm-up detection and batch-means confidence intervals of the queues")
+    figures = commands.add_parser("figures", help="draw the report figures from the simulation outputs")
+    figures.add_argument("names", nargs="*", metavar="figure", help="figures to draw (default: all)")
+    figures.add_argument("--show", action="store_true", help="also show them on screen")
+
+    commands.add_parser("all", help="every simulation and metric script, as run_all.py")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == "simulate":
+        # The random streams read these when the first simulation is imported
+        if args.seed is not None:
+            os.environ["HAZIRA_SEED"] = str(args.seed)
+        if args.replication is not None:
+            os.environ["HAZIRA_REPLICATION"] = str(args.replication)
+        for script in choose(args.stages, SIMULATIONS, "simulation"):
+            run_script(script)
+
+    elif args.command == "ingest":
+        for script in choose(args.datasets, INGESTS, "dataset"):
+            run_script(script)
+
+    elif args.command == "metrics":
+        run_script(STAGES["metrics"][0], ["--incremental"] if args.incremental else [])
+
+    elif args.command == "query":
+        options = [arg for flag, value in [("--start", args.start), ("--end", args.end)] if value for arg in (flag, value)]
+        run_script(STAGES["query"][0], options + ([args.sql] if args.sql else []))
+
+    elif args.command == "scenarios":
+        apply, savings = STAGES["scenarios"]
+        run_script(apply, ["--resimulate"] if args.resimulate else [])
+        run_script(savings)
+
+    elif args.command == "nowcast":
+        run_script(STAGES["nowcast"][0], ["--snapshot-at", args.snapshot_at] if args.snapshot_at else [])
+
+    elif args.command == "figures":
+        run_script(STAGES["figures"][0], args.names + (["--show"] if args.show else []))
+
+    elif args.command == "all":
+        from run_all import SIM_SCRIPTS, METRIC_SCRIPTS
+        for script in SIM_SCRIPTS + METRIC_SCRIPTS:
+            run_script(script)
+
+    else:
+        for script in STAGES[args.command]:
+            run_script(script)
+
+if __name__ == "__main__":
+    main()
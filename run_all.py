@@ -6,9 +6,24 @@ and then open relevant Excel files to automatically refresh data.
 To make executable on Mac/Linux:
 chmod +x run_all.py
 ./run_all.py
+
+Every simulation draws from its own seeded random stream
+(see simulation_tasks/random_streams_hazira.py), so a run is reproducible.
+Set the seed and replication for all scripts through the environment:
+HAZIRA_SEED=7 HAZIRA_REPLICATION=1 ./run_all.py
+
+While a simulation runs, its progress (simulated time reached, events
+per second, queue sizes, memory, time left) is shown live on one line.
+The simulations write it as JSON lines to the file named by
+HAZIRA_PROGRESS (see simulation_tasks/progress_hazira.py); set it to
+keep the lines, otherwise a temporary file is used:
+HAZIRA_PROGRESS=progress.jsonl ./run_all.py
 '''
 
 import subprocess
+import tempfile
+import json
+import time
 import sys
 import os
 
@@ -17,6 +32,7 @@ SIM_SCRIPTS = [
     "simulation_tasks/simulate_berth_hazira.py",
     "simulation_tasks/simulate_vessels_hazira.py",
     "simulation_tasks/simulate_containers_hazira.py",
+    "simulation_tasks/simulate_yard_hazira.py",
     "simulation_tasks/simulate_cranes_hazira.py",
     "simulation_tasks/simulate_gate_hazira.py",
     "simulation_tasks/simulate_energy_hazira.py",
@@ -27,7 +43,8 @@ SIM_SCRIPTS = [
 METRIC_SCRIPTS = [
     "simulation_tasks/process_metrics_hazira.py",   # e.g. computes monthly KPIs
     "ai_scenario_simulation/apply_scenario_hazira.py",
-    "ai_scenario_simulation/compute_savings_hazira.py"
+    "ai_scenario_simulation/compute_savings_hazira.py",
+    "financial_projection_and_sensitivity/financial_engine_hazira.py" # ROI/NPV/payback and sensitivity
 ]
 
 # 3. Excel workbooks to open at the end
@@ -36,21 +53,75 @@ EXCEL_FILES = [
     "baseline_cost_model_inputs/Cost_Model_Hazira.xlsx",
     "ai_scenario_simulation/Cost_Savings_Summary.xlsx",
     "financial_projection_and_sensitivity/ROI_NPV_Payback_Hazira.xlsx",
-    "financial_projection_and_sensitivity/Sensitivity_Analysis_Hazira.xlsx"
+    "financial_projection_and_sensitivity/Sensitivity_Analysis_Hazira.xlsx",
+    "financial_projection_and_sensitivity/Financial_Projection_Hazira.xlsx"
 ]
 
+# 4. Live progress of the simulations
+PROGRESS_FILE = os.path.abspath(os.environ.get("HAZIRA_PROGRESS") or
+                                os.path.join(tempfile.gettempdir(), f"hazira_progress_{os.getpid()}.jsonl"))
+POLL_SECS = 0.5
+PROGRESS_FIELDS = {"stage", "status", "pid", "cursor", "fraction", "events", "events_per_sec", "elapsed_secs", "rss_mb"}
+
 # ───────────────────────────────────────────────────────────────
-def run_script(script_name):
-    """Run a Python script in this same directory."""
+def progress_line(record):
+    """One line of the live view from a progress record."""
+    line = f"  {record['stage']:<12}"
+    if record["fraction"] is not None:
+        line += f" {100 * record['fraction']:5.1f}%"
+    line += f" {record['events']:>10,} events {record['events_per_sec']:>10,.0f}/s"
+    if record["rss_mb"] is not None:
+        line += f" {record['rss_mb']:7.1f} MB"
+    # Gauges of the simulation (queue sizes, ...)
+    for key, value in record.items():
+        if key not in PROGRESS_FIELDS:
+            line += f" {key}={value}"
+    fraction = record["fraction"]
+    if record["status"] == "done":
+        line += f"  done in {record['elapsed_secs']:.1f}s"
+    elif fraction:
+        line += f"  ETA {record['elapsed_secs'] * (1 - fraction) / fraction:.0f}s"
+    return line
+
+def follow_progress(process, file):
+    """Show the progress lines of a running simulation until it exits."""
+    live = sys.stdout.isatty()
+    shown = ""
+    while True:
+        running = process.poll() is None
+        for text in file.readlines():
+            try:
+                record = json.loads(text)
+            except ValueError: # A line still being written
+                continue
+            shown = progress_line(record)
+            if live:
+                print("\r" + shown.ljust(100), end="", flush=True)
+        if not running:
+            break
+        time.sleep(POLL_SECS)
+    # Without a terminal only the last line of the run is printed
+    if shown:
+        print("" if live else shown)
+
+def run_script(script_name, progress=False):
+    """Run a Python script in this same directory, showing its live progress if asked."""
     script_path = os.path.abspath(script_name)
     script_dir  = os.path.dirname(script_path)
     print(f"→ Running {script_name} in {script_dir}...")
-    try:
-        subprocess.run([sys.executable, script_path], 
-                       cwd=script_dir, # Want to run in *this* folder
-                       check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"✗ Error running {script_name}: {e}")
+    if progress:
+        env = dict(os.environ, HAZIRA_PROGRESS=PROGRESS_FILE)
+        open(PROGRESS_FILE, "a").close()
+        with open(PROGRESS_FILE) as file:
+            file.seek(0, os.SEEK_END) # Only the lines of this run
+            process = subprocess.Popen([sys.executable, script_path],
+                                       cwd=script_dir, # Want to run in *this* folder
+                                       env=env)
+            follow_progress(process, file)
+    else:
+        process = subprocess.run([sys.executable, script_path], cwd=script_dir)
+    if process.returncode != 0:
+        print(f"✗ Error running {script_name}: exit status {process.returncode}")
         sys.exit(1)
 
 def open_file(path):
@@ -69,8 +140,13 @@ def main():
     print(f"Working directory: {cwd}")
 
     # 1. Run all simulations
-    for sim in SIM_SCRIPTS:
-        run_script(sim)
+    try:
+        for sim in SIM_SCRIPTS:
+            run_script(sim, progress=True)
+    finally:
+        # The temporary progress file is not needed any more, even if a simulation failed
+        if not os.environ.get("HAZIRA_PROGRESS") and os.path.exists(PROGRESS_FILE):
+            os.remove(PROGRESS_FILE)
 
     # 2. Run all metric scripts
     for metric in METRIC_SCRIPTS:
@@ -0,0 +1,347 @@
+'''
+batch_models_hazira.py
+Batched versions of the vessel, crane and gate simulations.
+
+Each function simulates one year for B parameter sets at once.
+The Python objects of simulate_*_hazira.py (Berth, Crane, Gate, ...)
+are replaced by NumPy arrays with one row per parameter set, so a
+batch of thousands of model evaluations costs about as much as a
+handful of runs of the original scripts. The functions return annual
+KPIs for each parameter set, which is what global sensitivity analysis
+and fleet sizing need; the per-event csv outputs are still written by
+the simulate_*_hazira.py scripts.
+
+Every parameter may be a scalar (shared by the whole batch) or an array
+with one entry per parameter set. Randomness comes from the
+numpy.random.Generator that is passed in.
+'''
+
+import math
+import numpy as np
+from port_params_hazira import PEAK_HOURS
+
+HOURS = 365 * 24 # Length of the simulated year
+
+NUM_BERTHS = 6 # MP1-MP4 and CT1-CT2
+NUM_QUAY = 6
+NUM_YARD = 14
+
+# Container calls as in simulate_containers_hazira.py
+TEU_PER_CALL = 1400
+TEU_SIGMA = 150
+MOVES_PER_TEU = 2.6 # Yard moves per container
+QUAY_MOVE_SECS = 90
+YARD_MOVE_SECS = 144
+
+# Peak gate hours (08-10 h, 17-19 h), see port_params_hazira.py
+GATE_PEAK_HOURS = PEAK_HOURS
+
+def batch_size(*params):
+    '''
+    The number of parameter sets described by the given parameters.
+    '''
+    return max(np.size(p) for p in params)
+
+def as_batch(value, size, dtype=float):
+    '''
+    Broadcasts a scalar or per-set array to one value per parameter set.
+    '''
+    return np.broadcast_to(np.asarray(value, dtype=dtype), (size,)).copy()
+
+def simulate_vessels(rng, arrivals_per_year=1200, service_mu=23, service_sigma=4.5,
+                     delay_prob=.11, service_multiplier=1.0, num_berths=NUM_BERTHS, hours=HOURS):
+    '''
+    Poisson vessel arrivals, each docked at the berth that becomes free
+    first, as in simulate_vessels_hazira.py. A vessel that arrives while
+    every berth is busy waits until that berth is free.
+    Parameters
+    rng: numpy.random.Generator
+    arrivals_per_year: mean number of vessel calls per year
+    service_mu, service_sigma: normal service time in hours (truncated at 1 h)
+    delay_prob: chance that a vessel is delayed by U(0.5, 3) extra hours
+    service_multiplier: scales every service time (AI scenario multiplier)
+    num_berths: number of berths
+    hours: length of the simulation
+    Returns
+    dict of arrays, one entry per parameter set: vessel_calls, service_hrs,
+    mean_wait_hrs, mean_turnaround_hrs (arrival to departure)
+    '''
+    size = batch_size(arrivals_per_year, service_mu, service_sigma, delay_prob, service_multiplier, num_berths)
+    rate = as_batch(arrivals_per_year, size) / hours
+    mu = as_batch(service_mu, size)
+    sigma = as_batch(service_sigma, size)
+    delay = as_batch(delay_prob, size)
+    multiplier = as_batch(service_multiplier, size)
+    berths = as_batch(num_berths, size, dtype=int)
+
+    # Enough arrivals that every parameter set runs past the end of the year
+    expected = rate.max() * hours
+    max_calls = int(expected + 6 * math.sqrt(expected) + 10)
+
+    arrival = np.cumsum(rng.exponential(size=(size, max_calls)) / rate[:, None], axis=1)
+    service = np.maximum(1, rng.normal(mu[:, None], sigma[:, None], size=(size, max_calls)))
+    delayed = rng.random((size, max_calls)) < delay[:, None]
+    service += delayed * rng.uniform(.5, 3, size=(size, max_calls))
+    service *= multiplier[:, None]
+    active = arrival < hours
+
+    # Time at which each berth is next free; berths a parameter set does not have are never free
+    next_idle = np.where(np.arange(berths.max())[None, :] < berths[:, None], 0.0, np.inf)
+    rows = np.arange(size)
+    wait = np.zeros(size)
+
+    # Vessels are docked in order of arrival, one vessel of every parameter set per step
+    for k in range(int(active.sum(axis=1).max())):
+        berth = next_idle.argmin(axis=1)
+        free = next_idle[rows, berth]
+        start = np.maximum(arrival[:, k], free)
+        next_idle[rows, berth] = np.where(active[:, k], start + service[:, k], free)
+        wait += np.where(active[:, k], start - arrival[:, k], 0)
+
+    calls = active.sum(axis=1)
+    service_hrs = (service * active).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {
+            'vessel_calls' : calls,
+            'service_hrs' : service_hrs,
+            'mean_wait_hrs' : wait / calls,
+            'mean_turnaround_hrs' : (wait + service_hrs) / calls
+        }
+
+def weibull_scale(k, mean_interarrival):
+    '''
+    Scale of a Weibull(k) distribution with the given mean:
+    mean = scale * gamma(1 + 1/k)
+    '''
+    gamma = np.vectorize(math.gamma)(1 + 1 / np.asarray(k, dtype=float))
+    return mean_interarrival / gamma
+
+def count_renewals(rng, k, scale, shape, hours):
+    '''
+    Number of Weibull(k, scale) renewals that start before hours,
+    for every entry of an array of the given shape.
+    Parameters
+    k, scale: arrays broadcastable to shape
+    '''
+    k = np.broadcast_to(k, shape)
+    scale = np.broadcast_to(scale, shape)
+    count = np.zeros(shape, dtype=np.int64)
+    clock = np.zeros(shape)
+
+    # Draw a block of interarrival times at a time until every clock has passed the end
+    block = int(hours / scale.min() * 1.2) + 16
+    while (clock < hours).any():
+        gaps = rng.weibull(k[..., None], size=shape + (block,)) * scale[..., None]
+        times = clock[..., None] + np.cumsum(gaps, axis=-1)
+        count += (times < hours).sum(axis=-1)
+        clock = times[..., -1]
+    return count
+
+def simulate_cranes(rng, weibull_k=1.7, mean_interarrival=12, quay_downtime=1.2, yard_downtime=1.0,
+                    downtime_multiplier=1.0, num_quay=NUM_QUAY, num_yard=NUM_YARD, hours=HOURS):
+    '''
+    Weibull failure interarrival times for every quay crane and RTG,
+    as in simulate_cranes_hazira.py.
+    Parameters
+    rng: numpy.random.Generator
+    weibull_k: Weibull shape parameter
+    mean_interarrival: mean hours between failures
+    quay_downtime, yard_downtime: hours of downtime per failure
+    downtime_multiplier: scales every downtime (AI scenario multiplier)
+    num_quay, num_yard: number of cranes of each kind
+    hours: length of the simulation
+    Returns
+    dict of arrays, one entry per parameter set: quay_failures, yard_failures,
+    quay_downtime_hrs, yard_downtime_hrs, quay_hours, yard_hours (hours of operation)
+    '''
+    size = batch_size(weibull_k, mean_interarrival, quay_downtime, yard_downtime,
+                      downtime_multiplier, num_quay, num_yard)
+    k = as_batch(weibull_k, size)
+    scale = weibull_scale(k, as_batch(mean_interarrival, size))
+    quay = as_batch(num_quay, size, dtype=int)
+    yard = as_batch(num_yard, size, dtype=int)
+    multiplier = as_batch(downtime_multiplier, size)
+
+    # One column per crane; columns past a parameter set's fleet are ignored
+    cranes = int((quay + yard).max())
+    failures = count_renewals(rng, k[:, None], scale[:, None], (size, cranes), hours)
+    column = np.arange(cranes)[None, :]
+    quay_failures = (failures * (column < quay[:, None])).sum(axis=1)
+    yard_failures = (failures * ((column >= quay[:, None]) & (column < (quay + yard)[:, None]))).sum(axis=1)
+
+    quay_down = quay_failures * as_batch(quay_downtime, size) * multiplier
+    yard_down = yard_failures * as_batch(yard_downtime, size) * multiplier
+    return {
+        'quay_failures' : quay_failures,
+        'yard_failures' : yard_failures,
+        'quay_downtime_hrs' : quay_down,
+        'yard_downtime_hrs' : yard_down,
+        'quay_hours' : quay * hours - quay_down,
+        'yard_hours' : yard * hours - yard_down
+    }
+
+def gate_arrival_rates(trucks_per_day, peak_surge, hours=HOURS):
+    '''
+    Mean truck arrivals in each hour of the year, shape (B, hours).
+    '''
+    hour_of_day = np.arange(hours) % 24
+    peak = np.isin(hour_of_day, GATE_PEAK_HOURS)
+    surge = 1 + np.where(peak[None, :], np.asarray(peak_surge)[:, None], 0)
+    return np.asarray(trucks_per_day)[:, None] / 24 * surge
+
+def workload(arriving_work, capacity):
+    '''
+    Work waiting at a pooled resource (a gate lane, the quay cranes, ...)
+    at the end of each hour.
+    This is the Lindley recursion W[t] = max(0, W[t-1] + work[t] - capacity)
+    in closed form, W[t] = S[t] - min(0, min(S[0..t])) with S the running
+    sum of work - capacity, so it needs no loop over hours.
+    Parameters
+    arriving_work: work arriving in each hour, shape (B, hours)
+    capacity: work the resource can do per hour, shape (B,)
+    '''
+    net = np.cumsum(arriving_work - np.asarray(capacity)[:, None], axis=1)
+    return net - np.minimum(0, np.minimum.accumulate(net, axis=1))
+
+def serve_lanes(arrival, service, lanes):
+    '''
+    Departure time of every truck at B gates with several lanes, served
+    first come first served: each truck is served at the lane that is free
+    first, the way simulate_vessels docks a vessel at the berth free first.
+    Parameters
+    arrival: arrival times in order of arrival, shape (n,) shared by every gate or (B, n);
+        inf past the last truck of a gate
+    service: service times, shape (B, n)
+    lanes: number of lanes of each gate, shape (B,)
+    Returns
+    departure times, shape (B, n) (inf for the trucks past the last one)
+    '''
+    arrival = np.broadcast_to(arrival, service.shape)
+
+    # Time at which each lane is next free; lanes a gate does not have are never free
+    next_free = np.where(np.arange(lanes.max())[None, :] < lanes[:, None], 0.0, np.inf)
+    rows = np.arange(len(lanes))
+    departure = np.empty(service.shape)
+
+    # One truck of every gate per step
+    for k in range(service.shape[1]):
+        lane = next_free.argmin(axis=1)
+        start = np.maximum(arrival[:, k], next_free[rows, lane])
+        departure[:, k] = next_free[rows, lane] = start + service[:, k]
+    return departure
+
+def departed_by(departure, step, steps):
+    '''
+    Number of departures by the end of each step (an hour, a quarter hour, ...),
+    shape (B, steps). A departure on the end of a step counts in that step
+    (1e-6 against rounding).
+    '''
+    index = np.clip(np.ceil((departure - 1e-6) / step) - 1, 0, steps).astype(int)
+    size = len(departure)
+    flat = (np.arange(size)[:, None] * (steps + 1) + index).ravel()
+    per_step = np.bincount(flat, minlength=size * (steps + 1)).reshape(size, steps + 1)
+    return np.cumsum(per_step[:, :steps], axis=1)
+
+def simulate_gate(rng, trucks_per_day=160, service_mu=11, service_sigma=2.5, peak_surge=.28,
+                  speed_multiplier=1.0, lanes=1, hours=HOURS):
+    '''
+    Poisson truck arrivals with the peak-hour surge, served first come
+    first served, as in simulate_gate_hazira.py. With one lane the queue
+    is tracked as the minutes of service waiting at the gate, from the
+    work arriving in each hour. With several lanes every truck is drawn
+    (at a uniform time within its hour) and served at the lane that is
+    free first (serve_lanes), so the lanes are separate servers rather
+    than one server that is several times faster.
+    Parameters
+    rng: numpy.random.Generator
+    trucks_per_day: mean arrivals per day outside of the peak hours
+    service_mu, service_sigma: normal service time in minutes
+    peak_surge: extra fraction of arrivals in the peak hours
+    speed_multiplier: speedup in processing (AI scenario multiplier)
+    lanes: number of gate lanes
+    hours: length of the simulation
+    Returns
+    dict of arrays, one entry per parameter set: trucks_arrived, trucks_processed,
+    mean_queue, max_queue, final_queue (queues in trucks, measured on the hour)
+    '''
+    size = batch_size(trucks_per_day, service_mu, service_sigma, peak_surge, speed_multiplier, lanes)
+    mu = as_batch(service_mu, size) / as_batch(speed_multiplier, size)
+    sigma = as_batch(service_sigma, size) / as_batch(speed_multiplier, size)
+    lanes = as_batch(lanes, size, dtype=int)
+
+    counts = rng.poisson(gate_arrival_rates(as_batch(trucks_per_day, size), as_batch(peak_surge, size), hours))
+
+    # The sum of n normal service times is normal with mean n*mu and variance n*sigma^2
+    work = np.maximum(0, rng.normal(counts * mu[:, None], np.sqrt(counts) * sigma[:, None]))
+    queue = workload(work, np.full(size, 60.0)) / mu[:, None]
+
+    # Gates with several lanes are simulated truck by truck
+    multi = np.flatnonzero(lanes > 1)
+    if len(multi):
+        trucks = counts[multi].sum(axis=1)
+        hour = np.full((len(multi), trucks.max()), np.inf)
+        for i, row in enumerate(counts[multi]):
+            hour[i, :trucks[i]] = np.repeat(np.arange(hours), row)
+        arrival = np.sort(hour + rng.random(hour.shape), axis=1) * 60
+        service = np.maximum(0, rng.normal(mu[multi, None], sigma[multi, None], size=hour.shape))
+        departure = serve_lanes(arrival, service, lanes[multi])
+        queue[multi] = np.cumsum(counts[multi], axis=1) - departed_by(departure, 60, hours)
+
+    arrived = counts.sum(axis=1)
+    return {
+        'trucks_arrived' : arrived,
+        'trucks_processed' : arrived - queue[:, -1],
+        'mean_queue' : queue.mean(axis=1),
+        'max_queue' : queue.max(axis=1),
+        'final_queue' : queue[:, -1]
+    }
+
+def simulate_moves(rng, teu_per_year, teu_per_call=TEU_PER_CALL, teu_sigma=TEU_SIGMA,
+                   moves_per_teu=MOVES_PER_TEU, quay_secs=QUAY_MOVE_SECS, yard_secs=YARD_MOVE_SECS,
+                   num_quay=NUM_QUAY, num_yard=NUM_YARD, quay_availability=1.0, yard_availability=1.0,
+                   hours=HOURS):
+    '''
+    Quay and yard crane workload of the container calls, as in
+    simulate_containers_hazira.py: every TEU is one quay move and
+    moves_per_teu yard moves, and each kind of crane works as one pool.
+    Parameters
+    rng: numpy.random.Generator
+    teu_per_year: throughput the terminal has to handle
+    teu_per_call, teu_sigma: normal TEU handled per container call
+    moves_per_teu: yard moves per TEU
+    quay_secs, yard_secs: mean seconds per move
+    num_quay, num_yard: number of cranes of each kind
+    quay_availability, yard_availability: share of the hours the cranes are up
+        (e.g. quay_hours / (num_quay * hours) from simulate_cranes)
+    hours: length of the simulation
+    Returns
+    dict of arrays, one entry per parameter set: teu, quay_utilization,
+    yard_utilization, quay_delay_hrs, yard_delay_hrs (mean hours the cranes
+    need to clear the moves waiting for them), quay_backlog_hrs,
+    yard_backlog_hrs (crane hours of work left at the end of the year)
+    '''
+    size = batch_size(teu_per_year, teu_per_call, moves_per_teu, num_quay, num_yard,
+                      quay_availability, yard_availability)
+    per_call = as_batch(teu_per_call, size)
+    calls = rng.poisson((as_batch(teu_per_year, size) / per_call / hours)[:, None], size=(size, hours))
+
+    # The TEU of n calls is normal with mean n*teu_per_call and variance n*teu_sigma^2
+    teu = np.maximum(0, rng.normal(calls * per_call[:, None], np.sqrt(calls) * as_batch(teu_sigma, size)[:, None]))
+
+    results = {'teu' : teu.sum(axis=1)}
+    work = {
+        'quay' : teu * (as_batch(quay_secs, size) / 3600)[:, None],
+        'yard' : teu * (as_batch(moves_per_teu, size) * as_batch(yard_secs, size) / 3600)[:, None]
+    }
+    capacity = {
+        'quay' : as_batch(num_quay, size) * as_batch(quay_availability, size),
+        'yard' : as_batch(num_yard, size) * as_batch(yard_availability, size)
+    }
+    for kind in ['quay', 'yard']:
+        # Crane hours of work waiting at the end of every hour
+        waiting = workload(work[kind], capacity[kind])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            results[f'{kind}_utilization'] = work[kind].sum(axis=1) / (capacity[kind] * hours)
+            results[f'{kind}_delay_hrs'] = waiting.mean(axis=1) / capacity[kind]
+        results[f'{kind}_backlog_hrs'] = waiting[:, -1]
+    return results
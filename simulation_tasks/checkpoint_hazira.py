@@ -0,0 +1,99 @@
+'''
+checkpoint_hazira.py
+Checkpoints of a running simulation, to resume a run that died or to
+extend a finished run past its horizon.
+
+The horizon and the checkpoints are read from the environment, like
+the seed and replication of the random streams:
+    HAZIRA_DAYS=7300 python simulate_vessels_hazira.py       20 years
+    HAZIRA_CHECKPOINT_DAYS=90 ...                            checkpoint every 90 simulated days (default 30)
+    HAZIRA_RESUME=1 HAZIRA_DAYS=7300 python simulate_vessels_hazira.py
+HAZIRA_RESUME=1 continues from the stage's checkpoint file, e.g.
+vessels_checkpoint_hazira.pkl: after a crash from the last checkpoint,
+and after a finished run from its end, so that running a finished year
+again with a longer HAZIRA_DAYS extends it without re-simulating it.
+
+A checkpoint is the state the simulation needs to go on: the time and
+queues of its resources (Berth.next_idle_time, YardResource.next_idle_time,
+the gate queue, the crane failure clocks), its random stream(s) as
+bit_generator.state, and the size of the output csv written so far.
+Resuming truncates the output to that size and carries on from the
+same state with the same draws, so the output is bit-identical to a
+run that was never interrupted. Checkpoints are only taken between two
+events and never change the simulation.
+'''
+
+import os
+import pickle
+import pandas as pd
+
+HORIZON_DAYS = int(os.environ.get('HAZIRA_DAYS', 365))
+CHECKPOINT_DAYS = float(os.environ.get('HAZIRA_CHECKPOINT_DAYS', 30))
+RESUME = os.environ.get('HAZIRA_RESUME', '0') == '1'
+
+def checkpoint_path(stage):
+    return f'{stage}_checkpoint_hazira.pkl'
+
+class Checkpoint:
+    '''
+    The checkpoints of one simulation run.
+    '''
+    def __init__(self, stage, start, every=CHECKPOINT_DAYS, resume=RESUME):
+        '''
+        Parameters
+        stage: name of the simulation, e.g. 'vessels'
+        start: simulated time of the start of the run (a timestamp, or a number of days)
+        every: simulated days between two checkpoints
+        resume: continue from the last checkpoint of the stage
+        '''
+        self.path = checkpoint_path(stage)
+        self.every = every
+        self.state = None
+        if resume and os.path.exists(self.path):
+            with open(self.path, 'rb') as file:
+                self.state = pickle.load(file)
+        self.cursor = start if self.state is None else self.state['cursor']
+
+        # every in the units of the cursor, the first checkpoint is taken at the start
+        self.step = pd.Timedelta(days=every) if isinstance(start, pd.Timestamp) else every
+        self.next = self.cursor
+
+    def due(self, cursor):
+        '''
+        True when a checkpoint should be taken at this point of the run.
+        '''
+        return cursor >= self.next
+
+    def save(self, cursor, state):
+        '''
+        Writes a checkpoint: the cursor (simulated time) and the state of the simulation.
+        '''
+        state = dict(state, cursor=cursor)
+        # Written under a temporary name and renamed, so a crash while writing keeps the last checkpoint
+        temp = f'{self.path}.tmp'
+        with open(temp, 'wb') as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, self.path)
+        while self.next <= cursor:
+            self.next += self.step
+
+def open_output(path, checkpoint):
+    '''
+    The output csv of a simulation, opened to write from where the checkpoint left it.
+    Parameters
+    path: the output csv
+    checkpoint: a Checkpoint, whose state has the size of the output as 'output_size'
+    Returns
+    the file, opened for writing
+    '''
+    if checkpoint.state is None:
+        return open(path, 'w')
+    os.truncate(path, checkpoint.state['output_size'])
+    return open(path, 'a')
+
+def output_size(file):
+    '''
+    The size of an output written so far, for the checkpoint.
+    '''
+    file.flush()
+    return os.fstat(file.fileno()).st_size
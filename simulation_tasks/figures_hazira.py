@@ -0,0 +1,203 @@
+'''
+figures_hazira.py
+The figures of the report (Figures_Hazira/*.png), drawn from the
+simulation outputs only when they are asked for:
+
+    python figures_hazira.py                     write every figure
+    python figures_hazira.py berth_gantt --show  write and show one figure
+
+Every figure is drawn with a few batched artists rather than one per row:
+- the berth Gantt chart is one broken_barh per berth, not one line per vessel
+- heatmaps are one imshow of an array that is binned before plotting
+- long time series (hourly energy, gate queues, several years of them)
+  are downsampled to the min and max of each of MAX_POINTS buckets,
+  which keeps the peaks that plain decimation would drop
+so a figure takes about the same time for one year or ten.
+
+matplotlib is imported by the functions that draw, so importing this
+module (e.g. from a simulation with SHOW_FIG = False) costs nothing.
+'''
+
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from resources_hazira import BERTH, class_names
+
+SIM_START = pd.Timestamp('2025-01-01 00:00')
+
+CONFIG = {
+    "output_dir" : Path("../Figures_Hazira"),
+    "vessels_csv" : Path("vessel_turnaround_hazira.csv"),
+    "berth_csv" : Path("berth_occupancy_hazira.csv"),
+    "energy_csv" : Path("energy_consumption_hazira.csv"),
+    "gate_csv" : Path("gate_entries_hazira.csv"),
+    "cost_model_xlsx" : Path("../baseline_cost_model_inputs/Cost_Model_Hazira.xlsx"),
+    "dpi" : 150
+}
+
+BERTH_NAMES = class_names(BERTH)
+
+MAX_POINTS = 2000 # Points drawn for a long time series
+
+def pyplot(show=False):
+    '''
+    Imports pyplot, with a backend that needs no display unless the figure is shown.
+    '''
+    import matplotlib
+    if not show:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+def to_hours(times):
+    '''
+    Hours since the start of the simulation.
+    '''
+    return ((pd.to_datetime(times) - SIM_START) / pd.Timedelta(hours=1)).to_numpy()
+
+def downsample(x, y, max_points=MAX_POINTS):
+    '''
+    Reduces a series to the min and max of each of max_points/2 equal buckets.
+    Parameters
+    x, y: arrays of the same length
+    Returns
+    (x, y) with at most max_points points, the series itself if it is short enough
+    '''
+    x, y = np.asarray(x), np.asarray(y, dtype=float)
+    if len(y) <= max_points:
+        return x, y
+    starts = np.linspace(0, len(y), max_points // 2, endpoint=False).astype(int)
+    lows = np.minimum.reduceat(y, starts)
+    highs = np.maximum.reduceat(y, starts)
+    return np.repeat(x[starts], 2), np.column_stack([lows, highs]).ravel()
+
+def berth_gantt(ax, vessels, berth_names=BERTH_NAMES):
+    '''
+    One bar per vessel at its berth, one broken_barh per berth.
+    Parameters
+    ax: matplotlib axes
+    vessels: dataframe with berth, start_time and end_time (vessel_turnaround_hazira.csv)
+    '''
+    start = to_hours(vessels['start_time'])
+    length = to_hours(vessels['end_time']) - start
+    berth = vessels['berth'].to_numpy()
+    for i, name in enumerate(berth_names):
+        at_berth = berth == name
+        ax.broken_barh(np.column_stack([start[at_berth], length[at_berth]]), (i - .4, .8),
+                       facecolors='black', edgecolors='white', linewidth=.2)
+    ax.set_yticks(range(len(berth_names)), berth_names)
+    ax.set_title('Processing At Berths Over Year')
+    ax.set_ylabel('berth')
+    ax.set_xlabel('hours')
+
+def heatmap(ax, values, title, xlabel, ylabel, yticklabels=None):
+    '''
+    A heatmap of a pre-binned array, one row per resource.
+    Returns
+    the image, for a colorbar
+    '''
+    image = ax.imshow(values, cmap='viridis', aspect='auto', interpolation='nearest')
+    if yticklabels is not None:
+        ax.set_yticks(range(len(yticklabels)), yticklabels)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    return image
+
+def series(ax, times, values, title, ylabel, max_points=MAX_POINTS):
+    '''
+    A long time series, downsampled before it is drawn.
+    '''
+    x, y = downsample(pd.to_datetime(times).to_numpy(), values, max_points)
+    ax.plot(x, y, linewidth=.6)
+    ax.set_title(title)
+    ax.set_ylabel(ylabel)
+
+def berth_gantt_figure(plt, vessels=None):
+    if vessels is None:
+        vessels = pd.read_csv(CONFIG["vessels_csv"])
+    fig, ax = plt.subplots(figsize=(12, 4))
+    berth_gantt(ax, vessels)
+    return fig
+
+def berth_heatmap_figure(plt, occupancy=None):
+    '''
+    Parameters
+    occupancy: array of shape (days, berths), or None to read berth_occupancy_hazira.csv
+    '''
+    if occupancy is None:
+        occupancy = pd.read_csv(CONFIG["berth_csv"])[BERTH_NAMES].to_numpy()
+    fig, ax = plt.subplots(figsize=(12, 4))
+    image = heatmap(ax, np.transpose(occupancy), 'Berth Occupancy Over Year',
+                    'Day (of 365)', 'Berth (MP1-MP4, CT1-2)', BERTH_NAMES)
+    fig.colorbar(image, ax=ax) # Show color keys
+    return fig
+
+def energy_figure(plt):
+    energy = pd.read_csv(CONFIG["energy_csv"])
+    fig, ax = plt.subplots(figsize=(12, 4))
+    series(ax, energy['time'], energy['energy_kWh'], 'Hourly Energy Consumption', 'kWh')
+    return fig
+
+def gate_queue_figure(plt):
+    gate = pd.read_csv(CONFIG["gate_csv"])
+    fig, ax = plt.subplots(figsize=(12, 4))
+    series(ax, gate['time'], gate['queue_length'], 'Gate Queue Length', 'trucks')
+    return fig
+
+def annual_cost_figure(plt):
+    costs = pd.read_excel(CONFIG["cost_model_xlsx"], sheet_name="Annual-Metrics")
+    costs = costs.dropna(subset=["metric", "total_cost"])
+    fig, ax = plt.subplots(figsize=(8, 4))
+    ax.bar(costs["metric"], costs["total_cost"])
+    ax.set_title('Annual Cost Breakdown')
+    ax.set_ylabel('cost (lakh)')
+    return fig
+
+# Name of each figure, the function that draws it and the png it is saved to
+FIGURES = {
+    "berth_gantt" : (berth_gantt_figure, "Berth_Vessel_Turnover.png"),
+    "berth_heatmap" : (berth_heatmap_figure, "Berth_Occupancy_Heatmap.png"),
+    "annual_cost" : (annual_cost_figure, "Annual_Cost_Breakdown.png"),
+    "energy" : (energy_figure, "Energy_Consumption.png"),
+    "gate_queue" : (gate_queue_figure, "Gate_Queue.png")
+}
+
+def show(name, *args):
+    '''
+    Draws one figure from data already in memory and shows it.
+    Used by the simulations when SHOW_FIG is set.
+    '''
+    plt = pyplot(show=True)
+    FIGURES[name][0](plt, *args)
+    plt.show()
+
+def render(names=None, show=False):
+    '''
+    Draws the figures and saves them to CONFIG["output_dir"].
+    Parameters
+    names: names of FIGURES to draw (default: all of them)
+    show: also show them on screen
+    '''
+    plt = pyplot(show)
+    CONFIG["output_dir"].mkdir(exist_ok=True)
+    for name in names or FIGURES:
+        draw, file = FIGURES[name]
+        fig = draw(plt)
+        fig.tight_layout()
+        fig.savefig(CONFIG["output_dir"] / file, dpi=CONFIG["dpi"])
+        print(f"wrote {CONFIG['output_dir'] / file}")
+        if not show:
+            plt.close(fig)
+    if show:
+        plt.show()
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    show_figures = '--show' in args
+    names = [arg for arg in args if arg != '--show']
+    unknown = set(names) - set(FIGURES)
+    if unknown:
+        sys.exit(f"unknown figures {sorted(unknown)}, choose from {list(FIGURES)}")
+    render(names, show_figures)
@@ -0,0 +1,609 @@
+'''
+metrics_cube_hazira.py
+Bin every simulation output once into hourly integer buckets
+and keep the result as a rollup cube of
+hour/day/week/month x berth/resource class.
+
+Every timestamp is converted to the number of whole hours since
+1970-01-01 (an integer), so that a row of the cube is one hour
+and a column is one (measure, resource) pair, for example
+('downtime_hrs', 'Quay3') or ('berth_occupied_hrs', 'CT1').
+Coarser periods are computed by summing consecutive hourly rows,
+and resource classes by summing columns, so KPIs at any granularity
+or per-resource breakdown are answered from the cube without
+re-reading the raw csv files.
+
+The cube is cached in metrics_cube_hazira.pkl together with the
+size and modification time of each source file, so it is only
+rebuilt when one of the simulations has been re-run.
+'''
+
+import io
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from resources_hazira import BERTH, CLASSES, ids, class_codes, class_names
+
+SIM_START = pd.Timestamp('2025-01-01 00:00')
+SIM_END = SIM_START + pd.Timedelta(days=365)
+
+BERTHS = class_names(BERTH)
+
+# Output file of each simulation that feeds the cube
+SOURCES = {
+    'vessels' : 'vessel_turnaround_hazira.csv',
+    'moves' : 'container_moves_hazira.csv',
+    'cranes' : 'crane_uptime_hazira.csv',
+    'gate' : 'gate_entries_hazira.csv',
+    'energy' : 'energy_consumption_hazira.csv'
+}
+
+CACHE_FILE = 'metrics_cube_hazira.pkl'
+
+# The granularities that the cube can be rolled up to, finest first
+LEVELS = ['hour', 'day', 'week', 'month']
+
+# The longest period of each level in hours; the period after the one starting
+# at hour h is the one that contains h + PERIOD_MAX_HOURS
+PERIOD_MAX_HOURS = {'hour' : 1, 'day' : 24, 'week' : 7 * 24, 'month' : 31 * 24}
+
+# Measures that may only be 0 or 1 within an hour (an hour is either occupied or not)
+FLAG_MEASURES = ['berth_occupied_hrs']
+
+def to_hours(times):
+    '''
+    Converts timestamps to integer hour buckets.
+    Parameters
+    times: anything accepted by pd.to_datetime (Series, array, list)
+    Returns
+    np.ndarray of int64, the number of whole hours since 1970-01-01
+    '''
+    times = pd.to_datetime(times)
+    return np.asarray(times, dtype='datetime64[h]').astype(np.int64)
+
+def to_seconds(times):
+    '''
+    Converts timestamps to integer seconds since 1970-01-01.
+    '''
+    times = pd.to_datetime(times)
+    return np.asarray(times, dtype='datetime64[s]').astype(np.int64)
+
+def expand_hours(start_hours, end_hours):
+    '''
+    Lists every hour from start to end (inclusive) of each interval
+    without a Python loop.
+    Parameters
+    start_hours: int array, first hour of each interval
+    end_hours: int array, last hour of each interval
+    Returns
+    (row, hour): row is the index of the interval that each hour belongs to
+    '''
+    lengths = np.maximum(end_hours - start_hours + 1, 0)
+    row = np.repeat(np.arange(len(start_hours)), lengths)
+
+    # Position of each expanded hour within its own interval: 0, 1, 2, ..., 0, 1, ...
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return row, start_hours[row] + offsets
+
+def split_intervals(start_seconds, end_seconds, bucket=3600):
+    '''
+    Splits each [start, end) interval on bucket boundaries, so that
+    an interval which spans several hours (or a period boundary) is
+    shared out between them in proportion to the overlap.
+    Parameters
+    start_seconds: int array, interval starts in seconds since 1970-01-01
+    end_seconds: int array, interval ends in seconds since 1970-01-01
+    bucket: length of a bucket in seconds (default one hour)
+    Returns
+    (row, bucket_index, overlap_seconds)
+    '''
+    start_seconds = np.asarray(start_seconds, dtype=np.int64)
+    end_seconds = np.asarray(end_seconds, dtype=np.int64)
+
+    # Zero length intervals do not occupy any bucket
+    last = np.maximum(end_seconds - 1, start_seconds)
+    row, index = expand_hours(start_seconds // bucket, last // bucket)
+
+    lo = np.maximum(start_seconds[row], index * bucket)
+    hi = np.minimum(end_seconds[row], (index + 1) * bucket)
+    return row, index, np.maximum(hi - lo, 0)
+
+def resource_class(names):
+    '''
+    The class of each resource from the registry (see resources_hazira.py):
+    Quay3 -> quay, Yard11 -> yard, MP2 -> berth, CT1 -> berth
+    '''
+    codes = class_codes(ids(names))
+    # Names that are not in the registry keep the name without its trailing number as class
+    unknown = pd.Series(names, dtype='string')[codes < 0].str.replace(r'\d+$', '', regex=True).str.lower()
+    classes = np.array(CLASSES, dtype=object)[codes]
+    classes[codes < 0] = unknown.to_numpy(dtype=object)
+    return classes
+
+def period_start(hours, level):
+    '''
+    Maps integer hour buckets to the first hour of the period
+    that contains them.
+    Parameters
+    hours: int array of hour buckets
+    level: one of LEVELS
+    Returns
+    int array of hour buckets
+    '''
+    hours = np.asarray(hours, dtype=np.int64)
+    if level == 'hour':
+        return hours
+    if level == 'day':
+        return hours // 24 * 24
+    if level == 'week':
+        # 1970-01-01 was a Thursday, so shift by three days to start weeks on Monday
+        days = hours // 24
+        return (days - (days + 3) % 7) * 24
+    if level == 'month':
+        months = hours.astype('datetime64[h]').astype('datetime64[M]')
+        return months.astype('datetime64[h]').astype(np.int64)
+    raise ValueError(f'unknown level {level}, expected one of {LEVELS}')
+
+class MetricsCube:
+    '''
+    A dense hours x (measure, resource) array of hourly aggregates,
+    together with running sums per period for each coarser level.
+    The period sums are updated as rows are added, so adding a day
+    of data only touches the hours and periods in that day.
+    '''
+
+    def __init__(self, start=SIM_START, end=SIM_END, grow=False):
+        # The cube covers the hours in [start, end)
+        self.start_hour = int(to_hours([start])[0])
+        self.end_hour = self.start_hour
+
+        # If grow is set, hours after end extend the cube instead of being dropped
+        self.grow = grow
+
+        self.columns = [] # (measure, resource, resource_class) for each column
+        self.column_index = {} # (measure, resource) -> column number
+
+        # Only the first (end_hour - start_hour) rows are used, the rest is room to grow into
+        self.values = np.zeros((0, 0))
+
+        # For each level above hour: the first hour of each period, the number
+        # of cube hours in it, and the sum of each column over the period
+        self.period_starts = {level : np.zeros(0, dtype=np.int64) for level in LEVELS[1:]}
+        self.period_hours = {level : np.zeros(0, dtype=np.int64) for level in LEVELS[1:]}
+        self.period_sums = {level : np.zeros((0, 0)) for level in LEVELS[1:]}
+
+        # Rollups computed from the sums, keyed by (level, by)
+        self.rollups = {}
+
+        if end is not None:
+            self.extend(int(to_hours([end])[0]))
+
+    def extend(self, end_hour):
+        '''
+        Grows the cube so that it covers the hours up to end_hour.
+        '''
+        if end_hour <= self.end_hour:
+            return
+        new_hours = np.arange(self.end_hour, end_hour)
+
+        # Double the buffer when it runs out, so growing a day at a time stays cheap
+        num_hours = end_hour - self.start_hour
+        if num_hours > len(self.values):
+            buffer = np.zeros((max(num_hours, 2 * len(self.values)), len(self.columns)))
+            buffer[:len(self.values)] = self.values
+            self.values = buffer
+
+        for level in self.period_starts:
+            starts, counts = np.unique(period_start(new_hours, level), return_counts=True)
+
+            # The first new hour may belong to the last period that already exists
+            if len(self.period_starts[level]) and starts[0] == self.period_starts[level][-1]:
+                self.period_hours[level][-1] += counts[0]
+                starts, counts = starts[1:], counts[1:]
+
+            self.period_starts[level] = np.concatenate([self.period_starts[level], starts])
+            self.period_hours[level] = np.concatenate([self.period_hours[level], counts])
+            self.period_sums[level] = np.vstack([self.period_sums[level], np.zeros((len(starts), len(self.columns)))])
+
+        self.end_hour = end_hour
+
+    def column(self, measure, resource, cls):
+        '''
+        Returns the column number for the given measure and resource,
+        adding a new column of zeros the first time it is seen.
+        '''
+        key = (measure, resource)
+        if key not in self.column_index:
+            self.column_index[key] = len(self.columns)
+            self.columns.append((measure, resource, cls))
+            self.values = np.hstack([self.values, np.zeros((len(self.values), 1))])
+            for level in self.period_sums:
+                sums = self.period_sums[level]
+                self.period_sums[level] = np.hstack([sums, np.zeros((len(sums), 1))])
+        return self.column_index[key]
+
+    def add(self, measure, resources, classes, hours, values):
+        '''
+        Adds values into the hourly buckets of the given resources.
+        Hours outside of the cube are ignored.
+        Parameters
+        measure: name of the measure e.g. 'downtime_hrs'
+        resources: array of resource names, one per value
+        classes: array of resource classes, one per value
+        hours: int array of hour buckets
+        values: float array
+        '''
+        hours = np.asarray(hours, dtype=np.int64)
+        values = np.broadcast_to(np.asarray(values, dtype=float), hours.shape)
+        resources = np.broadcast_to(np.asarray(resources, dtype=object), hours.shape)
+        classes = np.broadcast_to(np.asarray(classes, dtype=object), hours.shape)
+
+        if self.grow and len(hours):
+            self.extend(int(hours.max()) + 1)
+
+        inside = (hours >= self.start_hour) & (hours < self.end_hour)
+        hours, values = hours[inside], values[inside]
+        resources, classes = resources[inside], classes[inside]
+        if not len(hours):
+            return
+
+        # Look up the column once per distinct resource rather than once per row
+        names, first, codes = np.unique(resources.astype(str), return_index=True, return_inverse=True)
+        cols = np.array([self.column(measure, name, classes[i]) for name, i in zip(names, first)], dtype=np.int64)
+        cols = cols[codes]
+        rows = hours - self.start_hour
+
+        if measure in FLAG_MEASURES:
+            # An hour is only counted once however many rows flag it, so only
+            # add the difference between the new flag and what is already there
+            cells, inverse = np.unique(rows * len(self.columns) + cols, return_inverse=True)
+            flags = np.zeros(len(cells))
+            np.maximum.at(flags, inverse, values)
+            rows, cols = np.divmod(cells, len(self.columns))
+            hours = rows + self.start_hour
+            values = np.maximum(flags - self.values[rows, cols], 0)
+
+        np.add.at(self.values, (rows, cols), values)
+
+        # Fold the same values into the running sum of every period they fall in
+        for level in self.period_sums:
+            periods = np.searchsorted(self.period_starts[level], period_start(hours, level))
+            np.add.at(self.period_sums[level], (periods, cols), values)
+
+        # Any rollups computed before this point are now out of date
+        self.rollups = {}
+
+    def hours_per_period(self, level):
+        '''
+        Number of hours of each period that lie inside the cube.
+        '''
+        if level == 'hour':
+            starts = np.arange(self.start_hour, self.end_hour)
+            counts = np.ones(len(starts), dtype=np.int64)
+        else:
+            starts, counts = self.period_starts[level], self.period_hours[level]
+        return pd.Series(counts, index=pd.to_datetime(starts.astype('datetime64[h]')))
+
+    def complete_periods(self, level):
+        '''
+        The periods that end at or before the end of the cube, i.e. all but a
+        last period that the cube only covers part of. A cube that grows
+        (see refresh_cube) ends after the latest hour with data, often part
+        way into a month, while a built cube ends at its given end.
+        Returns
+        pd.DatetimeIndex of period starts
+        '''
+        index = self.hours_per_period(level).index
+        starts = index.to_numpy().astype('datetime64[h]').astype(np.int64)
+        ends = period_start(starts + PERIOD_MAX_HOURS[level], level)
+        return index[ends <= self.end_hour]
+
+    def rollup(self, level='month', by=None):
+        '''
+        Sums the hourly cube up to the given level.
+        Parameters
+        level: one of LEVELS
+        by: None to total across resources, 'resource' or 'resource_class'
+        Returns
+        pd.DataFrame indexed by period start, with one column per measure
+        (or per (measure, resource/class) pair when by is given)
+        '''
+        if level not in LEVELS:
+            raise ValueError(f'unknown level {level}, expected one of {LEVELS}')
+
+        key = (level, by)
+        if key in self.rollups:
+            return self.rollups[key]
+
+        if level == 'hour':
+            starts = np.arange(self.start_hour, self.end_hour)
+            summed = self.values[:len(starts)]
+        else:
+            starts, summed = self.period_starts[level], self.period_sums[level]
+
+        columns = pd.MultiIndex.from_tuples(self.columns, names=['measure', 'resource', 'resource_class'])
+        df = pd.DataFrame(summed, index=starts, columns=columns)
+
+        # Sum columns that belong to the same group
+        group = ['measure'] if by is None else ['measure', by]
+        df = df.T.groupby(level=group).sum().T
+        df.index = pd.to_datetime(df.index.to_numpy().astype('datetime64[h]'))
+        df.index.name = level
+
+        self.rollups[key] = df
+        return df
+
+    def kpis(self, level='month', by=None):
+        '''
+        Derives the port KPIs from the summed measures.
+        Parameters
+        level: one of LEVELS
+        by: None, 'resource' or 'resource_class'
+        Returns
+        pd.DataFrame with berth_idle_hrs, avg_turnaround_hrs, teu,
+        downtime_hrs, trucks_processed and energy_kwh; when by is given
+        the index is (period, resource or class) and KPIs that do not
+        apply to a resource are NaN
+        '''
+        sums = self.rollup(level, by)
+        if by is not None:
+            sums = sums.stack(level=by, future_stack=True)
+
+        hours = self.hours_per_period(level).reindex(sums.index.get_level_values(0)).to_numpy()
+
+        # The number of berths that each row covers (1 for a single berth, 6 for the whole port)
+        classes = pd.DataFrame(self.columns, columns=['measure', 'resource', 'resource_class'])
+        berths = classes[classes.resource_class == 'berth'].drop_duplicates('resource')
+        if by is None:
+            num_berths = len(berths)
+        else:
+            num_berths = berths.groupby(by).size().reindex(sums.index.get_level_values(1)).to_numpy()
+
+        def measure(name):
+            if name in sums:
+                return sums[name].to_numpy()
+            return np.full(len(sums), np.nan)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            idle = hours * num_berths - np.nan_to_num(measure('berth_occupied_hrs'))
+            df = pd.DataFrame({
+                'berth_idle_hrs' : np.where(num_berths > 0, idle, np.nan) if by is not None else idle,
+                'avg_turnaround_hrs' : measure('turnaround_hrs') / measure('vessel_calls'),
+                'teu' : measure('teu'),
+                'downtime_hrs' : measure('downtime_hrs'),
+                'trucks_processed' : measure('trucks_processed'),
+                'energy_kwh' : measure('energy_kwh')
+            }, index=sums.index)
+        return df
+
+def add_vessels(cube, df):
+    '''
+    Berth occupancy and turnaround from vessel_turnaround_hazira.csv.
+    An hour counts as occupied if any vessel is at the berth during it.
+    '''
+    start = to_hours(df['start_time'])
+    end = to_hours(df['end_time'])
+    berth = df['berth'].to_numpy(dtype=object)
+    row, hour = expand_hours(start, end)
+    cube.add('berth_occupied_hrs', berth[row], 'berth', hour, 1)
+
+    # Turnaround is credited to the hour that the vessel arrived in
+    turnaround = (to_seconds(df['end_time']) - to_seconds(df['start_time'])) / 3600
+    arrival = to_hours(df['arrival_time'])
+    cube.add('turnaround_hrs', berth, 'berth', arrival, turnaround)
+    cube.add('vessel_calls', berth, 'berth', arrival, 1)
+
+def add_moves(cube, df):
+    '''
+    TEU per vessel call from container_moves_hazira.csv, counted once per call.
+    '''
+    calls = df.drop_duplicates(subset='call_id')
+    cube.add('teu', 'port', 'port', to_hours(calls['container_arrival']), calls['teu_handled'].to_numpy())
+
+def add_cranes(cube, df):
+    '''
+    Crane downtime from crane_uptime_hazira.csv. A failure that spans
+    several hours is split between them.
+    '''
+    row, hour, seconds = split_intervals(to_seconds(df['downtime_start']), to_seconds(df['downtime_end']))
+    names = df['resource_name'].to_numpy(dtype=object)
+    cube.add('downtime_hrs', names[row], resource_class(names)[row], hour, seconds / 3600)
+
+def add_gate(cube, df):
+    '''
+    Trucks processed from gate_entries_hazira.csv.
+    '''
+    cube.add('trucks_processed', 'Gate', 'gate', to_hours(df['time']), df['num_processed'].to_numpy())
+
+def add_energy(cube, df):
+    '''
+    Energy draw from energy_consumption_hazira.csv.
+    '''
+    cube.add('energy_kwh', 'port', 'port', to_hours(df['time']), df['energy_kWh'].to_numpy())
+
+# Columns to read from each source, and the function that bins it into the cube
+BINNERS = {
+    'vessels' : (['arrival_time', 'berth', 'start_time', 'end_time'], add_vessels),
+    'moves' : (['container_arrival', 'call_id', 'teu_handled'], add_moves),
+    'cranes' : (['resource_name', 'downtime_start', 'downtime_end'], add_cranes),
+    'gate' : (['time', 'num_processed'], add_gate),
+    'energy' : (['time', 'energy_kWh'], add_energy)
+}
+
+def source_signature(sources):
+    '''
+    Identifies the current contents of the source files by their
+    size and modification time.
+    '''
+    signature = {}
+    for name, path in sources.items():
+        stat = os.stat(path)
+        signature[name] = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    return signature
+
+def build_cube(sources=SOURCES, start=SIM_START, end=SIM_END):
+    '''
+    Reads each source once and bins it into a new cube.
+    Parameters
+    sources: dictionary of source name -> csv path (see SOURCES)
+    start, end: the hours covered by the cube
+    Returns
+    MetricsCube
+    '''
+    cube = MetricsCube(start, end)
+    for name, path in sources.items():
+        columns, binner = BINNERS[name]
+        binner(cube, pd.read_csv(path, usecols=columns))
+    return cube
+
+def load_cube(sources=SOURCES, start=SIM_START, end=SIM_END, cache=CACHE_FILE):
+    '''
+    Returns the cached cube if none of the sources have changed since
+    it was built, otherwise builds a new cube and caches it.
+    '''
+    signature = source_signature(sources)
+    key = (signature, str(pd.Timestamp(start)), str(pd.Timestamp(end)))
+
+    if os.path.exists(cache):
+        with open(cache, 'rb') as file:
+            cached_key, cube = pickle.load(file)
+        if cached_key == key:
+            return cube
+
+    cube = build_cube(sources, start, end)
+    save_cube(cube, key, cache)
+    return cube
+
+def save_cube(cube, key, cache=CACHE_FILE):
+    '''
+    Pickles the cube (including any rollups computed so far) with the
+    key it was built from.
+    '''
+    with open(cache, 'wb') as file:
+        pickle.dump((key, cube), file, protocol=pickle.HIGHEST_PROTOCOL)
+
+'''
+Incremental mode
+The gate and crane logs are appended to every day. Rather than
+re-binning the whole history, the cube and a cursor per source
+(the byte offset read so far) are kept in INCREMENTAL_FILE, and
+only the rows after each cursor are read and folded into the cube.
+'''
+
+INCREMENTAL_FILE = 'metrics_incremental_hazira.pkl'
+
+# Number of bytes before the cursor that are remembered to detect a rewritten file
+CURSOR_CHECK_BYTES = 256
+
+def read_appended(path, cursor, columns):
+    '''
+    Reads the rows appended to a csv since the cursor was taken.
+    Parameters
+    path: path of the csv file
+    cursor: dictionary returned by a previous call, or None to read from the start
+    columns: the columns to keep
+    Returns
+    (df, cursor) with the new rows and the cursor to use next time,
+    or (None, None) if the file was rewritten rather than appended to.
+    cursor['rows'] counts the rows read up to the cursor (None for a
+    cursor taken before rows were counted).
+    '''
+    with open(path, 'rb') as file:
+        if cursor is None:
+            header = file.readline()
+            offset = file.tell()
+            checked = b''
+            rows = 0
+        else:
+            header, offset, checked = cursor['header'], cursor['offset'], cursor['checked']
+            rows = cursor.get('rows')
+
+            # The file must still begin with the same header and hold the same bytes before the cursor
+            if file.readline() != header:
+                return None, None
+            file.seek(offset - len(checked))
+            if file.read(len(checked)) != checked:
+                return None, None
+
+        file.seek(offset)
+        chunk = file.read()
+
+    # Only take whole lines, a line that is still being written is read next time
+    chunk = chunk[:chunk.rfind(b'\n') + 1]
+
+    names = header.decode().strip().split(',')
+    if chunk.strip():
+        df = pd.read_csv(io.BytesIO(chunk), names=names, header=None, usecols=columns)
+    else:
+        df = pd.DataFrame(columns=columns)
+
+    cursor = {
+        'header' : header,
+        'offset' : offset + len(chunk),
+        'checked' : (checked + chunk)[-CURSOR_CHECK_BYTES:],
+        'rows' : None if rows is None else rows + len(df)
+    }
+    return df, cursor
+
+def refresh_cube(sources=SOURCES, start=SIM_START, state=INCREMENTAL_FILE, on_rows=None, extra_columns=None):
+    '''
+    Folds the rows appended to each source since the last refresh into
+    the persisted cube. The cube grows to cover new hours as they arrive.
+    If any source was rewritten (e.g. its simulation was re-run) the
+    cube is rebuilt from the start.
+    Parameters
+    sources: dictionary of source name -> csv path (see SOURCES)
+    start: the first hour covered by the cube
+    state: path of the pickle holding the cube and the cursors
+    on_rows: function(name, df, rows_before) called with the new rows of
+        each source, and the number of its rows read before them (0 when
+        it is read from the start, None if unknown), so that other
+        aggregates can be kept up to date from the same cursors
+    extra_columns: dictionary of source name -> columns to read for on_rows
+        besides those the cube needs
+    Returns
+    MetricsCube
+    '''
+    extra_columns = extra_columns or {}
+    cursors, cube = {}, None
+    if os.path.exists(state):
+        with open(state, 'rb') as file:
+            cursors, cube = pickle.load(file)
+    if cube is None or cube.start_hour != int(to_hours([start])[0]):
+        cursors, cube = {}, MetricsCube(start, end=None, grow=True)
+
+    # Every source is read before anything is binned, so a rebuild never follows a partial update
+    appended = {}
+    for name, path in sources.items():
+        columns, binner = BINNERS[name]
+        extra = [col for col in extra_columns.get(name, []) if col not in columns]
+        df, cursor = read_appended(path, cursors.get(name), columns + extra)
+
+        # A rewritten file cannot be subtracted from the partial aggregates
+        if cursor is None:
+            os.remove(state)
+            return refresh_cube(sources, start, state, on_rows, extra_columns)
+        appended[name] = df, cursor
+
+    for name, (df, cursor) in appended.items():
+        binner = BINNERS[name][1]
+        rows_before = cursors[name].get('rows') if name in cursors else 0
+        if on_rows is not None:
+            on_rows(name, df, rows_before)
+
+        # The moves of a vessel call may be split between two refreshes,
+        # so only count the TEU of calls that have not been seen before
+        if name == 'moves':
+            cursor['last_call'] = cursors.get(name, {}).get('last_call', 0)
+            df = df[df['call_id'] > cursor['last_call']]
+            if len(df):
+                cursor['last_call'] = int(df['call_id'].max())
+
+        if len(df):
+            binner(cube, df)
+        cursors[name] = cursor
+
+    with open(state, 'wb') as file:
+        pickle.dump((cursors, cube), file, protocol=pickle.HIGHEST_PROTOCOL)
+    return cube
@@ -0,0 +1,312 @@
+'''
+nowcast_hazira.py
+Nowcast: the next few days of the port, forward from where it is now.
+
+The yearly simulations start from an empty port on 2025-01-01. A nowcast
+starts from a snapshot of the port at one moment (format below),
+read from nowcast_state_hazira.json, which stands in for the live feed:
+- when each berth is next free and which vessels are waiting for one
+- the trucks queued at the gate
+- the cranes that are down and when their repair ends
+and simulates the next horizon_hours many times over (samples), each
+sample with its own vessel arrivals, service times, trucks and crane
+failures. The samples are batched as in batch_models_hazira.py (one row
+per sample) and the batches run in parallel worker processes, so
+hundreds of samples take a few seconds.
+
+The output, Nowcast_Hazira.csv, has one row per hour with percentile
+bands (CONFIG percentiles) across the samples of
+- gate_queue: trucks queued at the gate
+- vessels_waiting: vessels waiting for a berth
+- berth_wait_MP_hrs, berth_wait_CT_hrs: the wait of a vessel arriving at
+  that hour at a berth of the class
+- cranes_down: quay cranes and RTGs under repair
+and the hours until each waiting vessel of the snapshot is berthed are
+printed.
+
+Usage:
+    python nowcast_hazira.py                         nowcast from nowcast_state_hazira.json
+    python nowcast_hazira.py --snapshot-at "2025-06-01 08:00"
+                                                     write the snapshot from the simulation
+                                                     outputs at that time first, as a stand-in
+                                                     for the live feed
+
+The models are the ones of the yearly simulations, with their
+parameters from port_params_hazira.py, and two shortcuts: a crane that
+is up at the snapshot starts a new time to failure, and the gate works
+off the queued minutes of service (as in simulate_gate of
+batch_models_hazira.py) rather than truck by truck.
+'''
+
+import os
+import sys
+import json
+import math
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from random_streams_hazira import stream
+from batch_models_hazira import weibull_scale, workload
+from resources_hazira import QUAY, YARD, BERTH, class_names, of_class
+from simulate_gate_hazira import HOUR_TIMESTEP
+from port_params_hazira import (VESSEL_TYPES, DELAY_PROB, WEIBULL_K, MEAN_INTERARRIVAL, QUAY_DOWNTIME, YARD_DOWNTIME,
+                                TRUCKS_PER_DAY, PEAK_SURGE, PEAK_HOURS, SERVICE_MU, SERVICE_SIGMA, MIN_SERVICE)
+
+CONFIG = {
+    'snapshot' : 'nowcast_state_hazira.json',
+    'output_csv' : 'Nowcast_Hazira.csv',
+    'horizon_hours' : 72,
+    'samples' : 500,
+    'chunk_size' : 25, # Samples per task sent to a worker
+    'workers' : os.cpu_count(),
+    'percentiles' : [10, 50, 90]
+}
+
+'''
+The snapshot, with times as text:
+{
+    "time" : "2025-06-01 08:00:00",
+    "berths" : {"MP1" : "2025-06-01 17:42:10", ...},    busy until (free berths may be left out)
+    "waiting_vessels" : [{"vessel_type" : "bulk", "arrival_time" : "2025-06-01 05:13:00"}, ...],
+    "gate_queue" : 14,                                  trucks
+    "cranes_down" : {"Quay3" : "2025-06-01 08:50:00"}   repair ends
+}
+'''
+
+BERTH_NAMES = class_names(BERTH)
+BERTH_CLASSES = {berth_class : [name for name in BERTH_NAMES if name.startswith(berth_class)] for berth_class in ['MP', 'CT']}
+
+CRANES = class_names(QUAY) + class_names(YARD)
+DOWNTIME = np.array([QUAY_DOWNTIME] * len(of_class(QUAY)) + [YARD_DOWNTIME] * len(of_class(YARD))) # Hours per failure
+
+# The hourly series of the output
+SERIES = ['gate_queue', 'vessels_waiting'] + [f'berth_wait_{berth_class}_hrs' for berth_class in BERTH_CLASSES] + ['cranes_down']
+
+def hours_after(time, now):
+    '''
+    Hours from now until a time given as text (negative if it is before now).
+    '''
+    return (pd.Timestamp(time) - now) / pd.Timedelta(hours=1)
+
+def load_snapshot(path):
+    '''
+    Reads a snapshot of the port.
+    Parameters
+    path: json file (see the format above)
+    Returns
+    dict of the snapshot time and, in hours from then, the time each berth is free
+    (BERTH_NAMES order) and each crane is repaired (CRANES order, 0 when up),
+    the waiting vessels as (vessel_type, arrival) and the gate queue in trucks
+    '''
+    with open(path) as file:
+        snapshot = json.load(file)
+    now = pd.Timestamp(snapshot['time'])
+    berths = snapshot.get('berths', {})
+    cranes_down = snapshot.get('cranes_down', {})
+    waiting = sorted(snapshot.get('waiting_vessels', []), key=lambda vessel: vessel['arrival_time'])
+    return {
+        'time' : now,
+        'berth_free' : np.array([max(0, hours_after(berths[name], now)) if name in berths else 0 for name in BERTH_NAMES]),
+        'crane_repaired' : np.array([max(0, hours_after(cranes_down[name], now)) if name in cranes_down else 0 for name in CRANES]),
+        'waiting' : [(vessel['vessel_type'], min(0, hours_after(vessel['arrival_time'], now))) for vessel in waiting],
+        'gate_queue' : int(snapshot.get('gate_queue', 0))
+    }
+
+def snapshot_from_outputs(time):
+    '''
+    The snapshot of the port at a time of the simulated year, from the
+    vessel, gate and crane outputs, to stand in for the live feed.
+    Parameters
+    time: a time within the simulated year
+    Returns
+    dict in the format of the snapshot file
+    '''
+    now = pd.Timestamp(time)
+    vessels = pd.read_csv('vessel_turnaround_hazira.csv', parse_dates=['arrival_time', 'start_time', 'end_time'])
+    gate = pd.read_csv('gate_entries_hazira.csv', parse_dates=['time'])
+    cranes = pd.read_csv('crane_uptime_hazira.csv', parse_dates=['downtime_start', 'downtime_end'])
+
+    # Vessels at a berth, and vessels that have arrived but are not yet at one
+    docked = vessels[(vessels['start_time'] <= now) & (vessels['end_time'] > now)]
+    waiting = vessels[(vessels['arrival_time'] <= now) & (vessels['start_time'] > now)]
+    down = cranes[(cranes['downtime_start'] <= now) & (cranes['downtime_end'] > now)]
+    queue = gate.loc[gate['time'] <= now, 'queue_length']
+
+    return {
+        'time' : str(now),
+        'berths' : {berth : str(end) for berth, end in docked.groupby('berth')['end_time'].max().items()},
+        'waiting_vessels' : [{'vessel_type' : vessel_type, 'arrival_time' : str(arrival)}
+                             for vessel_type, arrival in zip(waiting['vessel_type'], waiting['arrival_time'])],
+        'gate_queue' : int(queue.iloc[-1]) if len(queue) else 0,
+        'cranes_down' : {crane : str(end) for crane, end in down.groupby('resource_name')['downtime_end'].max().items()}
+    }
+
+def forward_vessels(rng, snapshot, samples, hours):
+    '''
+    Vessels docked at the berth of their class that is free first, as in
+    simulate_vessels_hazira.py: first the vessels waiting in the snapshot,
+    then new Poisson arrivals.
+    Returns
+    dict of arrays: vessels_waiting (samples, hours), berth_wait_<class>_hrs
+    (samples, hours) and berthed (samples, waiting vessels), hours until each
+    waiting vessel of the snapshot is at a berth
+    '''
+    end_of_hour = np.arange(1, hours + 1)
+    rows = np.arange(samples)
+    result = {'vessels_waiting' : np.zeros((samples, hours), dtype=int),
+              'berthed' : np.zeros((samples, len(snapshot['waiting'])))}
+
+    for berth_class, names in BERTH_CLASSES.items():
+        types = [name for name, params in VESSEL_TYPES.items() if params['berth_class'] == berth_class]
+        rates = np.array([VESSEL_TYPES[name]['arrivals_per_year'] for name in types]) / (365 * 24)
+        waiting = [(number, vessel_type, arrival) for number, (vessel_type, arrival) in enumerate(snapshot['waiting'])
+                   if VESSEL_TYPES[vessel_type]['berth_class'] == berth_class]
+
+        # Enough new arrivals that every sample runs past the horizon
+        expected = rates.sum() * hours
+        max_calls = int(expected + 6 * math.sqrt(expected) + 10)
+        new = np.cumsum(rng.exponential(1 / rates.sum(), size=(samples, max_calls)), axis=1)
+        arrival = np.hstack([np.broadcast_to([[a for _, _, a in waiting]], (samples, len(waiting))), new])
+        active = arrival < hours
+
+        # Type of each vessel (waiting vessels have theirs), then its service time as in the Vessel class
+        kind = np.hstack([np.broadcast_to([[types.index(t) for _, t, _ in waiting]], (samples, len(waiting))).astype(int),
+                          rng.choice(len(types), size=(samples, max_calls), p=rates / rates.sum())])
+        mu = np.array([VESSEL_TYPES[name]['service_mu'] for name in types])[kind]
+        sigma = np.array([VESSEL_TYPES[name]['service_sigma'] for name in types])[kind]
+        service = np.maximum(1, rng.normal(mu, sigma))
+        service += (rng.random(kind.shape) < DELAY_PROB) * rng.uniform(.5, 3, size=kind.shape)
+
+        next_idle = np.broadcast_to(snapshot['berth_free'][[BERTH_NAMES.index(name) for name in names]],
+                                    (samples, len(names))).copy()
+        start = np.full(arrival.shape, np.inf)
+        # The earliest a berth of the class is free once the first k vessels are docked
+        first_free = np.empty((samples, arrival.shape[1] + 1))
+        first_free[:, 0] = next_idle.min(axis=1)
+
+        # Vessels are docked in order of arrival, one vessel of every sample per step
+        for k in range(arrival.shape[1]):
+            berth = next_idle.argmin(axis=1)
+            free = next_idle[rows, berth]
+            start[:, k] = np.where(active[:, k], np.maximum(arrival[:, k], free), np.inf)
+            next_idle[rows, berth] = np.where(active[:, k], start[:, k] + service[:, k], free)
+            first_free[:, k + 1] = next_idle.min(axis=1)
+
+        # Waiting at the end of each hour: arrived and not yet at a berth
+        arrived = active[:, :, None] & (arrival[:, :, None] <= end_of_hour)
+        result['vessels_waiting'] += (arrived & (start[:, :, None] > end_of_hour)).sum(axis=1)
+
+        # A vessel arriving at the end of an hour is docked after every vessel that arrived before it
+        docked_before = arrived.sum(axis=1)
+        result[f'berth_wait_{berth_class}_hrs'] = np.maximum(0, np.take_along_axis(first_free, docked_before, axis=1) - end_of_hour)
+        for column, (number, _, _) in enumerate(waiting):
+            result['berthed'][:, number] = start[:, column]
+    return result
+
+def forward_gate(rng, snapshot, samples, hours):
+    '''
+    Poisson trucks with the peak-hour surge, served first come first served
+    from the queue of the snapshot on, as minutes of service waiting at the gate.
+    Returns
+    gate_queue in trucks at the end of each hour, shape (samples, hours)
+    '''
+    ticks = snapshot['time'] + pd.to_timedelta(np.arange(hours * HOUR_TIMESTEP) / HOUR_TIMESTEP, unit='h')
+    lam = np.where(ticks.hour.isin(PEAK_HOURS), PEAK_SURGE, 1) * TRUCKS_PER_DAY / (24 * HOUR_TIMESTEP)
+    counts = rng.poisson(lam, size=(samples, len(ticks)))
+    counts[:, 0] += snapshot['gate_queue']
+
+    # Service minutes of every truck, at least MIN_SERVICE as at the yearly gate, summed by quarter hour
+    service_mins = np.maximum(MIN_SERVICE, rng.normal(SERVICE_MU, SERVICE_SIGMA, counts.sum()))
+    work = np.bincount(np.repeat(np.arange(counts.size), counts.ravel()), weights=service_mins,
+                       minlength=counts.size).reshape(counts.shape)
+    waiting = workload(work, np.full(samples, 60 / HOUR_TIMESTEP))
+    return waiting[:, HOUR_TIMESTEP - 1::HOUR_TIMESTEP] / SERVICE_MU
+
+def forward_cranes(rng, snapshot, samples, hours):
+    '''
+    Weibull failures of every quay crane and RTG after the repairs of the snapshot.
+    Returns
+    cranes_down at the end of each hour, shape (samples, hours)
+    '''
+    end_of_hour = np.arange(1, hours + 1)
+    clock = np.broadcast_to(snapshot['crane_repaired'], (samples, len(CRANES))).copy()
+    down = clock[:, :, None] > end_of_hour
+    scale = weibull_scale(WEIBULL_K, MEAN_INTERARRIVAL)
+
+    # Draw a block of interarrival times at a time until every clock has passed the horizon
+    block = int(hours / scale * 1.2) + 16
+    while (clock < hours).any():
+        failures = clock[:, :, None] + np.cumsum(rng.weibull(WEIBULL_K, size=clock.shape + (block,)) * scale, axis=2)
+        repaired = failures + DOWNTIME[None, :, None]
+        down |= ((failures[..., None] <= end_of_hour) & (repaired[..., None] > end_of_hour)).any(axis=2)
+        clock = failures[:, :, -1]
+    return down.sum(axis=1)
+
+def forward(snapshot, samples, hours, chunk):
+    '''
+    One batch of samples, run in a worker process.
+    Parameters
+    snapshot: from load_snapshot
+    samples: number of samples in the batch
+    hours: horizon of the nowcast
+    chunk: number of the batch, which picks its random stream
+    Returns
+    dict of arrays with one row per sample
+    '''
+    rng = stream('nowcast', chunk)
+    result = forward_vessels(rng, snapshot, samples, hours)
+    result['gate_queue'] = forward_gate(rng, snapshot, samples, hours)
+    result['cranes_down'] = forward_cranes(rng, snapshot, samples, hours)
+    return result
+
+def nowcast(snapshot, samples=CONFIG['samples'], hours=CONFIG['horizon_hours'], workers=CONFIG['workers']):
+    '''
+    Runs the samples in batches of CONFIG chunk_size, in parallel unless workers is 1.
+    The batches and their streams do not depend on workers, so neither does the result.
+    Returns
+    dict of arrays with one row per sample
+    '''
+    sizes = [min(CONFIG['chunk_size'], samples - start) for start in range(0, samples, CONFIG['chunk_size'])]
+    args = ([snapshot] * len(sizes), sizes, [hours] * len(sizes), range(len(sizes)))
+    if workers == 1:
+        batches = list(map(forward, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            batches = list(pool.map(forward, *args))
+    return {key : np.concatenate([batch[key] for batch in batches]) for key in batches[0]}
+
+def bands(result, snapshot, percentiles=CONFIG['percentiles']):
+    '''
+    Hourly percentile bands across the samples, one row per hour.
+    '''
+    hours = result['gate_queue'].shape[1]
+    df = pd.DataFrame({'time' : snapshot['time'] + pd.to_timedelta(np.arange(1, hours + 1), unit='h')})
+    for key in SERIES:
+        for p, band in zip(percentiles, np.percentile(result[key], percentiles, axis=0)):
+            df[f'{key}_p{p}'] = band.round(2)
+    return df
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Percentile bands of the next hours of the port, from a snapshot.')
+    parser.add_argument('--snapshot-at', help='first write the snapshot from the simulation outputs at this time')
+    args = parser.parse_args()
+
+    if args.snapshot_at:
+        with open(CONFIG['snapshot'], 'w') as file:
+            json.dump(snapshot_from_outputs(args.snapshot_at), file, indent=4)
+    if not os.path.exists(CONFIG['snapshot']):
+        sys.exit(f"no snapshot {CONFIG['snapshot']} (write one from the outputs with --snapshot-at TIME)")
+
+    snapshot = load_snapshot(CONFIG['snapshot'])
+    result = nowcast(snapshot)
+    df = bands(result, snapshot)
+    df.to_csv(CONFIG['output_csv'], index=False)
+
+    low, mid, high = [f'p{p}' for p in CONFIG['percentiles']]
+    print(f"nowcast from {snapshot['time']}, {CONFIG['samples']} samples of {CONFIG['horizon_hours']} h -> {CONFIG['output_csv']}")
+    for (vessel_type, arrival), berthed in zip(snapshot['waiting'], result['berthed'].T):
+        lo, med, hi = np.percentile(berthed, CONFIG['percentiles'])
+        print(f"  {vessel_type} waiting {-arrival:.1f} h: berthed in {med:.1f} h ({lo:.1f}-{hi:.1f})")
+    for key in SERIES:
+        print(f"  {key}: peak median {df[f'{key}_{mid}'].max():.1f}, band {df[f'{key}_{low}'].min():.1f}-{df[f'{key}_{high}'].max():.1f}")
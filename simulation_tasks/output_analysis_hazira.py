@@ -0,0 +1,169 @@
+'''
+output_analysis_hazira.py
+Steady-state KPIs with confidence intervals from one long run.
+
+The simulations start with an empty port on 2025-01-01, so the first
+weeks of the gate queue and of the vessel waits are lower than they are
+once the port has filled up. Rather than averaging many replications of
+a year that all carry that bias, run one long simulation
+(HAZIRA_DAYS, see checkpoint_hazira.py) and analyse it here:
+- the warm-up (initial transient) is detected with MSER-5: the series is
+  averaged in batches of 5 observations, and the warm-up is the number
+  of leading batches d, within the first half of the run, that minimises
+  MSER(d) = sum((Y[i] - mean(Y[d:]))^2 for i >= d) / (n - d)^2
+  i.e. the truncation that gives the narrowest interval for the mean
+- the rest of the series is split into CONFIG batches batch means; the
+  batch means of a long enough batch are close to independent and
+  normal, so mean +- t(batches - 1) * sd(batch means) / sqrt(batches)
+  is a confidence interval for the steady-state mean
+- lag1 is the autocorrelation of the batch means. Above 0.2 the batches
+  are too short for the interval to be trusted, or the series has no
+  steady state (the queue keeps growing), and the result is flagged, as
+  it is when MSER truncates the whole first half of the run
+- days_needed is the length of run that would give a half width of
+  CONFIG relative_precision of the mean, from the variance of this run
+
+Usage:
+    HAZIRA_DAYS=3650 python simulate_vessels_hazira.py
+    HAZIRA_DAYS=3650 python simulate_gate_hazira.py
+    python output_analysis_hazira.py
+writes Output_Analysis_Hazira.csv, one row per series.
+'''
+
+import math
+import numpy as np
+import pandas as pd
+from statistics import NormalDist
+from shared_arrays_hazira import attach
+
+CONFIG = {
+    'output_csv' : 'Output_Analysis_Hazira.csv',
+    'mser_batch' : 5, # Observations averaged before MSER (MSER-5)
+    'batches' : 20,
+    'confidence' : 0.95,
+    'max_lag1' : 0.2, # Highest acceptable autocorrelation of the batch means
+    'relative_precision' : 0.05 # Target half width, as a fraction of the mean
+}
+
+def t_quantile(q, df):
+    '''
+    Quantile of Student's t distribution with df degrees of freedom.
+    Uses scipy when it is installed, otherwise the Cornish-Fisher expansion
+    around the normal quantile (Abramowitz and Stegun 26.7.5), which is
+    within 1e-3 of it for df >= 5.
+    '''
+    try:
+        from scipy.stats import t
+        return float(t.ppf(q, df))
+    except ImportError:
+        z = NormalDist().inv_cdf(q)
+        g1 = (z**3 + z) / 4
+        g2 = (5*z**5 + 16*z**3 + 3*z) / 96
+        g3 = (3*z**7 + 19*z**5 + 17*z**3 - 15*z) / 384
+        g4 = (79*z**9 + 776*z**7 + 1482*z**5 - 1920*z**3 - 945*z) / 92160
+        return z + g1/df + g2/df**2 + g3/df**3 + g4/df**4
+
+def mser(series, batch=CONFIG['mser_batch']):
+    '''
+    Warm-up of a series by MSER-m.
+    Parameters
+    series: observations in the order they were made
+    batch: m, the observations averaged into one before truncating
+    Returns
+    number of observations to drop from the start
+    '''
+    n = len(series) // batch
+    y = np.asarray(series[:n * batch], dtype=float).reshape(n, batch).mean(axis=1)
+
+    # Sums over y[d:] for every d, from the end
+    count = np.arange(n, 0, -1)
+    total = np.cumsum(y[::-1])[::-1]
+    squares = np.cumsum((y**2)[::-1])[::-1]
+    statistic = (squares - total**2 / count) / count**2
+
+    # Only truncations in the first half, past that MSER is dominated by noise at the end
+    return int(statistic[:n // 2 + 1].argmin()) * batch
+
+def batch_means(series, batches=CONFIG['batches'], confidence=CONFIG['confidence']):
+    '''
+    Confidence interval for the mean of a stationary series by batch means.
+    Parameters
+    series: observations after the warm-up
+    batches: number of batches (the first len % batches observations are dropped)
+    confidence: level of the interval
+    Returns
+    dict of mean, half_width, batch_size and lag1 (autocorrelation of the batch means)
+    '''
+    size = len(series) // batches
+    y = np.asarray(series[len(series) - size * batches:], dtype=float).reshape(batches, size).mean(axis=1)
+    centred = y - y.mean()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        lag1 = (centred[1:] * centred[:-1]).sum() / (centred**2).sum()
+    return {
+        'mean' : y.mean(),
+        'half_width' : t_quantile((1 + confidence) / 2, batches - 1) * y.std(ddof=1) / math.sqrt(batches),
+        'batch_size' : size,
+        'lag1' : lag1
+    }
+
+def analyse(name, times, series):
+    '''
+    Warm-up, steady-state mean and confidence interval of one series.
+    Parameters
+    name: name of the series in the output
+    times: time of each observation
+    series: the observations, in time order
+    Returns
+    dict, one row of the output
+    '''
+    times = pd.to_datetime(np.asarray(times))
+    warmup = mser(series)
+    steady = batch_means(series[warmup:])
+    simulated_days = (times[-1] - times[0]) / pd.Timedelta(days=1)
+    target = CONFIG['relative_precision'] * abs(steady['mean'])
+
+    return {
+        'series' : name,
+        'observations' : len(series),
+        'simulated_days' : round(simulated_days, 1),
+        'warmup_observations' : warmup,
+        'warmup_end' : times[warmup],
+        'mean' : steady['mean'],
+        'ci_low' : steady['mean'] - steady['half_width'],
+        'ci_high' : steady['mean'] + steady['half_width'],
+        'half_width' : steady['half_width'],
+        'batch_size' : steady['batch_size'],
+        'lag1' : steady['lag1'],
+        'steady_state' : abs(steady['lag1']) <= CONFIG['max_lag1'] and warmup < len(series) // 2 - CONFIG['mser_batch'],
+        # The half width shrinks with the square root of the length of the run
+        'days_needed' : round(simulated_days * (steady['half_width'] / target)**2, 1) if target > 0 else np.nan
+    }
+
+def vessel_series():
+    '''
+    Turnaround and berth wait of every vessel in hours, in order of arrival.
+    '''
+    vessels = attach('vessel_turnaround_hazira.csv', ['arrival_time', 'start_time', 'end_time'])
+    hour = np.timedelta64(1, 'h')
+    return {
+        'vessel_turnaround_hrs' : (vessels['arrival_time'], (vessels['end_time'] - vessels['arrival_time']) / hour),
+        'berth_wait_hrs' : (vessels['arrival_time'], (vessels['start_time'] - vessels['arrival_time']) / hour)
+    }
+
+def gate_series():
+    '''
+    Trucks queued at the gate at the end of every hour.
+    '''
+    gate = attach('gate_entries_hazira.csv', ['time', 'queue_length'])
+    return {'gate_queue_length' : (gate['time'], gate['queue_length'])}
+
+if __name__ == '__main__':
+    rows = [analyse(name, times, series) for name, (times, series) in {**vessel_series(), **gate_series()}.items()]
+    df = pd.DataFrame(rows)
+    df.to_csv(CONFIG['output_csv'], index=False)
+
+    level = round(CONFIG['confidence'] * 100)
+    for row in rows:
+        flag = '' if row['steady_state'] else f"  (lag1 {row['lag1']:.2f}: no steady state, or batches too short)"
+        print(f"{row['series']}: warm-up to {row['warmup_end']}, mean {row['mean']:.2f} "
+              f"({level}% CI {row['ci_low']:.2f}-{row['ci_high']:.2f}) from {row['simulated_days']} days{flag}")
@@ -0,0 +1,37 @@
+'''
+port_params_hazira.py
+The parameters of the port models that more than one script needs:
+the vessel mix, the crane failures and the gate.
+
+The yearly simulations (simulate_vessels_hazira.py,
+simulate_cranes_hazira.py, simulate_gate_hazira.py), the nowcast and
+the batched models take them from here instead of keeping a copy each,
+so a change to the port is made once and the nowcast and the fleet
+sizing always run the same port as the yearly simulations.
+'''
+
+# Arrivals per year, service time (hours) and berth class of each type of vessel.
+# The mix keeps the totals of the original model: 1 200 calls/yr with a mean service of about 23 h.
+VESSEL_TYPES = {
+    'container' : {'arrivals_per_year' : 500, 'service_mu' : 22, 'service_sigma' : 4, 'berth_class' : 'CT'},
+    'bulk' : {'arrivals_per_year' : 450, 'service_mu' : 25, 'service_sigma' : 5, 'berth_class' : 'MP'},
+    'tanker' : {'arrivals_per_year' : 250, 'service_mu' : 21, 'service_sigma' : 4, 'berth_class' : 'MP'}
+}
+DELAY_PROB = .11 # Chance that a vessel is delayed by U(0.5, 3) extra hours
+
+# Crane failures: Weibull(k) time between failures with a mean of MEAN_INTERARRIVAL hours,
+# and the hours each failure lasts
+WEIBULL_K = 1.7
+MEAN_INTERARRIVAL = 12
+QUAY_DOWNTIME = 1.2
+YARD_DOWNTIME = 1.0
+
+# Gate: trucks per day, with the surge in the peak hours (08-10 h, 17-19 h)
+TRUCKS_PER_DAY = 160
+PEAK_SURGE = 1.28
+PEAK_HOURS = [8, 9, 10, 17, 18, 19]
+
+# Gate service time in minutes, 6 at minimum, otherwise normally distributed
+SERVICE_MU = 11
+SERVICE_SIGMA = 2.5
+MIN_SERVICE = 6
@@ -1,116 +1,128 @@
 '''
 process_metrics_hazira.py
-Aggregate S1–S8 outputs into monthly metrics: 
-berth idle hrs, avg vessel turnaround, 
-TEU moves, crane downtime hrs, 
+Aggregate S1–S8 outputs into monthly metrics:
+berth idle hrs, avg vessel turnaround,
+TEU moves, crane downtime hrs,
 trucks processed, kWh consumption.
+
+Each output is binned once into the hourly rollup cube
+(see metrics_cube_hazira.py), and the monthly table is read
+from the cube, so other granularities can be requested with
+LEVEL without changing the code below.
+
+Run with --incremental when rows have been appended to the
+output csv files (e.g. the daily gate and crane logs): only the
+new rows are binned into the cube persisted from the last run,
+and the cube grows past 2025 as new days arrive.
+
+The tail KPIs (P95 vessel turnaround, P99 gate queue) are read from
+monthly quantile sketches (see quantile_sketch_hazira.py), which are
+saved to kpi_sketches_hazira.pkl to be merged with other replications.
+With --incremental the saved sketches are only updated with the rows
+that the cube folds in.
 '''
 
-import csv
+import os
+import sys
 import pandas as pd
-import numpy as np
-import math
-
-# METRIC 1: berth idle hours
-# [arrival_time,berth,service_time,delay_flag,start_time,end_time]
-vessel_turnaround = []
-with open('vessel_turnaround_hazira.csv', 'r') as file:
-    csvreader = csv.reader(file)
-    for row in csvreader:
-        vessel_turnaround.append(row)
-vessel_turnaround = vessel_turnaround[1:]
-
-# Create a dataframe that will store the information
-BERTHS = ['MP1', 'MP2', 'MP3', 'MP4', 'CT1', 'CT2']
-idx = pd.date_range('2025-01-01 00:00', '2025-12-31 23:00', freq='h')
-df_occ = pd.DataFrame(
-    0, # fill with zeros
-    index=idx, # index the dataframe by dates
-    columns=BERTHS # columns will be names of berths
-)
-
-# For each row in the csv, representing an arrived vessel
-for vessel in vessel_turnaround:
-    # Obtain the start and end hours by rounding down the start and end time of the vessel's processing
-    start_hour = pd.to_datetime(vessel[4]).floor('h')
-    end_hour= pd.to_datetime(vessel[5]).floor('h')
-
-    # Get list of all hours that overlap with start and end range
-    hours = pd.date_range(start_hour, end_hour, freq='h').intersection(df_occ.index)
-    df_occ.loc[hours, vessel[1]] = 1
-
-# Only get the part of the dataframe that is the berths
-df_berths = df_occ[['MP1', 'MP2', 'MP3', 'MP4', 'CT1', 'CT2']].astype(int)
-
-idle_hours = (1 - df_berths).sum(axis=1).resample('ME').sum() # If we only care about total idle hours
-# idle_hours = (1 - df_berths).resample('ME').sum() # If we want to separate by berth
-
-# METRIC 2: average vessel turnaround
-df_vessel = pd.read_csv('vessel_turnaround_hazira.csv')
-
-# Need to convert some columns to be parsed as datetime objects
-df_vessel['arrival_time'] = pd.to_datetime(df_vessel['arrival_time'])
-df_vessel['start_time'] = pd.to_datetime(df_vessel['start_time'])
-df_vessel['end_time'] = pd.to_datetime(df_vessel['end_time'])
-
-# Create the turnaround column as the difference between end and start times, in hours
-df_vessel['turnaround'] = (
-    df_vessel['end_time'] 
-  - df_vessel['start_time']
-).dt.total_seconds() / 3600
-
-# .resample will group by months (ME) but not using the usual index column, but rather the times in arrival_time
-avg_turn = df_vessel.resample('ME', on='arrival_time').turnaround.mean()
-
-# METRIC 3: TEU moves
-df_moves = pd.read_csv('container_moves_hazira.csv')
-df_moves['container_arrival'] = pd.to_datetime(df_moves['container_arrival'])
-df_calls = (
-    df_moves[['call_id','container_arrival','teu_handled']]
-      .drop_duplicates(subset='call_id') # Only want the teu handled once per vessel
-      .set_index('container_arrival') # Want to choose montly metrics by the arrival time
-)
-
-# Find the total number of TEU moved
-monthly_teu_moves = df_calls['teu_handled'].resample('ME').sum()
-
-# METRIC 4: crane downtime hours
-df_crane = pd.read_csv('crane_uptime_hazira.csv')
-# Convert start and end to be datetime objects
-df_crane['downtime_start'] = pd.to_datetime(df_crane['downtime_start'])
-df_crane['downtime_end'] = pd.to_datetime(df_crane['downtime_end'])
-# Calculate the duration of each downtime
-df_crane['duration'] = df_crane['downtime_end'] - df_crane['downtime_start']
-# Calculate total monthly downtime
-crane_downtime_quay = df_crane[df_crane['resource_name'].str.startswith('Quay')].resample('ME', on='downtime_start').duration.sum()
-crane_downtime_yard = df_crane[df_crane['resource_name'].str.startswith('Yard')].resample('ME', on='downtime_start').duration.sum()
-
-# METRIC 5: trucks processed
-df_trucks = pd.read_csv('gate_entries_hazira.csv')
-df_trucks['time'] = pd.to_datetime(df_trucks['time']) # Convert timestamps to pandas objects
-
-# Calculate the sum of trucks processed within each month
-trucks_proc = df_trucks.resample('ME', on='time').num_processed.sum()
-
-# METRIC 6: kWh consumption
-df_energy = pd.read_csv('energy_consumption_hazira.csv')
-df_energy['time'] = pd.to_datetime(df_energy['time'])
-
-# Find total amount of energy per month
-kwh_monthly = df_energy.resample('ME', on='time').energy_kWh.sum()
+from metrics_cube_hazira import SOURCES, load_cube, refresh_cube
+from shared_arrays_hazira import attach
+from quantile_sketch_hazira import SKETCH_FILE, monthly_sketches, merge_sketches, tail_kpis, save_sketches, load_sketches
+
+LEVEL = 'month' # Any of 'hour', 'day', 'week', 'month'
+INCREMENTAL = '--incremental' in sys.argv
+
+# Columns of the sources of the tail KPIs
+TAIL_COLUMNS = {
+    'vessels' : ['arrival_time', 'start_time', 'end_time'],
+    'gate' : ['time', 'queue_length']
+}
+
+def tail_values(name, rows):
+    '''
+    The tail KPI of a source and its values, one per row.
+    Turnaround is measured as in the cube (start to end) and credited to the month of arrival.
+    Parameters
+    name: 'vessels' or 'gate'
+    rows: the TAIL_COLUMNS of the source (csv rows or shared arrays)
+    Returns
+    (kpi, times, values)
+    '''
+    if name == 'vessels':
+        turnaround = pd.to_datetime(rows['end_time']) - pd.to_datetime(rows['start_time'])
+        return 'turnaround_hrs', rows['arrival_time'], turnaround / pd.Timedelta(hours=1)
+    return 'gate_queue_length', rows['time'], rows['queue_length']
+
+def update_sketches(sketches, name, df, rows_before):
+    '''
+    Adds the rows the cube has just read from a source to the sketches of
+    its tail KPI. If the sketches do not hold exactly the rows read before
+    (the source was read from the start, or the sketches were written by
+    another run) they are rebuilt from the whole source instead.
+    '''
+    if name not in TAIL_COLUMNS:
+        return
+    kpi, times, values = tail_values(name, df)
+    seen = sum(sketch.count for sketch in sketches.get(kpi, {}).values())
+    if rows_before == 0:
+        sketches[kpi] = {}
+    elif rows_before != seen:
+        kpi, times, values = tail_values(name, pd.read_csv(SOURCES[name], usecols=TAIL_COLUMNS[name]))
+        sketches[kpi] = {}
+    merge_sketches(sketches, {kpi : monthly_sketches(times, values)})
+
+if INCREMENTAL:
+    # Folds in the rows appended since the last run (metrics_incremental_hazira.pkl),
+    # and adds the same rows to the sketches of the last run
+    sketches = load_sketches() if os.path.exists(SKETCH_FILE) else {}
+    cube = refresh_cube(on_rows=lambda name, df, rows_before : update_sketches(sketches, name, df, rows_before),
+                        extra_columns=TAIL_COLUMNS)
+else:
+    # Loads the cube from metrics_cube_hazira.pkl unless a simulation has been re-run
+    cube = load_cube()
+
+    # The sketches of this run, from the outputs parsed once and shared (see shared_arrays_hazira.py)
+    sketches = {}
+    for name, columns in TAIL_COLUMNS.items():
+        kpi, times, values = tail_values(name, attach(SOURCES[name], columns))
+        sketches[kpi] = monthly_sketches(times, values)
+save_sketches(sketches)
+
+# METRIC 1-3, 5-6: berth idle hours, average vessel turnaround,
+# TEU moves, trucks processed and kWh consumption for the whole port
+port = cube.kpis(LEVEL)
+
+# METRIC 4: crane downtime hours, separated into quay cranes and yard cranes
+by_class = cube.kpis(LEVEL, by='resource_class')['downtime_hrs'].unstack()
+
+# METRIC 7-8: P95 vessel turnaround and P99 gate queue, from the sketches
+tails = tail_kpis(sketches)
 
 # EXPORT to .xlsx
 df_monthly = pd.DataFrame({
-  'berth_idle_hrs': idle_hours,
-  'vessel_service_hrs': avg_turn,
-  'monthly_TEU': monthly_teu_moves,
-  'quay_crane': crane_downtime_quay,
-  'yard_crane' : crane_downtime_yard,
-  'truck_entry': trucks_proc,
-  'kwh_consumption': kwh_monthly
+  'berth_idle_hrs': port['berth_idle_hrs'],
+  'vessel_service_hrs': port['avg_turnaround_hrs'],
+  'monthly_TEU': port['teu'],
+  'quay_crane': pd.to_timedelta(by_class['quay'], unit='h'),
+  'yard_crane' : pd.to_timedelta(by_class['yard'], unit='h'),
+  'truck_entry': port['trucks_processed'],
+  'kwh_consumption': port['energy_kwh']
 })
 
+# Only whole periods are exported: a cube refreshed with --incremental grows
+# part way into the period after the data (e.g. with the vessels still at berth
+# on 1 January), so a full build and a refresh of the same data give the same months
+df_monthly = df_monthly[df_monthly.index.isin(cube.complete_periods(LEVEL))]
+
+# The sketches are monthly, so the tail KPIs are only in the monthly table
+if LEVEL == 'month':
+    df_monthly = df_monthly.join(tails)
+
+# Label monthly rows with the last day of the month, as in the Excel workbooks
+if LEVEL == 'month':
+    df_monthly.index = df_monthly.index + pd.offsets.MonthEnd(0)
+
 # Need to conver the index to string format so that it displays in Excel
 df_monthly.index = df_monthly.index.strftime('%Y-%m-%d %H:%M:%S')
-df_monthly = df_monthly.iloc[:-1] # Remove last row which has some data from the next year
+df_monthly.index.name = None
 df_monthly.to_excel('hazira_monthly_metrics.xlsx')
@@ -0,0 +1,139 @@
+'''
+progress_hazira.py
+Live progress of a running simulation, as JSON lines.
+
+A simulation makes one Progress for its run and calls tick() for every
+event it processes. About once a second a line like
+    {"stage": "yard", "status": "running", "cursor": "2025-05-14 03:12:40",
+     "fraction": 0.366, "events": 661504, "events_per_sec": 24113.2,
+     "elapsed_secs": 27.4, "rss_mb": 212.5, "occupancy": 4102}
+is written to the destination named by the environment:
+    HAZIRA_PROGRESS=progress.jsonl          append to a file
+    HAZIRA_PROGRESS=udp://127.0.0.1:9999    send datagrams to a socket
+run_all.py sets HAZIRA_PROGRESS and shows the lines as a live view.
+Without HAZIRA_PROGRESS nothing is written.
+
+tick() only adds to a counter and compares it with a threshold, the
+clock is read every CHECK_EVERY events and gauges (queue sizes, ...)
+are functions that are only called when a line is written, so the
+instrumentation costs next to nothing in the hot loops.
+'''
+
+import os
+import json
+import time
+import socket
+
+DESTINATION = os.environ.get('HAZIRA_PROGRESS')
+
+INTERVAL_SECS = 1.0 # Time between two lines
+CHECK_EVERY = 256   # Events between two looks at the clock
+
+def rss_mb():
+    '''
+    Peak memory of this process in MB, or None where it cannot be read.
+    '''
+    try:
+        import resource
+    except ImportError: # Windows
+        return None
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if os.uname().sysname == 'Darwin' else 2**10), 1)
+
+class Sink:
+    '''
+    Where the lines go: a file (appended to) or a UDP socket.
+    '''
+    def __init__(self, destination):
+        if destination.startswith('udp://'):
+            host, port = destination[len('udp://'):].rsplit(':', 1)
+            self.address = (host, int(port))
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.file = None
+        else:
+            self.file = open(destination, 'a', buffering=1)
+
+    def write(self, line):
+        if self.file is not None:
+            self.file.write(line + '\n')
+        else:
+            self.socket.sendto(line.encode(), self.address)
+
+class Progress:
+    '''
+    The progress of one simulation run.
+    '''
+    def __init__(self, stage, start=None, end=None, gauges=None, destination=DESTINATION):
+        '''
+        Parameters
+        stage: name of the simulation, e.g. 'vessels'
+        start, end: first and last value of the cursor (simulated time, as
+            timestamps or hours), to report the fraction done
+        gauges: function returning a dict of current values, e.g. queue sizes
+        destination: file path or udp://host:port (default HAZIRA_PROGRESS)
+        '''
+        self.stage = stage
+        self.start, self.end = start, end
+        self.gauges = None
+        self.sink = Sink(destination) if destination else None
+
+        self.events = 0
+        self.cursor = start
+        self.started = self.last = time.monotonic()
+        self.last_events = 0
+
+        # Without a destination the threshold is never reached
+        self.next_check = CHECK_EVERY if self.sink else float('inf')
+        self.emit('started')
+
+        # The gauges may read the simulation's state (and this Progress), so only after the first line
+        self.gauges = gauges
+
+    def tick(self, cursor=None, events=1):
+        '''
+        Counts processed events and moves the simulated time cursor.
+        '''
+        self.events += events
+        if self.events >= self.next_check:
+            self.cursor = cursor if cursor is not None else self.cursor
+            self.check()
+
+    def check(self):
+        self.next_check = self.events + CHECK_EVERY
+        if time.monotonic() - self.last >= INTERVAL_SECS:
+            self.emit('running')
+
+    def done(self, cursor=None):
+        '''
+        Writes the final line of the run.
+        '''
+        self.cursor = self.end if cursor is None else cursor
+        self.emit('done')
+
+    def emit(self, status):
+        if self.sink is None:
+            return
+        now = time.monotonic()
+        # The final line reports the rate of the whole run, the others the rate since the last line
+        since, since_events = (self.started, 0) if status == 'done' else (self.last, self.last_events)
+        record = {
+            'stage' : self.stage,
+            'status' : status,
+            'pid' : os.getpid(),
+            'cursor' : self.cursor, # Timestamps are written as text (default=str)
+            'fraction' : self.fraction(),
+            'events' : self.events,
+            'events_per_sec' : round((self.events - since_events) / max(now - since, 1e-9), 1),
+            'elapsed_secs' : round(now - self.started, 2),
+            'rss_mb' : rss_mb()
+        }
+        if self.gauges is not None:
+            record.update(self.gauges())
+        self.sink.write(json.dumps(record, default=str))
+        self.last, self.last_events = now, self.events
+
+    def fraction(self):
+        if self.cursor is None or self.start is None or self.end is None:
+            return None
+        return round(min(1, max(0, (self.cursor - self.start) / (self.end - self.start))), 4)
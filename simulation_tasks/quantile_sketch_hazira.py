@@ -0,0 +1,172 @@
+'''
+quantile_sketch_hazira.py
+Streaming quantile sketches of the tail KPIs (P95 vessel turnaround,
+P99 gate queue), per month and mergeable across replications.
+
+A QuantileSketch is a KLL sketch: values are kept in levels, a value at
+level h standing for 2^h of the values seen. When a level holds more
+than its capacity it is sorted and every other value (starting at
+random at the first or second) is promoted to the level above, so the
+memory is at most about 3k values however many are added, and a
+quantile is within about 2/k of its rank: with the default k = 1000, the
+P99 of 2 million values merged from 300 sketches lies between their
+P98.8 and P99.2, in 13 KB. Two
+sketches are merged by joining their levels and compacting again, so
+the sketches of replications run in different processes or folders
+combine into the sketch of all of them, without keeping their values.
+
+process_metrics_hazira.py adds the monthly P95 turnaround and P99 gate
+queue of its run to hazira_monthly_metrics.xlsx and saves the sketches
+of the run to kpi_sketches_hazira.pkl. To combine replications, e.g.
+run in their own folders:
+    python quantile_sketch_hazira.py rep0/kpi_sketches_hazira.pkl rep1/kpi_sketches_hazira.pkl ...
+writes Tail_KPIs_Hazira.csv, the monthly quantiles of all of them.
+'''
+
+import sys
+import math
+import pickle
+import numpy as np
+import pandas as pd
+
+SKETCH_FILE = 'kpi_sketches_hazira.pkl'
+OUTPUT_CSV = 'Tail_KPIs_Hazira.csv'
+
+# The quantile reported for each KPI (the SLAs)
+TAIL_KPIS = {
+    'turnaround_hrs' : 0.95,
+    'gate_queue_length' : 0.99
+}
+
+class QuantileSketch:
+    '''
+    A KLL quantile sketch of a stream of numbers.
+    '''
+    def __init__(self, k=1000, seed=0):
+        '''
+        Parameters
+        k: capacity of the top level, the accuracy (rank error about 2/k)
+        seed: seed of the coin that picks the values that are promoted
+        '''
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+
+    def capacity(self, level):
+        '''
+        Values a level may hold: k at the top, 2/3 of that for each level below.
+        '''
+        depth = len(self.levels) - level - 1
+        return max(2, math.ceil(self.k * (2/3)**depth))
+
+    def compress(self):
+        '''
+        Compacts the lowest level that is over its capacity until none is.
+        '''
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) <= self.capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            values = np.sort(self.levels[level])
+            # An odd value out stays at this level, the others are halved into the next
+            keep = len(values) % 2
+            promoted = values[keep + self.rng.integers(2)::2]
+            self.levels[level] = values[:keep]
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level = 0 # The capacities change when a level is added
+
+    def update(self, values):
+        '''
+        Adds values (a number or an array), ignoring NaN.
+        '''
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.compress()
+        return self
+
+    def merge(self, other):
+        '''
+        Adds the values summarised by another sketch to this one.
+        '''
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, values in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], values])
+        self.count += other.count
+        self.compress()
+        return self
+
+    def quantile(self, q):
+        '''
+        Estimated quantile(s) of the values added, NaN if there are none.
+        Parameters
+        q: a number or array in [0, 1]
+        '''
+        if self.count == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level_values), 2.0**level) for level, level_values in enumerate(self.levels)])
+        order = np.argsort(values)
+        rank = np.cumsum(weights[order])
+        position = np.searchsorted(rank, np.asarray(q) * rank[-1], side='left')
+        return values[order][np.minimum(position, len(values) - 1)]
+
+    def __len__(self):
+        return sum(len(values) for values in self.levels)
+
+def monthly_sketches(times, values, k=1000):
+    '''
+    One sketch per month of a KPI.
+    Parameters
+    times: time of each value
+    values: the values
+    Returns
+    dict of month (pd.Timestamp of its first day) -> QuantileSketch
+    '''
+    months = pd.to_datetime(np.asarray(times)).to_period('M').to_timestamp()
+    values = np.asarray(values, dtype=float)
+    return {month : QuantileSketch(k).update(values[months == month]) for month in months.unique()}
+
+def merge_sketches(target, sketches):
+    '''
+    Merges {kpi: {month: sketch}} into target, in place.
+    '''
+    for kpi, months in sketches.items():
+        for month, sketch in months.items():
+            if month in target.setdefault(kpi, {}):
+                target[kpi][month].merge(sketch)
+            else:
+                target[kpi][month] = sketch
+    return target
+
+def tail_kpis(sketches, tails=TAIL_KPIS):
+    '''
+    The quantile of every KPI in tails, one row per month.
+    '''
+    return pd.DataFrame({f'{kpi}_p{round(q * 100)}' : pd.Series({month : sketch.quantile(q) for month, sketch in sketches[kpi].items()})
+                         for kpi, q in tails.items() if kpi in sketches}).sort_index()
+
+def save_sketches(sketches, path=SKETCH_FILE):
+    with open(path, 'wb') as file:
+        pickle.dump(sketches, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+def load_sketches(path=SKETCH_FILE):
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+if __name__ == '__main__':
+    # One file at a time, so only one replication's sketches are loaded besides the merged ones
+    merged = {}
+    for path in sys.argv[1:] or [SKETCH_FILE]:
+        merge_sketches(merged, load_sketches(path))
+    df = tail_kpis(merged)
+    df.index = (df.index + pd.offsets.MonthEnd(0)).strftime('%Y-%m-%d')
+    df.to_csv(OUTPUT_CSV)
+    print(f'{len(sys.argv[1:]) or 1} sketch file(s) -> {OUTPUT_CSV}')
+    print(df.round(2).to_string())
@@ -0,0 +1,57 @@
+'''
+random_streams_hazira.py
+Independent random number streams for the simulations.
+
+Every simulation draws from its own numpy.random.Generator instead
+of the global np.random (or the stdlib random), one per
+    stage (vessels, cranes, ...), replication and, where the
+    simulation has them, resource (Quay0, MP1, ...)
+Each stream is seeded by SeedSequence(ROOT_SEED, spawn_key=(stage,
+replication, resource)), so it depends only on its own key: running the
+stages in any order, in one process or spread over many workers, gives
+bit-identical outputs, and a new stage or resource does not change the
+draws of the existing ones.
+
+The root seed and replication number are read from the environment so
+that run_all.py (or a shell) can set them for every script at once:
+    HAZIRA_SEED=7 HAZIRA_REPLICATION=3 python simulate_gate_hazira.py
+'''
+
+import os
+import zlib
+import numpy as np
+
+ROOT_SEED = int(os.environ.get('HAZIRA_SEED', 2025))
+REPLICATION = int(os.environ.get('HAZIRA_REPLICATION', 0))
+
+# The position of a stage is part of the key of its streams, so new stages go at the end
+STAGES = ['berth', 'vessels', 'containers', 'cranes', 'gate', 'energy', 'maintenance', 'yard', 'nowcast']
+
+def resource_key(resource):
+    '''
+    A stable integer key for a resource name or number.
+    crc32 is used rather than hash(), which differs between processes.
+    '''
+    if isinstance(resource, str):
+        return zlib.crc32(resource.encode())
+    return int(resource)
+
+def stream(stage, resource=None, replication=None, root_seed=None):
+    '''
+    The random number generator of one stage, replication and resource.
+    Parameters
+    stage: one of STAGES
+    resource: name or number of a resource within the stage, or None
+        for a stream shared by the whole stage
+    replication: replication number (defaults to HAZIRA_REPLICATION)
+    root_seed: root seed (defaults to HAZIRA_SEED)
+    Returns
+    numpy.random.Generator
+    '''
+    replication = REPLICATION if replication is None else replication
+    root_seed = ROOT_SEED if root_seed is None else root_seed
+
+    key = (STAGES.index(stage), replication)
+    if resource is not None:
+        key += (resource_key(resource),)
+    return np.random.default_rng(np.random.SeedSequence(root_seed, spawn_key=key))
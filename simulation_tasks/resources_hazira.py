@@ -0,0 +1,80 @@
+'''
+resources_hazira.py
+The resources of Hazira port, each with one integer ID and class code.
+
+Every simulation and metric script takes its resources from here
+instead of building names of its own, so a crane has the same name
+(Quay0, Yard13, ...) in the crane, container, yard and maintenance
+outputs. IDs are positions in RESOURCES, and class codes positions in
+CLASSES:
+
+    ID  0-5   Quay0-Quay5     quay crane   (class 0)
+    ID  6-19  Yard0-Yard13    yard crane   (class 1)
+    ID 20-25  MP1-MP4, CT1-2  berth        (class 2)
+    ID 26     Convey1         conveyor     (class 3)
+    ID 27     Light1          lighting     (class 4)
+
+The simulations work with the IDs and the names are only looked up
+when an output is written. Scripts that read an output turn its name
+column into IDs once with ids(), after which class filters and joins
+between datasets are integer comparisons:
+
+    crane = ids(cranes['resource_name'])
+    quay = cranes[class_codes(crane) == QUAY]
+
+New resources go at the end of RESOURCES, so that the existing IDs stay the same.
+'''
+
+import numpy as np
+import pandas as pd
+
+CLASSES = ['quay', 'yard', 'berth', 'conveyor', 'light']
+QUAY, YARD, BERTH, CONVEYOR, LIGHT = range(len(CLASSES))
+
+NUM_QUAY = 6
+NUM_YARD = 14
+
+# (name, class code) of every resource, in ID order
+RESOURCES = [(f'Quay{i}', QUAY) for i in range(NUM_QUAY)] \
+    + [(f'Yard{i}', YARD) for i in range(NUM_YARD)] \
+    + [(name, BERTH) for name in ['MP1', 'MP2', 'MP3', 'MP4', 'CT1', 'CT2']] \
+    + [('Convey1', CONVEYOR), ('Light1', LIGHT)]
+
+NAMES = np.array([name for name, _ in RESOURCES])
+CLASS_OF = np.array([cls for _, cls in RESOURCES], dtype=np.int8)
+
+def ids(names):
+    '''
+    The IDs of resource names, -1 for a name that is not a resource.
+    Parameters
+    names: Series, array or list of names
+    Returns
+    np.ndarray of int16
+    '''
+    # The categories are the registry, so the codes are the IDs (one hash lookup per distinct name)
+    return pd.Categorical(np.asarray(names, dtype=object), categories=NAMES).codes.astype(np.int16)
+
+def names(resource_ids):
+    '''
+    The names of resource IDs, for writing an output.
+    '''
+    return NAMES[np.asarray(resource_ids)]
+
+def class_codes(resource_ids):
+    '''
+    The class code of resource IDs, -1 for an unknown resource (ID -1).
+    '''
+    resource_ids = np.asarray(resource_ids)
+    return np.where(resource_ids >= 0, CLASS_OF[resource_ids], -1)
+
+def of_class(cls):
+    '''
+    The IDs of every resource of a class, in ID order.
+    '''
+    return np.flatnonzero(CLASS_OF == cls)
+
+def class_names(cls):
+    '''
+    The names of every resource of a class, e.g. class_names(BERTH) -> [MP1, ..., CT2]
+    '''
+    return NAMES[of_class(cls)].tolist()
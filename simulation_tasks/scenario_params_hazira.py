@@ -0,0 +1,26 @@
+'''
+scenario_params_hazira.py
+The AI scenario a simulation is run under, for re-simulating the
+scenarios (apply_scenario_hazira.py --resimulate).
+
+The multipliers of Scenario_Parameters_Hazira.json are read from the
+environment as JSON, like the seed and replication of the random streams:
+    HAZIRA_SCENARIO='{"vessel_service_time": 0.9, "gate_speed": 1.06}' python simulate_vessels_hazira.py
+Without HAZIRA_SCENARIO every multiplier is 1 (the baseline).
+
+The multipliers are applied to what a simulation has drawn, never to
+what it draws: a scenario run makes exactly the same draws from the same
+streams as the baseline (common random numbers), so the difference
+between the two comes from the scenario and not from sampling noise.
+'''
+
+import os
+import json
+
+SCENARIO = json.loads(os.environ.get('HAZIRA_SCENARIO', '{}'))
+
+def scenario_param(name, default=1.0):
+    '''
+    A multiplier (or other setting, e.g. gate_lanes) of the current scenario.
+    '''
+    return float(SCENARIO.get(name, default))
@@ -0,0 +1,109 @@
+'''
+shared_arrays_hazira.py
+Upstream outputs parsed once and shared as memory-mapped NumPy arrays.
+
+The downstream simulations (containers, yard, energy) and every
+replication or scenario worker that runs them used to parse
+vessel_turnaround_hazira.csv again, and simulate_containers_hazira.py
+called pd.to_datetime on it for every move. Instead
+
+    calls = attach('vessel_turnaround_hazira.csv', ['end_time', 'vessel_type'])
+
+parses the csv the first time, writes one .npy file per column to
+vessel_turnaround_hazira.arrays/ next to it, and returns the columns
+as read-only np.memmap arrays:
+- times are datetime64[s], durations timedelta64[s], text fixed width
+  unicode, everything else as pandas reads it
+- the folder records the size and modification time of the csv, so
+  the arrays are published again only after the upstream simulation
+  has been re-run
+Every later attach, in this process or any other, maps the same files:
+no parsing, and the pages are shared through the OS page cache, so N
+worker processes hold one copy of the data between them rather than N.
+'''
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+MANIFEST = 'manifest.json'
+
+# Columns of the csv outputs that hold times and durations
+TIME_COLUMNS = {'time', 'arrival_time', 'start_time', 'end_time', 'downtime_start', 'downtime_end',
+                'move_start', 'move_end', 'container_arrival'}
+DURATION_COLUMNS = {'service_time', 'duration', 'move_duration', 'maintenance_duration'}
+
+def arrays_dir(path):
+    return Path(path).with_suffix('.arrays')
+
+def source_stamp(path):
+    '''
+    Size and modification time of a csv, to tell when it has been rewritten.
+    '''
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def to_array(col, values):
+    '''
+    A parsed column as an array that can be memory-mapped (no Python objects).
+    '''
+    if col in TIME_COLUMNS:
+        return pd.to_datetime(values).to_numpy(dtype='datetime64[s]')
+    if col in DURATION_COLUMNS:
+        return pd.to_timedelta(values).to_numpy(dtype='timedelta64[s]')
+    if pd.api.types.is_string_dtype(values):
+        return values.to_numpy(dtype=str)
+    return values.to_numpy()
+
+def publish(path, columns=None):
+    '''
+    Parses a csv once and writes its columns as .npy files.
+    Parameters
+    path: csv output of a simulation
+    columns: columns to publish (default: all of them)
+    '''
+    folder = arrays_dir(path)
+    folder.mkdir(exist_ok=True)
+    df = pd.read_csv(path, usecols=columns)
+    for col in df.columns:
+        # Written under a temporary name and renamed, so a process attaching meanwhile never sees half a file
+        temp = folder / f'{col}.{os.getpid()}.tmp'
+        with open(temp, 'wb') as file:
+            np.save(file, to_array(col, df[col]))
+        os.replace(temp, folder / f'{col}.npy')
+
+    # The manifest is written last: columns are only valid once it lists them
+    manifest = read_manifest(path)
+    published = manifest['columns'] if manifest is not None and manifest['source'] == source_stamp(path) else []
+    manifest = {'source' : source_stamp(path), 'columns' : sorted(set(published) | set(df.columns))}
+    temp = folder / f'{MANIFEST}.{os.getpid()}.tmp'
+    temp.write_text(json.dumps(manifest))
+    os.replace(temp, folder / MANIFEST)
+
+def read_manifest(path):
+    try:
+        return json.loads((arrays_dir(path) / MANIFEST).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+def attach(path, columns=None):
+    '''
+    The columns of a csv as read-only memory-mapped arrays, published first if needed.
+    Parameters
+    path: csv output of a simulation
+    columns: columns to attach (default: all of them)
+    Returns
+    dict of column name -> np.memmap
+    '''
+    if columns is None:
+        columns = pd.read_csv(path, nrows=0).columns.tolist()
+    manifest = read_manifest(path)
+    if manifest is None or manifest['source'] != source_stamp(path):
+        publish(path, columns)
+    else:
+        missing = [col for col in columns if col not in manifest['columns']]
+        if missing:
+            publish(path, missing)
+    return {col : np.load(arrays_dir(path) / f'{col}.npy', mmap_mode='r') for col in columns}
@@ -10,17 +10,24 @@ and winter peak (+9 % Dec–Feb).
 import csv # Used for writing to the output file
 import numpy as np # Used for simulating draws from the Normal distribtuion
 import pandas as pd # For dates
-import matplotlib.pyplot as plt # For heatmap
+from random_streams_hazira import stream
+from progress_hazira import Progress
+from resources_hazira import BERTH, class_names
 
 SHOW_FIG = False
 
 # Data will eventually be written to .csv
 data = []
-data.append(['time', 'MP1', 'MP2', 'MP3', 'MP4', 'CT1', 'CT2'])
+BERTH_NAMES = class_names(BERTH) # MP1-MP4, CT1-CT2
+data.append(['time'] + BERTH_NAMES)
 
-heatmap_values = []
+# Each berth has its own random stream
+rngs = [stream('berth', name) for name in BERTH_NAMES]
 
-for timestamp in pd.date_range('2025-01-01 00:00', '2025-12-31 23:00', freq='D'):
+DAYS = pd.date_range('2025-01-01 00:00', '2025-12-31 23:00', freq='D')
+progress = Progress('berth', DAYS[0], DAYS[-1]) # Live progress (see progress_hazira.py)
+
+for timestamp in DAYS:
     month = timestamp.month
     mean = .78
     if month in [7, 8, 9]: # Monsoon dip
@@ -28,21 +35,19 @@ for timestamp in pd.date_range('2025-01-01 00:00', '2025-12-31 23:00', freq='D')
     if month in [12, 1, 2]: # Winter peak
         mean = .78 + .09
 
-    occupancy = np.random.normal(loc=.78, scale=.05, size=6).tolist()
+    occupancy = [rng.normal(loc=.78, scale=.05) for rng in rngs]
     occupancy = [round(x, 2) for x in occupancy]
 
-    heatmap_values.append(occupancy)
     data.append([timestamp.isoformat()] + occupancy)
+    progress.tick(timestamp)
+
+progress.done()
 
 with open('berth_occupancy_hazira.csv', 'w') as file:
     writer = csv.writer(file)
     writer.writerows(data)
 
 if SHOW_FIG:
-    plt.figure(figsize=(12,4))
-    plt.title('Berth Occupancy Over Year')
-    plt.xlabel("Day (of 365)")
-    plt.ylabel("Berth (MP1-MP4, CT1-2)")
-    plt.imshow(np.transpose(heatmap_values), cmap="viridis", aspect="auto")
-    plt.colorbar() # Show color keys
-    plt.show()
+    # Drawn by figures_hazira.py from the occupancies already in memory
+    import figures_hazira
+    figures_hazira.show('berth_heatmap', np.array([row[1:] for row in data[1:]]))
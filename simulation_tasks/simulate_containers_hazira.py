@@ -22,14 +22,22 @@ moves/container: a single container handling operation within
 the yard—e.g. moving a container from the stack to a truck lane, 
 or re‑shuffling stacks.
 So each piece of equipment is handled 2.6 times on average during its stay
+
+This simulation makes Poisson(2.6) moves per call; simulate_teu_moves_hazira.py
+makes a quay move and 2.6 yard moves per container of the call (about 2.5
+million moves a year).
 '''
 
 import csv
-import numpy as np
 import pandas as pd
+from random_streams_hazira import stream
+from progress_hazira import Progress
+from shared_arrays_hazira import attach
+from resources_hazira import QUAY, YARD, CLASS_OF, NAMES, of_class
+from checkpoint_hazira import HORIZON_DAYS, Checkpoint, open_output, output_size
 
 SIM_START = pd.to_datetime('2025-01-01 00:00')
-SIM_END = SIM_START + pd.Timedelta(days=365)
+SIM_END = SIM_START + pd.Timedelta(days=HORIZON_DAYS) # 365 days unless HAZIRA_DAYS is set
 
 class ContainerMove:
     '''
@@ -42,12 +50,12 @@ class ContainerMove:
         # Note that move_start_time may not be equal to yard_arrival because
         # the container may not be able to be processed immediately
         self.move_end_time = SIM_END
-        self.resource_name = '' # The resource that the movement will occur at e.g. Yard2
+        self.resource_id = -1 # ID of the resource that the movement will occur at (see resources_hazira.py)
         self.call_id = call_id # Each vessel that arrives will be assigneda unique ID
         self.teu_handled = teu_handled # The number of teu that vessel has
 
     def __str__(self):
-        return f'MOVE. yard arrival: {self.yard_arrival}, at {self.resource_name} move start: {self.move_start_time}, move end: {self.move_end_time}'
+        return f'MOVE. yard arrival: {self.yard_arrival}, at {NAMES[self.resource_id]} move start: {self.move_start_time}, move end: {self.move_end_time}'
 
 class YardResource:
     '''
@@ -55,13 +63,13 @@ class YardResource:
     that will perform a 'move' on containers.
     '''
 
-    def __init__(self, type='Quay', name=''):
-        self.type = type # Either Yard or Quay
-        self.name = name # Label for this particular crane later used in the output files
+    def __init__(self, resource_id):
+        self.resource_id = resource_id # ID of this crane, its name is only looked up for the output files
+        self.type = CLASS_OF[resource_id] # Either YARD or QUAY
         self.containers = [] # List of containers that need to be processed
         self.next_idle_time = SIM_START
 
-    def process(self, container):
+    def process(self, container, rng):
         '''
         Simulates the processing of a container at the given yard resource.
         The duration of the processing time is dependent upon whether the particular
@@ -71,12 +79,12 @@ class YardResource:
         '''
         # If quay, processing time is normal with mean 90s, standard dev 10s
         # Truncate at 20 seconds
-        processing_time_hr = max((20/(60*60)), np.random.normal(loc=(90/(60*60)), scale=(10/(60*60)), size=1)[0])
+        processing_time_hr = max((20/(60*60)), rng.normal(loc=(90/(60*60)), scale=(10/(60*60)), size=1)[0])
 
         # If yard, processing time is normal with mean 144s, standard dev 15s
         # Truncate at 30s
-        if self.type == 'Yard':
-            processing_time_hr = max((30/(60*60)), np.random.normal(loc=(144/(60*60)), scale=(15/(60*60)), size=1)[0])
+        if self.type == YARD:
+            processing_time_hr = max((30/(60*60)), rng.normal(loc=(144/(60*60)), scale=(15/(60*60)), size=1)[0])
 
         processing_time = pd.Timedelta(hours = processing_time_hr).round('s')
         
@@ -92,47 +100,72 @@ class YardResource:
 
         # Update the properties of the container that track its movement
         container.move_end_time = container.move_start_time + processing_time
-        container.resource_name = self.name
+        container.resource_id = self.resource_id
 
         # Add the container to the list of containers handled
         self.containers.append(container)
 
-# Read the data from previous vessel arrival simulation
-container_arrival = []
-with open("vessel_turnaround_hazira.csv", 'r') as file:
-    csv_reader = csv.reader(file)
-    for row in csv_reader:
-        container_arrival.append(row)
-container_arrival = container_arrival[1:]
+# Read the data from previous vessel arrival simulation, parsed once and
+# shared with the other simulations (see shared_arrays_hazira.py)
+calls = attach("vessel_turnaround_hazira.csv", ['end_time', 'vessel_type'])
+
+# Only container ships are handled by the quay cranes and RTGs,
+# bulk carriers and tankers are worked at the multipurpose berths
+container_arrival = pd.to_datetime(calls['end_time'][calls['vessel_type'] == 'container'])
 
 # There are 6 quay cranes and 14 yard cranes
 resources = []
-for i in range(6):
-    resources.append(YardResource('Quay', name=f'Quay{i}'))
-for i in range(14):
-    resources.append(YardResource('Yard', name=f'Yard{i}'))
-
-# data will be what is written to the csv file ultimately
-data = [['container_arrival', 'call_id', 'teu_handled', 'resource_assigned', 'move_start', 'move_end', 'move_duration']]
+for resource_id in of_class(QUAY):
+    resources.append(YardResource(resource_id))
+for resource_id in of_class(YARD):
+    resources.append(YardResource(resource_id))
 
 id_count = 0
 
-# A list of every move that occurs at the port (data in the output csv will be extracted from these objects)
-all_moves = []
-for container in container_arrival:
+# Random stream of this simulation (moves per call, TEU and processing times)
+rng = stream('containers')
+
+# Checkpoints of the run (see checkpoint_hazira.py), between two calls. A run is
+# extended by running the vessels further and then resuming from the last checkpoint.
+checkpoint = Checkpoint('containers', SIM_START)
+if checkpoint.state is not None:
+    id_count = checkpoint.state['calls_done']
+    rng.bit_generator.state = checkpoint.state['rng']
+    for resource, next_idle_time in zip(resources, checkpoint.state['next_idle_time']):
+        resource.next_idle_time = next_idle_time
+
+# Every move that occurs at the port is written to the csv file as it is made
+file = open_output('container_moves_hazira.csv', checkpoint)
+writer = csv.writer(file)
+if checkpoint.state is None:
+    writer.writerow(['container_arrival', 'call_id', 'teu_handled', 'resource_assigned', 'move_start', 'move_end', 'move_duration'])
+
+def state():
+    return {'calls_done' : id_count,
+            'rng' : rng.bit_generator.state,
+            'next_idle_time' : [resource.next_idle_time for resource in resources],
+            'output_size' : output_size(file)}
+
+# Live progress (see progress_hazira.py), with the work still queued at the cranes
+progress = Progress('containers', SIM_START, SIM_END, gauges=lambda : {
+    'crane_backlog_hrs' : round(sum((max(pd.Timedelta(0), resource.next_idle_time - progress.cursor) for resource in resources), pd.Timedelta(0)) / pd.Timedelta(hours=1), 2)})
+
+for end_time in container_arrival[id_count:]:
+    if checkpoint.due(end_time):
+        checkpoint.save(end_time, state())
+
     # Draw the number of moves from poisson(lambda=2.6) and round the result
-    num_moves = round(np.random.poisson(lam=2.6))
+    num_moves = round(rng.poisson(lam=2.6))
 
     id_count += 1
     # Generate TEU handled as a maximum of 1500, normally distributed with mean 1400
     teu = max(0,
           min(1500,
-              int(round(np.random.normal(loc=1400, scale=150)))))
+              int(round(rng.normal(loc=1400, scale=150)))))
 
-    # container = [arrival_time, berth_id, service_time, delay_flag, start_time, end_time]
     for i in range(num_moves):
         # the start time of the move is the end_time of when it was processed at the berth
-        current_move = ContainerMove(start_time=pd.to_datetime(container[5]),
+        current_move = ContainerMove(start_time=end_time,
                                      call_id = id_count,
                                      teu_handled = teu)
 
@@ -143,14 +176,14 @@ for container in container_arrival:
                 resource_to_add = resource
 
         # This method will update the properties of the move
-        resource_to_add.process(current_move)
-        all_moves.append(current_move)
+        resource_to_add.process(current_move, rng)
 
-# Write all relevant simulation information to data list
-for move in all_moves:
-    # [container_arrival, call_id, teu_handled, resource_assigned, move_start, move_end]
-    data.append([move.yard_arrival, move.call_id, move.teu_handled, move.resource_name, move.move_start_time, move.move_end_time, move.move_end_time - move.move_start_time])
+        # [container_arrival, call_id, teu_handled, resource_assigned, move_start, move_end, move_duration]
+        writer.writerow([current_move.yard_arrival, current_move.call_id, current_move.teu_handled, NAMES[current_move.resource_id],
+                         current_move.move_start_time, current_move.move_end_time, current_move.move_end_time - current_move.move_start_time])
+        progress.tick(current_move.move_start_time)
 
-with open('container_moves_hazira.csv', 'w') as file:
-    writer = csv.writer(file)
-    writer.writerows(data)
\ No newline at end of file
+# The last checkpoint is after the last call, to extend the run from
+checkpoint.save(container_arrival[-1] if len(container_arrival) else SIM_START, state())
+file.close()
+progress.done()
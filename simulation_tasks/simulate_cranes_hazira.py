@@ -16,21 +16,31 @@ so \lambda = \frac{12}{\gamma(1 + \frac{1}{1.7})}
 '''
 
 import csv
+import math # for gamma function
 import numpy as np
-import mpmath as mp # for gamma function
 import pandas as pd # for time
+from random_streams_hazira import stream
+from scenario_params_hazira import scenario_param
+from progress_hazira import Progress
+from resources_hazira import QUAY, YARD, NAMES, of_class
+from checkpoint_hazira import HORIZON_DAYS, Checkpoint
+from port_params_hazira import WEIBULL_K, MEAN_INTERARRIVAL, QUAY_DOWNTIME, YARD_DOWNTIME
 
-# Defining the parameters and scale for the Weibull draws
-k = 1.7
-mean_interarrival = 12
-lambda_scale = mean_interarrival / mp.gamma(1 + 1/k)
+# Defining the parameters and scale for the Weibull draws (see port_params_hazira.py)
+k = WEIBULL_K
+mean_interarrival = MEAN_INTERARRIVAL
+lambda_scale = mean_interarrival / math.gamma(1 + 1/k)
+
+# Scaling of each downtime in an AI scenario (1 in the baseline, see scenario_params_hazira.py)
+DOWNTIME_MULTIPLIER = scenario_param('crane_downtime')
 
 SIM_START = pd.Timestamp('2025-01-01 00:00')
-SIM_END = SIM_START + pd.Timedelta(days=365)
+SIM_END = SIM_START + pd.Timedelta(days=HORIZON_DAYS) # 365 days unless HAZIRA_DAYS is set
 
 class Crane:
-    def __init__(self, name, downtime):
-        self.name = name # Name of this crane
+    def __init__(self, resource_id, downtime):
+        self.resource_id = resource_id # ID of this crane (see resources_hazira.py)
+        self.name = NAMES[resource_id] # Name of this crane, keys its random stream and labels the output
         self.downtime = downtime # The hours of failure for each failure
         self.failures = [] # A list of intervals where the crane is not functional
     
@@ -58,23 +68,67 @@ class Crane:
 
 cranes = []
 # There are 6 quay cranes and 14 yard (RTG) cranes
-for i in range(6):
-    cranes.append(Crane(name=f'Quay{i}', downtime=pd.Timedelta(hours=1.2)))
-for i in range(14):
-    cranes.append(Crane(name=f'Yard{i}', downtime=pd.Timedelta(hours=1)))
+for resource_id in of_class(QUAY):
+    cranes.append(Crane(resource_id, downtime=pd.Timedelta(hours=QUAY_DOWNTIME * DOWNTIME_MULTIPLIER).round('s')))
+for resource_id in of_class(YARD):
+    cranes.append(Crane(resource_id, downtime=pd.Timedelta(hours=YARD_DOWNTIME * DOWNTIME_MULTIPLIER).round('s')))
+
+# Live progress (see progress_hazira.py), the cranes are simulated one after the other
+progress = Progress('cranes', 0, len(cranes))
+
+# Checkpoints of the run (see checkpoint_hazira.py). The cranes are simulated one after the
+# other, so the cursor is the crane-days simulated divided by the number of cranes.
+# The output is written by crane, so the failures so far are part of the checkpoint
+# (as the start of each failure in ns) and not of the output.
+checkpoint = Checkpoint('cranes', 0)
+
+# Failure clock of each crane: the time of its last failure and its random stream (None until it starts)
+clocks = [None] * len(cranes)
+if checkpoint.state is not None:
+    clocks = checkpoint.state['clocks']
+    for crane, starts in zip(cranes, checkpoint.state['failures']):
+        crane.failures = [[start, start + crane.downtime] for start in pd.to_datetime(starts)]
+
+def failure_starts(crane):
+    return np.array([failure[0].value for failure in crane.failures], dtype=np.int64)
+
+# Failure starts of the cranes that have reached the horizon, converted only once
+finished = {}
+
+def state():
+    return {'clocks' : clocks,
+            'failures' : [finished[number] if number in finished else failure_starts(crane)
+                          for number, crane in enumerate(cranes)]}
+
+for number, crane in enumerate(cranes):
+    # Each crane fails independently, so each has its own random stream
+    rng = stream('cranes', crane.name)
 
-for crane in cranes:
     # Simulate failures on this crane until one year has been simulated
     simulation_time = SIM_START # Measured in hours
+    if clocks[number] is not None: # Carry on from the checkpoint
+        simulation_time, rng.bit_generator.state = clocks[number]
     while simulation_time < SIM_END:
+        cursor = (number * HORIZON_DAYS + (simulation_time - SIM_START) / pd.Timedelta(days=1)) / len(cranes)
+        if checkpoint.due(cursor):
+            clocks[number] = (simulation_time, rng.bit_generator.state)
+            checkpoint.save(cursor, state())
+
         # Randomly generate the time between failures
-        next_failure_hrs = float(np.random.weibull(1.7, size=1)[0] * lambda_scale)
+        next_failure_hrs = float(rng.weibull(k, size=1)[0] * lambda_scale)
         next_failure = pd.Timedelta(hours=next_failure_hrs).round('s')
 
         # Increment simulation time to the next failure
         simulation_time += next_failure
         
         crane.fail(simulation_time)
+        progress.tick(number)
+    clocks[number] = (simulation_time, rng.bit_generator.state)
+    finished[number] = failure_starts(crane)
+
+# The last checkpoint holds the clock of every crane after the horizon, to extend the run from
+checkpoint.save(HORIZON_DAYS, state())
+progress.done()
 
 # Each element is of the form [resource_name, downtime_start, downtime_end]
 data = [['resource_name', 'downtime_start', 'downtime_end', 'duration']]
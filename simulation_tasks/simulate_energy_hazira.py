@@ -1,43 +1,137 @@
 '''
 simulate_energy_hazira.py
-Hourly kWh draw base 6 500; 
-+27 % peak (08–18 h); 
-seasonal ±17 % (summer/winter); 
-add 6 % admin/lighting overhead.
+Hourly kWh draw of the port, driven by what the port is doing
+in each hour rather than by the hour of the day alone:
+
+- base load (buildings, reefers, lighting) BASE_KW, seasonal ±17 %
+  (summer/winter) as before
+- BERTH_KW for every vessel alongside a berth (shore power, berth
+  lighting), from vessel_turnaround_hazira.csv
+- kWh per crane move, QUAY_KWH_PER_MOVE or YARD_KWH_PER_MOVE, from
+  container_moves_hazira.csv, and the RTG moves of
+  yard_moves_hazira.csv when simulate_yard_hazira.py has been run
+  (its per-container RTG moves then replace the Yard rows of the
+  container moves)
+- GATE_KWH_PER_TRUCK for every truck processed at the gate, from
+  gate_entries_hazira.csv
+- 6 % admin/lighting overhead on top of everything
 
 kWh = kilowatt-hour
 
-Base draw 6500 kWh/hr: the typical energy draw
-Peak-hour surge draws 6500*1.27 during these hours
-In summer, we require 17% more energy
-In winter, we require 17% less energy
-Every draw is increased by 6% of what it usually
+A move or a vessel call that spans several hours is shared out between
+them in proportion to the overlap (split_intervals in
+metrics_cube_hazira.py) and summed with np.bincount, without a loop
+over the moves. Moving more containers, faster vessel turnarounds or
+more trucks through the gate change the energy draw with them, so the
+AI scenarios can recompute it with hourly_energy (see
+apply_scenario_hazira.py).
 
-Note that this simulation is deterministic- could adjust to draw
-each energy usage from a Normal with mean energy.
+Run after the vessel, container, yard and gate simulations.
 '''
 
-import csv
+import os
 import numpy as np
-import pandas as pd # Used for ease in handling dates
-
-data = [['time', 'energy_kWh']]
-# Generate dates from Jan 1 to Dec 31, hourly data
-for timestamp in pd.date_range('2025-01-01 00:00', '2025-12-31 23:00', freq='h'):
-    h, m = timestamp.hour, timestamp.month # Record current hour and month
-
-    # Increase by 27% if during peak hours
-    peak_hour_factor = 1.27 if 8 <= h <= 18 else 1
-
-    # Summer is June, July, August (6, 7, 8) so +17%
-    # Winter is December, January, February (12, 1, 2) so -17%
-    season_factor = 1.17 if m in [6, 7, 8] else (.83 if m in [12, 1, 2] else 1)
-    
-    # Calculate adjusted energy used, accounting for the admin factor of 1.06
-    energy = round(6500 * 1.06 * peak_hour_factor * season_factor, 2)
-    data.append([timestamp, energy])
-
-# Write output to csv file
-with open('energy_consumption_hazira.csv', 'w') as file:
-    writer = csv.writer(file)
-    writer.writerows(data)
\ No newline at end of file
+import pandas as pd
+from metrics_cube_hazira import to_seconds, split_intervals
+from progress_hazira import Progress
+from shared_arrays_hazira import attach
+from resources_hazira import QUAY, ids, class_codes
+from checkpoint_hazira import HORIZON_DAYS
+
+SIM_START = pd.Timestamp('2025-01-01 00:00')
+# Every hour of the simulated horizon (365 days unless HAZIRA_DAYS is set, see checkpoint_hazira.py)
+HOURS = pd.date_range(SIM_START, SIM_START + pd.Timedelta(days=HORIZON_DAYS), freq='h', inclusive='left')
+
+BASE_KW = 4500           # Base draw of the port
+BERTH_KW = 400           # Per vessel alongside
+QUAY_KWH_PER_MOVE = 6    # Ship to shore crane, per move
+YARD_KWH_PER_MOVE = 4    # Electric RTG, per move
+GATE_KWH_PER_TRUCK = 2   # Lane equipment, per truck processed
+ADMIN_OVERHEAD = 1.06
+
+def season_factor(hours):
+    '''
+    Summer is June, July, August (6, 7, 8) so +17%
+    Winter is December, January, February (12, 1, 2) so -17%
+    '''
+    month = hours.month
+    return np.where(month.isin([6, 7, 8]), 1.17, np.where(month.isin([12, 1, 2]), .83, 1))
+
+def bin_intervals(start, end, energy, hours=HOURS):
+    '''
+    Spreads the energy of each [start, end) interval evenly over the hours it covers.
+    Parameters
+    start, end: timestamps of the intervals
+    energy: kWh of each interval (a number or an array)
+    hours: the hourly grid
+    Returns
+    np.ndarray of kWh per hour of the grid (energy outside the grid is dropped)
+    '''
+    start, end = to_seconds(start), to_seconds(end)
+    energy = np.broadcast_to(np.asarray(energy, dtype=float), start.shape)
+
+    # Zero length intervals are moved to a one second interval so their energy is kept
+    end = np.maximum(end, start + 1)
+    row, hour, seconds = split_intervals(start, end)
+    hour = hour - to_seconds([hours[0]])[0] // 3600
+    inside = (hour >= 0) & (hour < len(hours))
+    weight = energy[row[inside]] * seconds[inside] / (end - start)[row[inside]]
+    return np.bincount(hour[inside], weights=weight, minlength=len(hours))
+
+def hourly_energy(vessels, moves, gate, yard_moves=None, hours=HOURS):
+    '''
+    The hourly energy draw and its parts.
+    Parameters
+    vessels: dataframe with start_time, end_time
+    moves: dataframe with resource_assigned, move_start, move_end (container moves)
+    gate: dataframe with time, num_processed
+    yard_moves: dataframe with move_start, move_end (RTG moves), or None
+    Returns
+    dataframe indexed by hour with base_kWh, berth_kWh, crane_kWh, gate_kWh and energy_kWh
+    '''
+    base = BASE_KW * season_factor(hours)
+    berth = bin_intervals(vessels['start_time'], vessels['end_time'], BERTH_KW *
+                          (to_seconds(vessels['end_time']) - to_seconds(vessels['start_time'])) / 3600, hours)
+
+    is_quay = class_codes(ids(moves['resource_assigned'])) == QUAY
+    if yard_moves is not None:
+        moves = moves[is_quay]
+        is_quay = np.ones(len(moves), dtype=bool)
+    crane = bin_intervals(moves['move_start'], moves['move_end'],
+                          np.where(is_quay, QUAY_KWH_PER_MOVE, YARD_KWH_PER_MOVE), hours)
+    if yard_moves is not None:
+        crane += bin_intervals(yard_moves['move_start'], yard_moves['move_end'], YARD_KWH_PER_MOVE, hours)
+
+    # The gate is logged hourly already
+    hour = (to_seconds(gate['time']) - to_seconds([hours[0]])[0]) // 3600
+    inside = (hour >= 0) & (hour < len(hours))
+    trucks = np.bincount(hour[inside], weights=gate['num_processed'].to_numpy(dtype=float)[inside],
+                         minlength=len(hours))
+    gate_kwh = GATE_KWH_PER_TRUCK * trucks
+
+    parts = pd.DataFrame({'base_kWh' : base, 'berth_kWh' : berth, 'crane_kWh' : crane, 'gate_kWh' : gate_kwh},
+                         index=hours) * ADMIN_OVERHEAD
+    parts['energy_kWh'] = parts.sum(axis=1)
+    return parts
+
+def read_yard_moves(path='yard_moves_hazira.csv'):
+    '''
+    The RTG moves of simulate_yard_hazira.py, or None if it has not been run.
+    '''
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, usecols=['move_start', 'move_end'])
+
+if __name__ == "__main__":
+    progress = Progress('energy', HOURS[0], HOURS[-1]) # Live progress (see progress_hazira.py)
+    vessels = attach('vessel_turnaround_hazira.csv', ['start_time', 'end_time']) # see shared_arrays_hazira.py
+    moves = pd.read_csv('container_moves_hazira.csv', usecols=['resource_assigned', 'move_start', 'move_end'])
+    gate = pd.read_csv('gate_entries_hazira.csv', usecols=['time', 'num_processed'])
+
+    energy = hourly_energy(vessels, moves, gate, read_yard_moves()).round(2)
+
+    # Write output to csv file
+    energy.index.name = 'time'
+    energy[['energy_kWh', 'base_kWh', 'berth_kWh', 'crane_kWh', 'gate_kWh']].to_csv('energy_consumption_hazira.csv')
+    progress.tick(events=len(moves) + len(gate))
+    progress.done()
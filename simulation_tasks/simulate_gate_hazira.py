@@ -1,8 +1,8 @@
 '''
 simulate_gate_hazira.py
-Generate 160 trucks/day (Poisson), 
-service μ = 11min, σ = 2.5min; 
-apply peak-hour surge +28 % 
+Generate 160 trucks/day (Poisson),
+service μ = 11min, σ = 2.5min;
+apply peak-hour surge +28 %
 (08–10 h, 17–19 h);
 output queue lengths.
 
@@ -16,96 +16,41 @@ Note that all time values are measured in hours
 Sanity check:
 We expect a total number of procesisng hours to be: 160*(11/60)
 So, we expect (160*(11/60)-24)/(11/60) = 29 remaining trucks at the end of the simulation
+
+Scenarios:
+simulate_gate runs S gate scenarios at once (each with its own speed
+multiplier and number of lanes) on the same trucks. Trucks are served
+first come first served at the lane that is free first: the time at
+which each lane of each scenario is next free is kept in a scenarios x
+lanes array (serve_lanes in batch_models_hazira.py), and the loop over
+the trucks steps every scenario at once, so queues carry over from hour
+to hour in every scenario and hundreds of scenarios take about as long
+as the baseline. The baseline output is the scenario with speed 1 and
+one lane.
+
+Horizons longer than a year (HAZIRA_DAYS, see checkpoint_hazira.py) are
+simulated a year (CHUNK_DAYS) at a time, with the trucks still queued at
+the end of a year (the ones being served with the service they have
+left) first in line at the start of the next, and a
+checkpoint at the start of every year. A year is always drawn whole, so
+a run resumed or extended from a checkpoint makes the same draws as one
+that was never interrupted.
 '''
 
-import csv
 import numpy as np
 import pandas as pd
+from random_streams_hazira import stream
+from batch_models_hazira import serve_lanes, departed_by
+from scenario_params_hazira import scenario_param
+from checkpoint_hazira import HORIZON_DAYS, Checkpoint, open_output, output_size
+from progress_hazira import Progress
+from port_params_hazira import TRUCKS_PER_DAY, PEAK_SURGE, PEAK_HOURS, SERVICE_MU, SERVICE_SIGMA, MIN_SERVICE
 
 SIM_START = pd.to_datetime('2025-01-01 00:00')
-SIM_END = SIM_START + pd.Timedelta(days=365)
-
-class Truck:
-    '''
-    A class to represent the trucks that will arrive at the gate.
-    '''
-
-    def __init__(self, arrival_time):
-        self.arrival_time = arrival_time
-
-        # The number of minutes it takes to service is 6 at minimum, otherwise normally distributed
-        service_mins = max(6, np.random.normal(loc=11, scale=2.5, size=1)[0])
-        self.service_time = pd.Timedelta(minutes=service_mins)
-        self.completion_time = pd.NaT # Updated once the truck has been processed
-
-    def __str__(self):
-        '''
-        Returns a string representing the truck,
-        stating the arrival and service times.
-        '''
-        return f'TRUCK. arrival_time: {self.arrival_time.isoformat()}, service_time: {self.service_time}'
-
-class Gate:
-    '''
-    A class to represent the gate, which may have a queue
-    of trucks waiting to be processed.
-    '''
-
-    def __init__(self):
-        self.queue = []
-
-    def add(self, truck):
-        '''
-        Enqueues a truck at the gate by appending
-        it to the internal queue
-        '''
-        self.queue.append(truck)
-
-    def update(self, time_now, duration):
-        '''
-        Updates the internal queue of trucks by
-        removing trucks that have been processed and
-        decrementing remaining service time knowing that
-        it has been duration hours since the last update
-        Parameters
-        time: current time (in hours)
-        Returns
-        number of trucks processed
-        '''
-        remaining = duration
-        completed = 0
-
-        # If there are still trucks that must be processed and more processing time
-        while remaining > pd.Timedelta(0) and self.queue: 
-
-            head = self.queue[0] # Next truck to be processed
-
-            # If we can process this truck entirely, with time to spare
-            if head.service_time <= remaining:
-
-                # The time it took to finish was the time at start (time)
-                # plus the amount of processing time that has already occred
-                head.completion_time = time_now + (duration - remaining)
-
-                # Update reamining time, note not all time was used
-                remaining -= head.service_time
-
-                self.queue.pop(0)
-
-                completed += 1
-
-            # All of the processing time had to be used on the first truck
-            else:
-                head.service_time -= remaining
-                remaining = pd.Timedelta(0)
-
-        return completed
+SIM_END = SIM_START + pd.Timedelta(days=HORIZON_DAYS) # 365 days unless HAZIRA_DAYS is set
+CHUNK_DAYS = 365 # Simulated at once, and checkpointed between
 
 '''
-We would like a new row in the spreadsheet when any event occurs. This could be:
-- The arrival of a new truck
-- The processing of one truck completes
-
 We will allow for trucks to arrive any quarter hour, so the number of trucks per hour is:
 regular: poisson ~ 160/(24*4)
 peak: poisson ~ 160*1.28/(24*4)
@@ -114,41 +59,111 @@ The simulation will be processed in quarter hours.
 '''
 HOUR_TIMESTEP = 4 # The number of intervals per hour
 TICK = pd.Timedelta(hours=1/HOUR_TIMESTEP)
+TICKS = pd.date_range(SIM_START, SIM_START + pd.Timedelta(days=CHUNK_DAYS), freq=TICK, inclusive='left') # Start of every quarter hour
 
-# [time (in hours), arrivals, queue_length]
-data = [['time', 'arrivals', 'num_processed', 'queue_length']]
-
-time = SIM_START # The current simulation time
-gate = Gate() # A gate object to process trucks
-
-deps = 0 # The number of departed trucks since the last tick
-arrivals = 0 # The number of arrivals since the last tick
-
-# Run the simulation for one year
-while time < SIM_END:
-    # Draw the number of trucks from a poisson distribution
-    num_trucks = np.random.poisson(lam = 160/(24*HOUR_TIMESTEP), size=1)[0]
-
-    hr = time.hour # Get the current hour of the simulation
-
+def draw_trucks(rng, ticks=TICKS):
+    '''
+    The trucks arriving at the gate, shared by every scenario.
+    Parameters
+    rng: numpy.random.Generator
+    ticks: start of every quarter hour
+    Returns
+    (counts, service_mins): trucks arriving at the start of each quarter hour,
+    and the service minutes of every truck in order of arrival
+    '''
     # If it is during a peak time, adjust the poisson parameter
-    if (8 <= hr and hr <= 10) or (17 <= hr and hr <= 19): 
-        num_trucks = np.random.poisson(lam = 160*1.28/(24*HOUR_TIMESTEP))
-
-    arrivals += num_trucks
-
-    # Add one new truck to the gate for each of the trucks to be added this interval
-    for i in range(num_trucks):
-        gate.add(Truck(time))
-
-    time += TICK
-    deps += gate.update(time, TICK)
-    if time.minute == 0: # Only write data on the hour
-        data.append([time, arrivals, deps, len(gate.queue)])
-        deps = 0
-        arrivals = 0
-
-# Write output to csv file
-with open('gate_entries_hazira.csv', 'w') as file:
-    writer = csv.writer(file)
-    writer.writerows(data)
\ No newline at end of file
+    lam = np.where(ticks.hour.isin(PEAK_HOURS), PEAK_SURGE, 1) * TRUCKS_PER_DAY / (24 * HOUR_TIMESTEP)
+    counts = rng.poisson(lam)
+    service_mins = np.maximum(MIN_SERVICE, rng.normal(SERVICE_MU, SERVICE_SIGMA, counts.sum()))
+    return counts, service_mins
+
+def simulate_gate(counts, service_mins, speed=1.0, lanes=1):
+    '''
+    Queues at the gate for S scenarios at once.
+    Parameters
+    counts, service_mins: from draw_trucks
+    speed: speedup in processing of each scenario (gate_speed multiplier), shape (S,) or a number
+    lanes: gate lanes of each scenario, shape (S,) or a number
+    Returns
+    dict of hourly arrays: arrivals (hours,), num_processed and queue_length (S, hours),
+    and service_left (S, trucks), the minutes of service (at speed 1) each truck
+    still needs at the end, 0 for the trucks that have left
+    '''
+    speed, lanes = np.broadcast_arrays(np.atleast_1d(np.asarray(speed, dtype=float)),
+                                       np.atleast_1d(np.asarray(lanes, dtype=int)))
+
+    # Minutes from the start: every truck arrives at the start of its quarter hour
+    arrival = np.repeat(np.arange(len(counts)), counts) * 60 / HOUR_TIMESTEP
+    departure = serve_lanes(arrival, service_mins[None, :] / speed[:, None], lanes)
+
+    # Write data on the hour: the trucks that have left by the end of each hour
+    hours = len(counts) // HOUR_TIMESTEP
+    completed = departed_by(departure, 60, hours)
+    arrived = np.cumsum(counts)[HOUR_TIMESTEP - 1::HOUR_TIMESTEP]
+
+    # Trucks still at the gate at the end (1e-6 min against rounding), the ones being served part done
+    end = hours * 60
+    left = np.where(departure > end + 1e-6, np.minimum(service_mins, (departure - end) * speed[:, None]), 0)
+    return {
+        'arrivals' : counts.reshape(-1, HOUR_TIMESTEP).sum(axis=1),
+        'num_processed' : np.diff(completed, axis=1, prepend=0),
+        'queue_length' : arrived - completed,
+        'service_left' : left
+    }
+
+if __name__ == "__main__":
+    progress = Progress('gate', SIM_START, SIM_END) # Live progress (see progress_hazira.py)
+    rng = stream('gate') # Random stream of this simulation (arrivals and service times)
+
+    # Service minutes still to do of the trucks queued at the start of the year
+    queued = np.zeros(0)
+
+    # Checkpoints at the start of every year (see checkpoint_hazira.py)
+    checkpoint = Checkpoint('gate', SIM_START, every=CHUNK_DAYS)
+    chunk_start = SIM_START
+    if checkpoint.state is not None:
+        chunk_start, queued = checkpoint.state['cursor'], checkpoint.state['queued']
+        rng.bit_generator.state = checkpoint.state['rng']
+
+    # Write output to csv file, a year at a time (with the header, unless a checkpoint after it is resumed)
+    file = open_output('gate_entries_hazira.csv', checkpoint)
+    header = output_size(file) == 0
+
+    def state():
+        return {'rng' : rng.bit_generator.state, 'queued' : queued, 'output_size' : output_size(file)}
+
+    while chunk_start < SIM_END:
+        checkpoint.save(chunk_start, state())
+        counts, service_mins = draw_trucks(rng, TICKS - SIM_START + chunk_start)
+
+        # The trucks queued at the end of the last year are the first ones served
+        in_line = counts.copy()
+        in_line[0] += len(queued)
+        service_mins = np.concatenate([queued, service_mins])
+
+        # Speed and lanes of the AI scenario being simulated (one lane at speed 1 in the baseline)
+        gate = simulate_gate(in_line, service_mins, scenario_param('gate_speed'), scenario_param('gate_lanes'))
+
+        # [time (in hours), arrivals, num_processed, queue_length], one row at the end of every hour
+        df = pd.DataFrame({
+            'time' : TICKS[HOUR_TIMESTEP - 1::HOUR_TIMESTEP] + TICK - SIM_START + chunk_start,
+            'arrivals' : counts.reshape(-1, HOUR_TIMESTEP).sum(axis=1),
+            'num_processed' : gate['num_processed'][0],
+            'queue_length' : gate['queue_length'][0]
+        })
+        df[df['time'] <= SIM_END].to_csv(file, header=header, index=False)
+        header = False
+
+        # Trucks not processed by the end of the year, the ones being served partly done
+        queued = gate['service_left'][0][gate['service_left'][0] > 0]
+
+        # The whole year is computed at once, so there is only the final queue to report
+        progress.gauges = lambda : {'queue_length' : int(df['queue_length'].iloc[-1])}
+        progress.tick(chunk_start, events=int(counts.sum()))
+        chunk_start += pd.Timedelta(days=CHUNK_DAYS)
+
+    # A run that ends with a whole year is extended from its end
+    if chunk_start == SIM_END:
+        checkpoint.save(chunk_start, state())
+    file.close()
+    progress.done()
@@ -5,19 +5,20 @@ for cranes/RTGs, plus 3 corrective
 events/month (4.5 h) across convey-
 ors, lighting, berths; tag equipment IDs.
 
-Equipment
-- 6 quay cranes (ID Quay1, e.g.)
+Equipment (from the resource registry, see resources_hazira.py)
+- 6 quay cranes (ID Quay0, e.g.), numbered as in the crane and container outputs
 - 14 RTG/yard cranes (ID Yard2, e.g.)
 - MP1-MP4 berths (ID MP1, e.g.)
 - CT1-CT2 berths (ID CT1, e.g.)
-- Unknown number of conveyors so we will just add one (Conv1)
+- Unknown number of conveyors so we will just add one (Convey1)
 - Unknown number of lights so we will just add one (Light1)
 '''
 
 import csv
-import numpy as np
 import pandas as pd # For dates
-import random
+from random_streams_hazira import stream
+from progress_hazira import Progress
+from resources_hazira import QUAY, YARD, BERTH, CONVEYOR, LIGHT, class_names
 
 class MaintenanceEvent:
     '''
@@ -36,30 +37,21 @@ class MaintenanceEvent:
         return f'MAINTENANCE on {self.resource} starting at {self.start_time} for {self.duration} hours'
 
 
-# Define all resources for Hazira port
-NUM_QUAY = 6
-NUM_YARD = 14
-NUM_MP = 4
-NUM_CT = 2
-NUM_CONVEY = 1
-NUM_LIGHT = 1
-QUAY = [f'Quay{i}' for i in range(1, NUM_QUAY+1)]
-YARD = [f'Yard{i}' for i in range(1, NUM_YARD+1)]
-MP = [f'MP{i}' for i in range(1, NUM_MP+1)]
-CT = [f'CT{i}' for i in range(1, NUM_CT+1)]
-CONVEY = [f'Convey{i}' for i in range(1, NUM_CONVEY+1)]
-LIGHT = [f'Light{i}' for i in range(1, NUM_LIGHT)]
-
-# Separate the resources into those with weekly planned maintenace
+# Separate the resources of Hazira port into those with weekly planned maintenace
 # and monthly corrective maintenance
-WEEKLY_PLANNED = QUAY + YARD
-MONTHLY_CORRECTIVE = MP + CT + CONVEY + LIGHT
+WEEKLY_PLANNED = class_names(QUAY) + class_names(YARD)
+MONTHLY_CORRECTIVE = class_names(BERTH) + class_names(CONVEYOR) + class_names(LIGHT)
 
 maintenance_events = []
 
-for resource in WEEKLY_PLANNED: # For each resource that must be maintained weekly
+# Live progress (see progress_hazira.py), the resources are scheduled one after the other
+progress = Progress('maintenance', 0, len(WEEKLY_PLANNED + MONTHLY_CORRECTIVE))
+
+for number, resource in enumerate(WEEKLY_PLANNED): # For each resource that must be maintained weekly
+    rng = stream('maintenance', resource) # Each resource has its own random stream
+
     # Random shift of days to schedule maintenance - will be the same for each resource
-    rand_shift = pd.Timedelta(days=random.randint(0, 6))
+    rand_shift = pd.Timedelta(days=int(rng.integers(0, 7)))
 
     # Run through each week in the year
     for timestamp in pd.date_range('2025-01-01 00:00', '2025-12-31 23:00', freq='W'):
@@ -68,8 +60,11 @@ for resource in WEEKLY_PLANNED: # For each resource that must be maintained week
         maintenance_start = timestamp + rand_shift
 
         maintenance_events.append(MaintenanceEvent(resource, maintenance_start, pd.Timedelta(hours=3.5)))
+        progress.tick(number)
+
+for number, resource in enumerate(MONTHLY_CORRECTIVE):
+    rng = stream('maintenance', resource)
 
-for resource in MONTHLY_CORRECTIVE:
     # Generate monthly dates (note 's' in 'MS' is for month start)
     for timestamp in pd.date_range('2025-01-01 00:00', '2025-12-31 23:00', freq='MS'):
 
@@ -77,13 +72,14 @@ for resource in MONTHLY_CORRECTIVE:
         days_in_month = pd.Period(timestamp, freq='M').days_in_month
 
         # Randomly select three days this month to perform maintenance
-        scheduled_days = random.sample(range(0, days_in_month), 3)
+        scheduled_days = rng.choice(days_in_month, size=3, replace=False)
         for day in scheduled_days:
-            shift = pd.Timedelta(days=day) # Convert the random shift to a pandas Timedelta
+            shift = pd.Timedelta(days=int(day)) # Convert the random shift to a pandas Timedelta
             maintenance_start = timestamp + shift # Calculate the random maintenance start
 
             # Add this event to list of all maintenance events
             maintenance_events.append(MaintenanceEvent(resource, maintenance_start, pd.Timedelta(hours=4.5)))
+            progress.tick(len(WEEKLY_PLANNED) + number)
 
 # Sort events by their start time to prepare to write to .csv
 maintenance_events.sort(key = lambda x: x.start_time)
@@ -96,4 +92,6 @@ for event in maintenance_events:
 # Write output to csv file
 with open('maintenance_events_hazira.csv', 'w') as file:
     writer = csv.writer(file)
-    writer.writerows(data)
\ No newline at end of file
+    writer.writerows(data)
+
+progress.done()
\ No newline at end of file
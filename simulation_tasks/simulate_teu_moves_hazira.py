@@ -0,0 +1,271 @@
+'''
+simulate_teu_moves_hazira.py
+Container moves at the level of single containers: every TEU of every
+container call, rather than the Poisson(2.6) moves per call of
+simulate_containers_hazira.py.
+
+A call of teu containers (normal, mean 1400, standard dev 150, at most
+1500 TEU) makes one quay move per container, by one of the 6 quay
+cranes, and Poisson(2.6) yard moves per container, by one of the 14
+RTGs: about 5 000 moves per call and 2.5 million a year at the current
+container ship arrivals (500 calls/yr, see simulate_vessels_hazira.py).
+A container's quay move goes to the quay crane that is free first, and
+once it is off the quay its yard moves go one after the other to the RTG
+that is free first, with a normal move time of 90 s (quay) or 144 s
+(yard).
+
+At these volumes the moves are never held as Python objects:
+- each class of cranes is a heap of (next idle time, resource ID), so
+  assigning a move is one heapreplace instead of a scan over the cranes
+- move times are drawn for a whole call at once, and times are integer
+  seconds
+- moves are collected in NumPy arrays and written CHUNK_MOVES at a time,
+  so the memory stays bounded however long the run
+The output is a folder of columnar partitions, one folder per month of
+container arrival and chunk, with one .npy file per column (as the
+shared arrays of shared_arrays_hazira.py):
+
+container_moves_teu_hazira/
+    manifest.json           rows and time range of every partition
+    2025-01/
+        part-00000/
+            container_arrival.npy   datetime64[s]
+            call_id.npy             int32
+            teu_handled.npy         int16
+            resource_id.npy         int16, see resources_hazira.py
+            move_start.npy          datetime64[s]
+            move_end.npy            datetime64[s]
+        part-00001/
+    ...
+
+read_partitions(start, end, columns) memory-maps the partitions of a
+time range one at a time. Checkpoints (see checkpoint_hazira.py) are
+taken between chunks, so a long run can be resumed with HAZIRA_RESUME=1.
+'''
+
+import os
+import json
+import heapq
+import shutil
+import numpy as np
+import pandas as pd
+from random_streams_hazira import stream
+from progress_hazira import Progress
+from shared_arrays_hazira import attach
+from resources_hazira import QUAY, YARD, CLASS_OF, of_class
+from checkpoint_hazira import HORIZON_DAYS, Checkpoint
+
+SIM_START = pd.to_datetime('2025-01-01 00:00')
+SIM_END = SIM_START + pd.Timedelta(days=HORIZON_DAYS) # 365 days unless HAZIRA_DAYS is set
+
+OUTPUT_DIR = 'container_moves_teu_hazira'
+MANIFEST = 'manifest.json'
+CHUNK_MOVES = 1_000_000 # Moves held in memory before they are written
+
+# Calls and move times as in simulate_containers_hazira.py
+TEU_MU = 1400
+TEU_SIGMA = 150
+MAX_TEU = 1500
+MOVES_PER_CONTAINER = 2.6 # Yard moves, on top of the quay move
+QUAY_SECS, QUAY_SIGMA, MIN_QUAY_SECS = 90, 10, 20
+YARD_SECS, YARD_SIGMA, MIN_YARD_SECS = 144, 15, 30
+
+COLUMNS = ['container_arrival', 'call_id', 'teu_handled', 'resource_id', 'move_start', 'move_end']
+
+class Dispatcher:
+    '''
+    The quay cranes and RTGs, each move given to the crane of its class that is free first.
+    '''
+
+    def __init__(self, resource_ids, next_idle=None):
+        '''
+        Parameters
+        resource_ids: IDs of the cranes (see resources_hazira.py)
+        next_idle: seconds at which each crane is next free (default: all free at 0)
+        '''
+        next_idle = [0] * len(resource_ids) if next_idle is None else next_idle
+        # One heap per class of cranes; ties go to the lowest ID, as in the scan over the cranes of simulate_containers_hazira.py
+        self.heaps = {QUAY : [], YARD : []}
+        for free, resource_id in zip(next_idle, resource_ids):
+            self.heaps[int(CLASS_OF[resource_id])].append((int(free), int(resource_id)))
+        for heap in self.heaps.values():
+            heapq.heapify(heap)
+
+    def next_idle(self):
+        '''
+        The crane IDs and the seconds at which they are next free, for a checkpoint.
+        '''
+        cranes = self.heaps[QUAY] + self.heaps[YARD]
+        return [resource_id for _, resource_id in cranes], [free for free, _ in cranes]
+
+    def assign(self, arrival, quay_secs, yard_moves, yard_secs):
+        '''
+        Gives the moves of a call to the cranes, container by container: the quay
+        move to the quay crane that is free first, then the container's yard moves,
+        one after the other, to the RTG that is free first.
+        Parameters
+        arrival: second at which the quay moves can start (the end of the call)
+        quay_secs: duration of the quay move of each container
+        yard_moves: number of yard moves of each container
+        yard_secs: duration of each yard move, in order of container
+        Returns
+        (resource_id, start, end) arrays, one entry per move: the quay move of
+        each container followed by its yard moves
+        '''
+        n = len(quay_secs) + len(yard_secs)
+        resource = np.empty(n, dtype=np.int16)
+        start = np.empty(n, dtype=np.int64)
+        end = np.empty(n, dtype=np.int64)
+        quay_heap, yard_heap = self.heaps[QUAY], self.heaps[YARD]
+        yard_secs = iter(yard_secs.tolist())
+        i = 0
+        for quay, moves in zip(quay_secs.tolist(), yard_moves.tolist()):
+            free, resource_id = quay_heap[0]
+            begin = arrival if arrival > free else free
+            ready = begin + quay
+            heapq.heapreplace(quay_heap, (ready, resource_id))
+            resource[i], start[i], end[i] = resource_id, begin, ready
+            i += 1
+
+            # Each yard move of the container starts once its last move is done
+            for _ in range(moves):
+                free, resource_id = yard_heap[0]
+                begin = ready if ready > free else free
+                ready = begin + next(yard_secs)
+                heapq.heapreplace(yard_heap, (ready, resource_id))
+                resource[i], start[i], end[i] = resource_id, begin, ready
+                i += 1
+        return resource, start, end
+
+def draw_call(rng, teu):
+    '''
+    The moves of a call of teu containers: the quay move time of each container,
+    its number of yard moves and the time of each yard move (whole seconds).
+    '''
+    quay = np.maximum(MIN_QUAY_SECS, rng.normal(QUAY_SECS, QUAY_SIGMA, teu)).round().astype(np.int64)
+    yard_moves = rng.poisson(MOVES_PER_CONTAINER, teu)
+    yard = np.maximum(MIN_YARD_SECS, rng.normal(YARD_SECS, YARD_SIGMA, yard_moves.sum())).round().astype(np.int64)
+    return quay, yard_moves, yard
+
+def to_seconds(times):
+    return (np.asarray(times, dtype='datetime64[s]') - np.datetime64(SIM_START, 's')).astype(np.int64)
+
+def to_times(seconds):
+    return np.datetime64(SIM_START, 's') + np.asarray(seconds).astype('timedelta64[s]')
+
+def write_chunk(columns, number, parts):
+    '''
+    Writes one chunk of moves as partitions by month of container arrival.
+    Parameters
+    columns: dict of column -> array, the moves of the chunk
+    number: sequence number of the chunk, in the name of its partitions
+    parts: list of the partitions written so far (manifest entries), appended to
+    '''
+    months = columns['container_arrival'].astype('datetime64[M]')
+    for month in np.unique(months):
+        rows = months == month
+        path = os.path.join(OUTPUT_DIR, str(month), f'part-{number:05d}')
+        os.makedirs(path, exist_ok=True)
+        for col in COLUMNS:
+            np.save(os.path.join(path, f'{col}.npy'), columns[col][rows])
+        arrival = columns['container_arrival'][rows]
+        parts.append({'path' : os.path.relpath(path, OUTPUT_DIR), 'rows' : int(rows.sum()),
+                      'start' : str(arrival.min()), 'end' : str(arrival.max())})
+
+def write_manifest(parts):
+    temp = os.path.join(OUTPUT_DIR, f'{MANIFEST}.tmp')
+    with open(temp, 'w') as file:
+        json.dump({'columns' : COLUMNS, 'parts' : parts}, file, indent=1)
+    os.replace(temp, os.path.join(OUTPUT_DIR, MANIFEST))
+
+def read_partitions(start=None, end=None, columns=None, folder=OUTPUT_DIR):
+    '''
+    The moves whose container arrival is in [start, end), one partition at a time.
+    Parameters
+    start, end: time range (anything accepted by pd.Timestamp), or None for no bound
+    columns: columns to read (default: all of them)
+    folder: the output folder
+    Returns
+    generator of dicts of column -> read-only np.memmap (rows outside the range included)
+    '''
+    with open(os.path.join(folder, MANIFEST)) as file:
+        manifest = json.load(file)
+    columns = manifest['columns'] if columns is None else columns
+    for part in manifest['parts']:
+        # The time range of every partition is in the manifest, so partitions outside [start, end) are never opened
+        if start is not None and pd.Timestamp(part['end']) < pd.Timestamp(start):
+            continue
+        if end is not None and pd.Timestamp(part['start']) >= pd.Timestamp(end):
+            continue
+        yield {col : np.load(os.path.join(folder, part['path'], f'{col}.npy'), mmap_mode='r') for col in columns}
+
+if __name__ == '__main__':
+    # Container calls from the vessel simulation, parsed once and shared (see shared_arrays_hazira.py)
+    calls = attach('vessel_turnaround_hazira.csv', ['end_time', 'vessel_type'])
+    call_end = to_seconds(calls['end_time'][calls['vessel_type'] == 'container'])
+
+    rng = stream('containers', 'teu') # Own stream, so the per-call moves of simulate_containers_hazira.py are unchanged
+    dispatcher = Dispatcher(np.concatenate([of_class(QUAY), of_class(YARD)]))
+    calls_done, chunks, parts = 0, 0, []
+
+    # Checkpoints between chunks; a resumed run drops the partitions written after the checkpoint
+    checkpoint = Checkpoint('teu_moves', SIM_START)
+    if checkpoint.state is None:
+        shutil.rmtree(OUTPUT_DIR, ignore_errors=True)
+    else:
+        calls_done, chunks, parts = checkpoint.state['calls_done'], checkpoint.state['chunks'], checkpoint.state['parts']
+        rng.bit_generator.state = checkpoint.state['rng']
+        dispatcher = Dispatcher(*checkpoint.state['next_idle'])
+        kept = {part['path'] for part in parts}
+        for folder, subfolders, _ in os.walk(OUTPUT_DIR):
+            for part in [name for name in subfolders if name.startswith('part-')]:
+                if os.path.relpath(os.path.join(folder, part), OUTPUT_DIR) not in kept:
+                    shutil.rmtree(os.path.join(folder, part))
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    def state():
+        return {'calls_done' : calls_done, 'chunks' : chunks, 'parts' : parts,
+                'rng' : rng.bit_generator.state, 'next_idle' : dispatcher.next_idle()}
+
+    progress = Progress('teu_moves', SIM_START, SIM_END) # Live progress (see progress_hazira.py)
+    buffer, buffered = [], 0
+
+    def flush():
+        global chunks, buffered
+        if buffered:
+            write_chunk({col : np.concatenate([moves[col] for moves in buffer]) for col in COLUMNS}, chunks, parts)
+            chunks += 1
+        buffer.clear()
+        buffered = 0
+        write_manifest(parts)
+
+    for end_time in call_end[calls_done:]:
+        end_time = int(end_time)
+        teu = max(0, min(MAX_TEU, int(round(rng.normal(TEU_MU, TEU_SIGMA)))))
+        quay_secs, yard_moves, yard_secs = draw_call(rng, teu)
+        resource, start, end = dispatcher.assign(end_time, quay_secs, yard_moves, yard_secs)
+        num_moves = len(resource)
+        calls_done += 1
+
+        buffer.append({
+            'container_arrival' : to_times(np.full(num_moves, end_time)),
+            'call_id' : np.full(num_moves, calls_done, dtype=np.int32),
+            'teu_handled' : np.full(num_moves, teu, dtype=np.int16),
+            'resource_id' : resource,
+            'move_start' : to_times(start),
+            'move_end' : to_times(end)
+        })
+        buffered += num_moves
+        time = pd.Timestamp(to_times(end_time))
+        progress.tick(time, events=num_moves)
+
+        # A chunk is written, and the checkpoint taken, once CHUNK_MOVES moves are in memory
+        if buffered >= CHUNK_MOVES:
+            flush()
+            if checkpoint.due(time):
+                checkpoint.save(time, state())
+
+    flush()
+    checkpoint.save(pd.Timestamp(to_times(call_end[-1])) if len(call_end) else SIM_START, state())
+    progress.done()
+    print(f'{sum(part["rows"] for part in parts):,} moves of {calls_done} calls -> {OUTPUT_DIR}/')
@@ -29,14 +29,23 @@ is 1/1200 per year is modeled by an exponential process.
 We would like to generate a year's worth of simulated data.
 There are 6 berths, so we will assign an arrived vessel to an availabe berth.
 
-We are treating all vessels as the same and not separating by MP1-MP4 and
-CT1-CT2 harboring different types of cargo.
+Vessels are separated by type, each with its own share of the arrivals
+and its own service time distribution (VESSEL_TYPES). Container ships
+may only dock at the container berths CT1-CT2 and bulk carriers and
+tankers at the multipurpose berths MP1-MP4. Each class of berths keeps
+a heap of its berths ordered by the time they are next free, so finding
+the earliest free berth of a class takes O(log B) instead of a scan.
 '''
 
 import csv
-import numpy as np
+import heapq
 import pandas as pd
-import matplotlib.pyplot as plt
+from random_streams_hazira import stream
+from scenario_params_hazira import scenario_param
+from progress_hazira import Progress
+from resources_hazira import BERTH, class_names
+from port_params_hazira import VESSEL_TYPES, DELAY_PROB
+from checkpoint_hazira import HORIZON_DAYS, Checkpoint, open_output, output_size
 
 SHOW_FIG = False
 
@@ -74,8 +83,9 @@ class Berth:
         # If the vessel arrived while something is still being processed
         # it may only begin to be processed as soon as the berth is free
         elif vessel.arrival_time < self.next_idle_time:
-            self.next_idle_time += vessel.service_time
-            return self.next_idle_time
+            start = self.next_idle_time
+            self.next_idle_time = start + vessel.service_time
+            return start
 
     def __str__(self):
         s = self.name + '\n'
@@ -89,36 +99,56 @@ class Vessel:
     port.
     '''
 
-    def __init__(self, arrival_time):
+    def __init__(self, arrival_time, vessel_type, rng):
         self.arrival_time = arrival_time
+        self.type = vessel_type # Key of VESSEL_TYPES
 
-        # Service times are distributed normally with mean of 23 and standard deviation 4.5
+        # Service times are distributed normally with the mean and standard deviation of the vessel type
         # Truncate at one hour
-        service_hrs = max(1, np.random.normal(loc=23, scale=4.5, size = 1)[0])
+        params = VESSEL_TYPES[vessel_type]
+        service_hrs = max(1, rng.normal(loc=params['service_mu'], scale=params['service_sigma'], size = 1)[0])
 
         # The service time will be a timedelta object
         self.service_time = pd.Timedelta(hours=service_hrs).round('s')
 
         # Generate an 11% chance of whether or not this vessel is delayed
-        self.delayed = np.random.binomial(n=1, p=.11, size=1)[0]
+        self.delayed = rng.binomial(n=1, p=DELAY_PROB, size=1)[0]
 
         # If this vessel was delayed, increase the service time
         if self.delayed:
-            extra_hrs = np.random.uniform(.5, 3, size=1)[0]
+            extra_hrs = rng.uniform(.5, 3, size=1)[0]
             self.service_time += pd.Timedelta(hours=extra_hrs).round('s')
 
+        # AI scenario speedup of the service, applied after all of the draws
+        self.service_time = (self.service_time * SERVICE_MULTIPLIER).round('s')
+
     def __str__(self):
-        return f'VESSEL. arrival time: {self.arrival_time}, service time: {self.service_time}, delayed: {self.delayed}'
+        return f'VESSEL. {self.type} arrival time: {self.arrival_time}, service time: {self.service_time}, delayed: {self.delayed}'
         
 # Define appropriate simulation parameters
-BERTH_NAMES = ['MP1', 'MP2', 'MP3', 'MP4', 'CT1', 'CT2'] # 4 multipurpose berths and two container (from research)
-ARRIVALS_PER_YEAR = 1200 # Given simulation parameter
+BERTH_NAMES = class_names(BERTH) # The berths of the resource registry (see resources_hazira.py)
+BERTH_CLASSES = {
+    'MP' : [name for name in BERTH_NAMES if name.startswith('MP')], # 4 multipurpose berths (from research)
+    'CT' : [name for name in BERTH_NAMES if name.startswith('CT')] # and two container berths
+}
+
+# Arrivals per year, service time and berth class of each type of vessel are in port_params_hazira.py
+TYPE_NAMES = list(VESSEL_TYPES)
+
+# Scaling of service times in an AI scenario (1 in the baseline, see scenario_params_hazira.py)
+SERVICE_MULTIPLIER = scenario_param('vessel_service_time')
+
+ARRIVALS_PER_YEAR = sum(params['arrivals_per_year'] for params in VESSEL_TYPES.values()) # Given simulation parameter
 ARRIVALS_PER_DAY = ARRIVALS_PER_YEAR / 365
 ARRIVALS_PER_HOUR = ARRIVALS_PER_YEAR / (365*24)
 
-# The time that the simulation will begin at 
+# Each type is its own Poisson process, so an arrival of the combined process
+# is of each type with probability proportional to that type's rate
+TYPE_SHARES = [VESSEL_TYPES[name]['arrivals_per_year'] / ARRIVALS_PER_YEAR for name in TYPE_NAMES]
+
+# The time that the simulation will begin at and its horizon (365 days unless HAZIRA_DAYS is set)
 SIM_START = pd.Timestamp('2025-01-01 00:00')
-SIM_END = SIM_START + pd.Timedelta(days=365)
+SIM_END = SIM_START + pd.Timedelta(days=HORIZON_DAYS)
 
 # Create a list of berths, each with one of the given names
 BERTHS = []
@@ -128,47 +158,78 @@ for berth_name in BERTH_NAMES:
 # Count the number of hours that have run in the simulation
 time = SIM_START
 
-# These arrivals times represent the time between consecutive arrivals of vessels
-arrival_time = time + pd.Timedelta(hours=np.random.exponential(scale=1/ARRIVALS_PER_HOUR, size=1)[0]).round('s')
-
-data = [['arrival_time', 'berth', 'service_time', 'delay_flag', 'start_time', 'end_time']]
-
-# Run while there still have not been 365 days simulated
+# Random stream of this simulation (arrivals and service times)
+rng = stream('vessels')
+
+# Checkpoints of the run (see checkpoint_hazira.py), with the state to resume from if HAZIRA_RESUME is set
+checkpoint = Checkpoint('vessels', SIM_START)
+
+if checkpoint.state is None:
+    # These arrivals times represent the time between consecutive arrivals of vessels
+    arrival_time = time + pd.Timedelta(hours=rng.exponential(scale=1/ARRIVALS_PER_HOUR, size=1)[0]).round('s')
+
+    # Generate the time of the first arrival
+    if arrival_time < SIM_END:
+        time += pd.Timedelta(hours=rng.exponential(scale=1/ARRIVALS_PER_HOUR, size=1)[0]).round('s')
+        arrival_time = time
+else:
+    # The next arrival has been drawn already, the berths are as they were left
+    time = arrival_time = checkpoint.state['cursor']
+    rng.bit_generator.state = checkpoint.state['rng']
+    for berth, next_idle_time in zip(BERTHS, checkpoint.state['next_idle_time']):
+        berth.next_idle_time = next_idle_time
+
+# One heap per berth class of (next idle time, position in BERTH_NAMES, berth),
+# the position breaks ties in favour of the first berth as before
+FREE_BERTHS = {}
+for berth_class, names in BERTH_CLASSES.items():
+    FREE_BERTHS[berth_class] = [(BERTHS[BERTH_NAMES.index(name)].next_idle_time, BERTH_NAMES.index(name), BERTHS[BERTH_NAMES.index(name)]) for name in names]
+    heapq.heapify(FREE_BERTHS[berth_class])
+
+# Simulation results are written to the csv file as they are made, so a checkpoint only records its size
+file = open_output('vessel_turnaround_hazira.csv', checkpoint)
+writer = csv.writer(file)
+if checkpoint.state is None:
+    writer.writerow(['arrival_time', 'berth', 'service_time', 'delay_flag', 'start_time', 'end_time', 'vessel_type'])
+
+def state():
+    return {'rng' : rng.bit_generator.state,
+            'next_idle_time' : [berth.next_idle_time for berth in BERTHS],
+            'output_size' : output_size(file)}
+
+# Live progress (see progress_hazira.py), with the hours of work still queued at the berths
+progress = Progress('vessels', SIM_START, SIM_END, gauges=lambda : {
+    'berth_backlog_hrs' : round(sum((max(pd.Timedelta(0), berth.next_idle_time - time) for berth in BERTHS), pd.Timedelta(0)) / pd.Timedelta(hours=1), 1)})
+
+# Run while there still have not been 365 days simulated (the arrival may be over the year-limit)
 while arrival_time < SIM_END:
-    
-    # Generate the time of the next arrival
-    time += pd.Timedelta(hours=np.random.exponential(scale=1/ARRIVALS_PER_HOUR, size=1)[0]).round('s')
-    arrival_time = time
+    if checkpoint.due(arrival_time):
+        checkpoint.save(arrival_time, state())
 
-    if arrival_time < SIM_END: # New time may be over the year-limit
-        vessel = Vessel(arrival_time)
+    vessel = Vessel(arrival_time, TYPE_NAMES[rng.choice(len(TYPE_NAMES), p=TYPE_SHARES)], rng)
 
-        # Add the vessel to the berth with the earliest finish time
-        # By default, the vessel will dock at MP1
-        berth_to_dock = BERTHS[0]
-        for berth in BERTHS:
-            if berth.next_idle_time < berth_to_dock.next_idle_time:
-                berth_to_dock = berth
-        start_time = berth_to_dock.dock(vessel)
+    # Add the vessel to the berth of its class with the earliest finish time
+    heap = FREE_BERTHS[VESSEL_TYPES[vessel.type]['berth_class']]
+    _, position, berth_to_dock = heap[0]
+    start_time = berth_to_dock.dock(vessel)
+    heapq.heapreplace(heap, (berth_to_dock.next_idle_time, position, berth_to_dock))
 
-        end_time = start_time + vessel.service_time
+    end_time = start_time + vessel.service_time
 
-        # [arrival_time, berth_id, service_time, delay_flag, start_time, end_time, turnaround]
-        data.append([vessel.arrival_time, berth_to_dock.name, vessel.service_time, vessel.delayed, start_time, end_time])
+    # [arrival_time, berth_id, service_time, delay_flag, start_time, end_time, vessel_type]
+    writer.writerow([vessel.arrival_time, berth_to_dock.name, vessel.service_time, vessel.delayed, start_time, end_time, vessel.type])
+    progress.tick(arrival_time)
 
-# Plot a graph representing the occupancies of each vessel
-for row in data[1:]: # Omit the first row because that is the header
-    y_val = BERTH_NAMES.index(row[1])
-    plt.plot([row[4], row[5]], [y_val, y_val], color='black')
+    # Generate the time of the next arrival
+    time += pd.Timedelta(hours=rng.exponential(scale=1/ARRIVALS_PER_HOUR, size=1)[0]).round('s')
+    arrival_time = time
 
-# Write simulation results to csv file
-with open('vessel_turnaround_hazira.csv', 'w') as file:
-    writer = csv.writer(file)
-    writer.writerows(data)
+# The last checkpoint holds the first arrival after the horizon, to extend the run from
+checkpoint.save(arrival_time, state())
+file.close()
+progress.done()
 
 if SHOW_FIG:
-    # Label the output graph
-    plt.title('Processing At Berths Over Year')
-    plt.ylabel('berth')
-    plt.xlabel('hours')
-    plt.show()
\ No newline at end of file
+    # One bar per vessel at its berth, drawn by figures_hazira.py
+    import figures_hazira
+    figures_hazira.show('berth_gantt', pd.read_csv('vessel_turnaround_hazira.csv'))
@@ -0,0 +1,179 @@
+'''
+simulate_yard_hazira.py
+Simulate the container flow through the Hazira yard stacks:
+every container of every container call is placed in the yard,
+later retrieved, and reshuffled whenever it is in the way,
+with each move done by an RTG (see yard_model_hazira.py).
+
+Container flow per container call (vessel_turnaround_hazira.csv):
+- TEU handled as in simulate_containers_hazira.py, normal with mean 1400
+  (standard dev 150), at most 1500, one container per TEU
+- IMPORT_SHARE of them are discharged during the call and picked up by
+  truck after a gamma distributed dwell
+- the rest are exports, dropped off by truck a gamma distributed dwell
+  before they are loaded during the call
+When a container is placed the yard only knows when it is expected to
+leave: the mean dwell for imports and the start of the call for exports.
+Containers still in the yard at the end of the year are not retrieved.
+
+Output yard_moves_hazira.csv has one row per RTG move: place (into the
+yard), reshuffle (within the yard) or retrieve (out of the yard), with the
+stack the container was moved to (or taken from, for a retrieval).
+'''
+
+import numpy as np
+import pandas as pd
+from random_streams_hazira import stream
+from yard_model_hazira import Yard, RTGFleet, move_hours
+from progress_hazira import Progress
+from shared_arrays_hazira import attach
+from resources_hazira import names
+
+SIM_START = pd.Timestamp('2025-01-01 00:00')
+SIM_END = SIM_START + pd.Timedelta(days=365)
+HOURS = (SIM_END - SIM_START) / pd.Timedelta(hours=1)
+
+IMPORT_SHARE = .5
+IMPORT_DWELL_DAYS = 5 # Mean dwell of imports in the yard
+EXPORT_DWELL_DAYS = 4 # Mean dwell of exports in the yard
+DWELL_SHAPE = 2       # Gamma shape of the dwell times
+
+MOVE_TYPES = ['place', 'reshuffle', 'retrieve']
+
+def to_hours(times):
+    return ((pd.to_datetime(times) - SIM_START) / pd.Timedelta(hours=1)).to_numpy()
+
+def container_flow(calls, rng):
+    '''
+    Yard arrival and departure of every container of the container calls.
+    Parameters
+    calls: the container calls of vessel_turnaround_hazira.csv
+    rng: numpy.random.Generator
+    Returns
+    (in_time, out_time, expected_out, call_id): arrays with one entry per container
+    '''
+    start = to_hours(calls['start_time'])
+    end = to_hours(calls['end_time'])
+    teu = np.clip(np.round(rng.normal(1400, 150, size=len(calls))), 0, 1500).astype(np.int64)
+    imports = rng.binomial(teu, IMPORT_SHARE)
+
+    # One entry per container, imports of each call first
+    call = np.repeat(np.arange(len(calls)), teu)
+    is_import = np.arange(len(call)) - np.repeat(np.cumsum(teu) - teu, teu) < np.repeat(imports, teu)
+
+    # Handled at a uniform time during the call
+    handled = start[call] + rng.random(len(call)) * (end - start)[call]
+    dwell_days = np.where(is_import, IMPORT_DWELL_DAYS, EXPORT_DWELL_DAYS)
+    dwell = rng.gamma(DWELL_SHAPE, dwell_days * 24 / DWELL_SHAPE)
+
+    in_time = np.where(is_import, handled, np.maximum(0, handled - dwell))
+    out_time = np.where(is_import, handled + dwell, handled)
+    expected_out = np.where(is_import, handled + IMPORT_DWELL_DAYS * 24, start[call])
+    return in_time, out_time, expected_out, call + 1 # call ids start at 1 as in simulate_containers_hazira.py
+
+def simulate_yard(in_time, out_time, expected_out, rng, yard=None, progress=None):
+    '''
+    Runs the placements and retrievals in time order.
+    Parameters
+    in_time, out_time: yard arrival and departure of every container
+    expected_out: departure of every container as known when it is placed
+    rng: numpy.random.Generator
+    yard: a Yard to use (default: the Hazira layout)
+    progress: a Progress to tick with the hours simulated (default: none reported)
+    Returns
+    dict of move arrays (container, move_type, rtg, stack, start, end), the yard and the RTG fleet
+    '''
+    n = len(in_time)
+    yard = Yard(n) if yard is None else yard
+    fleet = RTGFleet(yard)
+    progress = Progress('yard', 0, HOURS, destination=None) if progress is None else progress
+
+    # Retrievals after the end of the year are not simulated
+    leaving = np.flatnonzero(out_time < HOURS)
+    containers = np.concatenate([np.arange(n), leaving])
+    kinds = np.concatenate([np.zeros(n, dtype=np.int8), np.ones(len(leaving), dtype=np.int8)])
+    times = np.concatenate([in_time, out_time[leaving]])
+
+    # Time order, placements before retrievals at the same time
+    order = np.lexsort((kinds, times))
+
+    moves = {'container' : [], 'move_type' : [], 'rtg' : [], 'stack' : [], 'start' : [], 'end' : []}
+    def record(container, move_type, rtg, stack, start, end):
+        moves['container'].append(container)
+        moves['move_type'].append(move_type)
+        moves['rtg'].append(rtg)
+        moves['stack'].append(stack)
+        moves['start'].append(start)
+        moves['end'].append(end)
+
+    # Move times are drawn in blocks rather than one at a time
+    durations = move_hours(rng, 2 * n)
+    used = 0
+
+    for container, kind, time in zip(containers[order].tolist(), kinds[order].tolist(), times[order].tolist()):
+        if used + yard.tiers + 1 > len(durations):
+            durations, used = move_hours(rng, 2 * n), 0
+
+        if kind == 0:
+            stack = yard.store(container, expected_out[container])
+            rtg, start = fleet.assign(time, stack)
+            end = start + durations[used]
+            used += 1
+            record(container, 0, rtg, stack, start, end)
+        else:
+            stack, reshuffles = yard.retrieve(container)
+            rtg, start = fleet.assign(time, stack)
+            # The same RTG digs out the container and then lifts it out
+            for top, _, dest in reshuffles:
+                end = start + durations[used]
+                used += 1
+                record(top, 1, rtg, dest, start, end)
+                start = end
+            end = start + durations[used]
+            used += 1
+            record(container, 2, rtg, stack, start, end)
+        fleet.work(rtg, stack, end)
+        progress.tick(time)
+
+    moves = {key : np.array(value) for key, value in moves.items()}
+    return moves, yard, fleet
+
+if __name__ == "__main__":
+    rng = stream('yard')
+
+    # Shared with the other simulations rather than parsed again (see shared_arrays_hazira.py)
+    vessels = attach('vessel_turnaround_hazira.csv', ['start_time', 'end_time', 'vessel_type'])
+    is_container = vessels['vessel_type'] == 'container'
+    calls = pd.DataFrame({col : vessels[col][is_container] for col in ['start_time', 'end_time']})
+
+    in_time, out_time, expected_out, call_id = container_flow(calls, rng)
+
+    # Live progress (see progress_hazira.py) in hours since SIM_START, with the yard fill
+    yard = Yard(len(in_time))
+    progress = Progress('yard', 0, HOURS, gauges=lambda : {'occupancy' : yard.occupancy, 'capacity' : yard.capacity})
+    moves, yard, fleet = simulate_yard(in_time, out_time, expected_out, rng, yard, progress)
+    progress.done()
+
+    block, rest = np.divmod(moves['stack'], yard.block_size)
+    bay, row = np.divmod(rest, yard.bay_size)
+    start = SIM_START + pd.to_timedelta(moves['start'], unit='h').round('s')
+    end = SIM_START + pd.to_timedelta(moves['end'], unit='h').round('s')
+
+    df = pd.DataFrame({
+        'move_type' : np.array(MOVE_TYPES)[moves['move_type']],
+        'container_id' : moves['container'],
+        'call_id' : call_id[moves['container']],
+        'resource_assigned' : names(fleet.resource_ids[moves['rtg']]),
+        'block' : block,
+        'bay' : bay,
+        'row' : row,
+        'move_start' : start,
+        'move_end' : end,
+        'move_duration' : end - start
+    })
+    df.to_csv('yard_moves_hazira.csv', index=False)
+
+    counts = df['move_type'].value_counts()
+    print(f"{len(in_time)} containers, {len(df)} RTG moves, "
+          f"{counts.get('reshuffle', 0) / max(1, counts.get('retrieve', 0)):.2f} reshuffles per retrieval, "
+          f"{yard.occupancy} of {yard.capacity} slots full at the end of the year")
@@ -0,0 +1,244 @@
+'''
+yard_model_hazira.py
+A container yard of blocks, bays, rows and tiers, and the RTGs that work it.
+
+The yard is held in a few NumPy arrays rather than one object per slot:
+- slots[stack, tier]   the container in each slot (EMPTY if none)
+- height[stack]        the number of containers in each stack
+- min_out[stack]       the earliest expected departure of the containers in each stack
+with stacks numbered block by block, bay by bay, row by row, so the
+stacks of one bay or one block are a contiguous slice. Each container
+only remembers its stack and tier. A yard of several hundred thousand
+slots takes a few megabytes, and the policies below only look at the
+stacks of one bay or one block at a time.
+
+Placement policy: a container goes to the least full block, on a stack
+whose containers are all expected to leave after it (so it should never
+have to be moved to get at them), choosing the stack whose earliest
+expected departure is closest to its own. If there is no such stack, it
+goes on the stack whose earliest expected departure is latest. Only the
+expected departure is known when a container is placed, so containers
+that leave earlier or later than expected still cause reshuffles.
+
+Retrieval policy: every container above the one that is leaving is
+reshuffled, i.e. moved by the same RTG to another stack, in the same bay
+if it has room and otherwise in the same block, chosen by the placement
+policy.
+
+Every placement or retrieval (with its reshuffles) is given to the RTG
+that can start it first, counting the gantry travel from where it is
+and the time it is still busy.
+
+Times are in hours since the start of the simulation.
+'''
+
+import numpy as np
+from resources_hazira import YARD, NUM_YARD, of_class
+
+# Hazira yard layout: one block per RTG
+BLOCKS = NUM_YARD
+BAYS = 40
+ROWS = 6
+TIERS = 5
+
+EMPTY = -1 # Container id of an empty slot
+
+# RTG move times, as in simulate_containers_hazira.py: normal with mean 144s,
+# standard dev 15s, truncated at 30s
+MOVE_SECS = 144
+MOVE_SIGMA = 15
+MIN_MOVE_SECS = 30
+
+BAY_TRAVEL_SECS = 6     # Gantry travel from one bay to the next
+BLOCK_TRAVEL_SECS = 240 # Moving to another block
+
+class YardFullError(RuntimeError):
+    pass
+
+class Yard:
+    '''
+    The stacks of the yard and the position of every container in it.
+    '''
+
+    def __init__(self, num_containers, blocks=BLOCKS, bays=BAYS, rows=ROWS, tiers=TIERS):
+        '''
+        Parameters
+        num_containers: number of container ids (0 .. num_containers-1) that will be used
+        blocks, bays, rows, tiers: layout of the yard
+        '''
+        self.blocks, self.bays, self.rows, self.tiers = blocks, bays, rows, tiers
+        self.bay_size = rows                # Stacks per bay
+        self.block_size = bays * rows       # Stacks per block
+        num_stacks = blocks * bays * rows
+
+        self.slots = np.full((num_stacks, tiers), EMPTY, dtype=np.int32)
+        self.height = np.zeros(num_stacks, dtype=np.int16)
+        self.min_out = np.full(num_stacks, np.inf)
+        self.block_count = np.zeros(blocks, dtype=np.int64) # Containers in each block
+
+        # Expected departure and position of each container
+        self.out_time = np.full(num_containers, np.inf)
+        self.stack_of = np.full(num_containers, EMPTY, dtype=np.int32)
+        self.tier_of = np.full(num_containers, EMPTY, dtype=np.int16)
+
+    @property
+    def capacity(self):
+        return self.slots.size
+
+    @property
+    def occupancy(self):
+        return int(self.block_count.sum())
+
+    def location(self, stack):
+        '''
+        (block, bay, row) of a stack number.
+        '''
+        block, rest = divmod(int(stack), self.block_size)
+        bay, row = divmod(rest, self.bay_size)
+        return block, bay, row
+
+    def choose_stack(self, lo, hi, out_time, exclude=EMPTY):
+        '''
+        The stack in [lo, hi) to put a container leaving at out_time on,
+        by the placement policy, or EMPTY if they are all full.
+        Parameters
+        exclude: a stack that may not be chosen (the one being dug into)
+        '''
+        open_ = self.height[lo:hi] < self.tiers
+        if exclude != EMPTY and lo <= exclude < hi:
+            open_[exclude - lo] = False
+        if not open_.any():
+            return EMPTY
+
+        min_out = self.min_out[lo:hi]
+        good = np.flatnonzero(open_ & (min_out >= out_time))
+        if len(good):
+            # Tightest fit: the stack whose earliest departure is closest after this one
+            return lo + int(good[np.argmin(min_out[good])])
+        # Every open stack holds an earlier departure, take the one that leaves last
+        candidates = np.flatnonzero(open_)
+        return lo + int(candidates[np.argmax(min_out[candidates])])
+
+    def place(self, container, stack):
+        '''
+        Puts a container on top of a stack.
+        '''
+        tier = self.height[stack]
+        self.slots[stack, tier] = container
+        self.height[stack] = tier + 1
+        self.min_out[stack] = min(self.min_out[stack], self.out_time[container])
+        self.stack_of[container] = stack
+        self.tier_of[container] = tier
+        self.block_count[stack // self.block_size] += 1
+
+    def remove_top(self, stack):
+        '''
+        Takes the top container off a stack and returns it.
+        '''
+        tier = self.height[stack] - 1
+        container = self.slots[stack, tier]
+        self.slots[stack, tier] = EMPTY
+        self.height[stack] = tier
+        self.min_out[stack] = self.out_time[self.slots[stack, :tier]].min() if tier else np.inf
+        self.stack_of[container] = EMPTY
+        self.tier_of[container] = EMPTY
+        self.block_count[stack // self.block_size] -= 1
+        return container
+
+    def store(self, container, out_time):
+        '''
+        Places an arriving container by the placement policy.
+        Parameters
+        out_time: the time the container is expected to leave the yard
+        Returns
+        the stack it was placed on
+        '''
+        self.out_time[container] = out_time
+
+        # Least full block first, then anywhere in the yard
+        block = int(np.argmin(self.block_count))
+        lo = block * self.block_size
+        stack = self.choose_stack(lo, lo + self.block_size, out_time)
+        if stack == EMPTY:
+            stack = self.choose_stack(0, len(self.height), out_time)
+        if stack == EMPTY:
+            raise YardFullError(f'no room for container {container}, all {self.capacity} slots are full')
+
+        self.place(container, stack)
+        return stack
+
+    def retrieve(self, container):
+        '''
+        Takes a container out of the yard, reshuffling the containers above it.
+        Returns
+        (stack it was in, list of (container, from_stack, to_stack) reshuffles)
+        '''
+        stack = self.stack_of[container]
+        if stack == EMPTY:
+            raise KeyError(f'container {container} is not in the yard')
+
+        bay_lo = stack - stack % self.bay_size
+        block_lo = stack - stack % self.block_size
+
+        reshuffles = []
+        while self.height[stack] - 1 > self.tier_of[container]:
+            top = self.remove_top(stack)
+            out_time = self.out_time[top]
+            dest = self.choose_stack(bay_lo, bay_lo + self.bay_size, out_time, exclude=stack)
+            if dest == EMPTY:
+                dest = self.choose_stack(block_lo, block_lo + self.block_size, out_time, exclude=stack)
+            if dest == EMPTY:
+                dest = self.choose_stack(0, len(self.height), out_time, exclude=stack)
+            if dest == EMPTY:
+                raise YardFullError(f'no room to reshuffle container {top}')
+            self.place(top, dest)
+            reshuffles.append((top, stack, dest))
+
+        self.remove_top(stack)
+        self.out_time[container] = np.inf
+        return stack, reshuffles
+
+class RTGFleet:
+    '''
+    The RTGs of the yard: where each one is and when it is next free.
+    RTG i is the yard crane resource_ids[i] of the resource registry.
+    '''
+
+    def __init__(self, yard, num_rtg=BLOCKS):
+        if num_rtg > NUM_YARD:
+            raise ValueError(f'{num_rtg} RTGs, but the resource registry only has {NUM_YARD} yard cranes')
+        self.yard = yard
+        # Each RTG starts at the first bay of its own block
+        self.block = np.arange(num_rtg) % yard.blocks
+        self.bay = np.zeros(num_rtg, dtype=np.int64)
+        self.next_idle = np.zeros(num_rtg)
+        self.resource_ids = of_class(YARD)[:num_rtg] # See resources_hazira.py
+
+    def assign(self, time, stack):
+        '''
+        The RTG that can start working at a stack first.
+        Returns
+        (RTG number, start time)
+        '''
+        block, bay, _ = self.yard.location(stack)
+        same_block = self.block == block
+        travel_secs = np.where(same_block, 0, BLOCK_TRAVEL_SECS) \
+            + np.abs(np.where(same_block, self.bay, 0) - bay) * BAY_TRAVEL_SECS
+        start = np.maximum(time, self.next_idle + travel_secs / 3600)
+        rtg = int(np.argmin(start))
+        return rtg, float(start[rtg])
+
+    def work(self, rtg, stack, end_time):
+        '''
+        Moves an RTG to a stack and keeps it busy until end_time.
+        '''
+        block, bay, _ = self.yard.location(stack)
+        self.block[rtg] = block
+        self.bay[rtg] = bay
+        self.next_idle[rtg] = end_time
+
+def move_hours(rng, size=None):
+    '''
+    Draws RTG move times in hours.
+    '''
+    return np.maximum(MIN_MOVE_SECS, rng.normal(MOVE_SECS, MOVE_SIGMA, size)) / 3600
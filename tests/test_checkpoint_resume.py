@@ -0,0 +1,67 @@
+'''
+test_checkpoint_resume.py
+A simulation resumed from a checkpoint has to write the same csv, byte
+for byte, as a run that was never interrupted (see checkpoint_hazira.py).
+
+Each stage is run in a copy of simulation_tasks over a short horizon:
+once straight through, and once stopped part way with rows written
+after its last checkpoint (as if it had died) and then resumed with
+HAZIRA_RESUME=1.
+
+Run from the repository root:
+    python -m pytest tests
+'''
+
+import os
+import sys
+import shutil
+import subprocess
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASKS = os.path.join(ROOT, "simulation_tasks")
+
+DAYS = 30
+STOP_DAYS = 12 # Horizon of the run that is resumed
+CHECKPOINT_DAYS = 7
+
+# Output csv of each stage, and the stages whose output it reads
+STAGES = {
+    "vessels" : ("vessel_turnaround_hazira.csv", []),
+    "cranes" : ("crane_uptime_hazira.csv", []),
+    "gate" : ("gate_entries_hazira.csv", []),
+    "containers" : ("container_moves_hazira.csv", ["vessels"])
+}
+
+def run_stage(folder, stage, days, resume=False):
+    env = dict(os.environ, HAZIRA_DAYS=str(days), HAZIRA_CHECKPOINT_DAYS=str(CHECKPOINT_DAYS),
+               HAZIRA_RESUME="1" if resume else "0")
+    subprocess.run([sys.executable, f"simulate_{stage}_hazira.py"], cwd=folder, env=env,
+                   capture_output=True, check=True)
+
+def copy_tasks(folder):
+    os.makedirs(folder)
+    for name in os.listdir(TASKS):
+        if name.endswith(".py"):
+            shutil.copy(os.path.join(TASKS, name), folder)
+    return folder
+
+@pytest.mark.parametrize("stage", list(STAGES))
+def test_resume_is_bit_identical(stage, tmp_path):
+    output, inputs = STAGES[stage]
+
+    straight = copy_tasks(tmp_path / "straight")
+    for source in inputs:
+        run_stage(straight, source, DAYS)
+    run_stage(straight, stage, DAYS)
+
+    resumed = copy_tasks(tmp_path / "resumed")
+    for source in inputs:
+        run_stage(resumed, source, DAYS)
+    run_stage(resumed, stage, STOP_DAYS)
+    # Rows written after the last checkpoint by a run that then died
+    with open(resumed / output, "a") as file:
+        file.write("written,after,the,checkpoint\n")
+    run_stage(resumed, stage, DAYS, resume=True)
+
+    assert (resumed / output).read_bytes() == (straight / output).read_bytes()
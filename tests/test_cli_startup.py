@@ -0,0 +1,43 @@
+'''
+test_cli_startup.py
+'hazira.py --help' has to stay fast: the command line only loads
+argparse, and every stage imports pandas, NumPy, matplotlib, ... itself
+when it runs (see hazira.py).
+
+Run from the repository root:
+    python -m pytest tests
+'''
+
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["pandas", "numpy", "matplotlib"]
+IMPORT_BUDGET_MS = 150 # Total time spent importing modules, well above the ~20 ms it takes now
+
+def import_times(*args):
+    '''
+    Runs hazira.py with -X importtime.
+    Returns
+    dict of module name -> its own import time in microseconds
+    '''
+    result = subprocess.run([sys.executable, "-X", "importtime", os.path.join(ROOT, "hazira.py"), *args],
+                            capture_output=True, text=True, cwd=ROOT, check=True)
+    times = {}
+    # Lines are "import time: self [us] | cumulative | imported package", after a header line
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(own)
+    return times
+
+def test_help_imports_no_heavy_modules():
+    loaded = {name.split(".")[0] for name in import_times("--help")}
+    assert not loaded & set(HEAVY_MODULES), f"'hazira.py --help' imports {sorted(loaded & set(HEAVY_MODULES))}"
+
+def test_help_import_time_budget():
+    total_ms = sum(import_times("--help").values()) / 1000
+    assert total_ms < IMPORT_BUDGET_MS, f"'hazira.py --help' spends {total_ms:.0f} ms importing modules"
@@ -0,0 +1,66 @@
+'''
+test_gate_lanes.py
+The gate lanes are separate servers: simulate_gate_hazira.simulate_gate
+has to match a plain loop over the trucks that sends each one to the
+lane that is free first, for one lane and for two.
+
+Run from the repository root:
+    python -m pytest tests
+'''
+
+import os
+import sys
+import heapq
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "simulation_tasks"))
+
+from simulate_gate_hazira import HOUR_TIMESTEP, simulate_gate
+from batch_models_hazira import serve_lanes
+
+def per_truck(counts, service_mins, speed, lanes):
+    '''
+    Queues at a gate with the given lanes, one truck at a time.
+    Returns
+    (num_processed, queue_length) at the end of every hour
+    '''
+    free = [0.0] * lanes
+    departures = []
+    arrivals = np.repeat(np.arange(len(counts)), counts) * 60 / HOUR_TIMESTEP
+    for arrival, service in zip(arrivals, service_mins):
+        start = max(arrival, heapq.heappop(free))
+        departures.append(start + service / speed)
+        heapq.heappush(free, departures[-1])
+
+    hour_ends = 60 * np.arange(1, len(counts) // HOUR_TIMESTEP + 1)
+    completed = np.array([sum(d <= end + 1e-6 for d in departures) for end in hour_ends])
+    arrived = np.cumsum(counts)[HOUR_TIMESTEP - 1::HOUR_TIMESTEP]
+    return np.diff(completed, prepend=0), arrived - completed
+
+@pytest.mark.parametrize("lanes", [1, 2])
+def test_lanes_match_per_truck_loop(lanes):
+    rng = np.random.default_rng(lanes)
+    # Two days that are busy enough for one lane to queue, with quiet hours in between
+    counts = rng.poisson(np.tile(np.repeat([.5, 3], 24), 2))
+    service_mins = np.maximum(6, rng.normal(11, 2.5, counts.sum()))
+
+    gate = simulate_gate(counts, service_mins, speed=[1, 1.3], lanes=lanes)
+    for i, speed in enumerate([1, 1.3]):
+        num_processed, queue_length = per_truck(counts, service_mins, speed, lanes)
+        assert (gate["num_processed"][i] == num_processed).all()
+        assert (gate["queue_length"][i] == queue_length).all()
+    assert gate["queue_length"].max() > 0
+
+def test_lanes_per_gate():
+    rng = np.random.default_rng(0)
+    arrival = np.sort(rng.uniform(0, 600, 200))
+    service = rng.uniform(5, 15, (3, 200))
+    departure = serve_lanes(arrival, service, np.array([1, 2, 3]))
+    for row, lanes in enumerate([1, 2, 3]):
+        free = [0.0] * lanes
+        for k in range(200):
+            start = max(arrival[k], heapq.heappop(free))
+            heapq.heappush(free, start + service[row, k])
+            assert departure[row, k] == pytest.approx(start + service[row, k])
@@ -0,0 +1,63 @@
+'''
+test_incremental_cube.py
+process_metrics_hazira.py --incremental, run as the outputs are appended
+to, has to export the same monthly metrics as a full build of the
+finished outputs (see metrics_cube_hazira.py).
+
+The outputs in simulation_tasks are copied twice: whole for the full
+build, and cut in half for the incremental run, which is refreshed
+once on the first halves and again after the second halves have been
+appended.
+
+Run from the repository root:
+    python -m pytest tests
+'''
+
+import os
+import sys
+import shutil
+import subprocess
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASKS = os.path.join(ROOT, "simulation_tasks")
+
+sys.path.insert(0, TASKS)
+from metrics_cube_hazira import SOURCES
+
+OUTPUT = "hazira_monthly_metrics.xlsx"
+
+def copy_scripts(folder):
+    os.makedirs(folder)
+    for name in os.listdir(TASKS):
+        if name.endswith(".py"):
+            shutil.copy(os.path.join(TASKS, name), folder)
+    return folder
+
+def process_metrics(folder, *args):
+    subprocess.run([sys.executable, "process_metrics_hazira.py", *args], cwd=folder,
+                   capture_output=True, check=True)
+    return pd.read_excel(folder / OUTPUT, index_col=0)
+
+def test_incremental_matches_full_build(tmp_path):
+    full = copy_scripts(tmp_path / "full")
+    incremental = copy_scripts(tmp_path / "incremental")
+
+    second_halves = {}
+    for path in SOURCES.values():
+        with open(os.path.join(TASKS, path), "rb") as file:
+            lines = file.readlines()
+        (full / path).write_bytes(b"".join(lines))
+        half = len(lines) // 2
+        (incremental / path).write_bytes(b"".join(lines[:half]))
+        second_halves[path] = b"".join(lines[half:])
+
+    expected = process_metrics(full)
+
+    process_metrics(incremental, "--incremental")
+    for path, rows in second_halves.items():
+        with open(incremental / path, "ab") as file:
+            file.write(rows)
+    refreshed = process_metrics(incremental, "--incremental")
+
+    pd.testing.assert_frame_equal(refreshed, expected)